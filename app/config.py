@@ -1,22 +1,126 @@
+from functools import lru_cache
+from typing import Any, Optional, Tuple
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
-    firebase_key_file: str
-    mail_username: str
-    mail_password: str
-    mail_from: str
-    mail_port: int
-    mail_server: str
-    mail_from_name: str
-    firebase_api_key: str
-    mongodb_uri: str
-    fatsecret_client_id: str
-    fatsecret_client_secret: str
-    openai_api_key: str
+    # Credentials are optional at load time so the app can start without them;
+    # each client checks for what it needs when it is first initialized.
+    firebase_key_file: Optional[str] = None
+    mail_username: Optional[str] = None
+    mail_password: Optional[str] = None
+    mail_from: Optional[str] = None
+    mail_port: Optional[int] = None
+    mail_server: Optional[str] = None
+    mail_from_name: Optional[str] = None
+    firebase_api_key: Optional[str] = None
+    mongodb_uri: Optional[str] = None
+    fatsecret_client_id: Optional[str] = None
+    fatsecret_client_secret: Optional[str] = None
+    openai_api_key: Optional[str] = None
+    firebase_auth_url: str = "https://identitytoolkit.googleapis.com"
+    mongodb_min_pool_size: int = 0
+    mongodb_max_pool_size: int = 100
+    # Connection budget for all workers of this instance; each worker's max
+    # pool size is this divided by the worker count, up to the max pool size
+    mongodb_total_pool_size: int = 100
+    # Profile and daily log reads go to MONGODB_READ_PREFERENCE ("primary",
+    # "primaryPreferred", "secondary", "secondaryPreferred" or "nearest"),
+    # skipping secondaries more than MONGODB_MAX_STALENESS seconds (90 or
+    # more) behind. After a write, a user's reads wait for it for
+    # MONGODB_CAUSAL_TTL seconds.
+    mongodb_read_preference: str = "primary"
+    mongodb_max_staleness: Optional[int] = None
+    mongodb_causal_ttl: float = 300.0
+    # Write concern of every write: "majority" or a number of members, and
+    # whether to wait for the journal; unset keeps the server's default
+    mongodb_write_concern: Optional[str] = None
+    mongodb_write_journal: Optional[bool] = None
+    web_concurrency: int = 1
+    openai_drain_timeout: float = 30.0
+    warmup_on_startup: bool = False
+    # Time budget of a request: the X-Request-Timeout header (up to the max),
+    # else the longest matching path prefix of the routes, else the default.
+    # 0 means no deadline.
+    request_timeout: float = 30.0
+    request_timeout_max: float = 120.0
+    request_timeout_routes: str = "/food-recognition=90,/chat=75,/food-log/export=0,/admin=0"
+    # Upstream calls give up after these many seconds, and after
+    # CIRCUIT_BREAKER_FAILURE_THRESHOLD failures in a row an upstream is not
+    # called again for CIRCUIT_BREAKER_RESET_TIMEOUT seconds
+    fatsecret_timeout: float = 5.0
+    identitytoolkit_timeout: float = 5.0
+    openai_timeout: float = 60.0
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_reset_timeout: float = 30.0
+    # Food recognition sends images at this detail ("low", "high" or "auto")
+    # and caps the answer at this many tokens
+    food_recognition_model: str = "gpt-4o"
+    food_recognition_image_detail: str = "low"
+    food_recognition_max_tokens: int = 400
+    # Chat prompts hold a summary of older turns and the last CHAT_HISTORY_TURNS
+    # turns; the summary is refreshed once the turns it does not cover exceed
+    # the token budget. Turns and summaries are kept for CHAT_HISTORY_TTL seconds.
+    chat_history_turns: int = 6
+    chat_history_token_budget: int = 2000
+    chat_history_ttl: float = 30 * 24 * 3600
+    chat_summary_max_tokens: int = 300
+    # "mongodb", or "memory" to keep everything in process memory (tests and benchmarks)
+    storage_backend: str = "mongodb"
+    # "embedded" keeps entries in the daily log document, "collection" in food_entries
+    food_log_storage: str = "embedded"
+    # Per-user calorie targets cached in each worker. Other workers are told
+    # of changes through the invalidation bus; the TTL bounds staleness when
+    # a message is missed.
+    target_cache_size: int = 10000
+    target_cache_ttl: float = 60.0
+    cache_invalidation_enabled: bool = True
+    food_search_cache_size: int = 2000
+    food_search_cache_ttl: float = 3600.0
+    # Seconds before a barcode FatSecret did not know is looked up again
+    barcode_negative_ttl: float = 7 * 24 * 3600
+    # Shared secret for the admin endpoints (X-Admin-Key); they are disabled when unset
+    admin_api_key: Optional[str] = None
+    import_chunk_size: int = 5000
+    email_sender_enabled: bool = True
+    email_batch_size: int = 20
+    email_max_attempts: int = 5
+    # Seconds a sent email is kept in the outbox
+    email_sent_ttl: float = 7 * 24 * 3600
+    access_log_sample_rate: float = 1.0
+    access_log_headers: str = "user-agent,authorization"
+    access_log_redact_headers: str = "authorization,cookie,proxy-authorization"
+    profiler_enabled: bool = False
+    profiler_secret: Optional[str] = None
+    profiler_routes: str = ""
+    profiler_sample_rate: float = 0.01
+    profiler_output_dir: str = "profiles"
+    profiler_max_files: int = 50
 
     class Config:
         env_file = ".env"
 
+    def require(self, name: str) -> Any:
+        """Return a setting that a client needs, failing clearly when it is missing."""
+        value = getattr(self, name)
+        if value is None or value == "":
+            raise RuntimeError(f"{name.upper()} is not configured")
+        return value
 
-settings = Settings()
+    def mongodb_pool_sizes(self) -> Tuple[int, int]:
+        """Return the (min, max) Mongo pool size for this worker process."""
+        workers = max(1, self.web_concurrency)
+        max_size = max(1, min(self.mongodb_max_pool_size, self.mongodb_total_pool_size // workers))
+        return min(self.mongodb_min_pool_size, max_size), max_size
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name):
+    # Keep `from app.config import settings` working without loading at import time
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
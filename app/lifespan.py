@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Callable, Dict
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.middleware.access_log import setup_access_log
+from app.services.email_service import start_email_sender, stop_email_sender
+from app.services.fatsecret_service import FatSecretService
+from app.services.firebase_service import (
+    close_firebase_app,
+    close_http_client,
+    get_firebase_app,
+    prefetch_firebase_certificates,
+)
+from app.services.openai_service import close_openai_client, drain_openai_calls, get_openai_client
+from app.services.storage import close_storage, get_storage
+
+logger = logging.getLogger(__name__)
+
+access_log_listener = setup_access_log()
+
+
+def _warm_firebase():
+    get_firebase_app()
+    prefetch_firebase_certificates()
+
+
+def _warm_storage():
+    # Connecting to Mongo pings the server; the pool then fills up to MONGODB_MIN_POOL_SIZE
+    get_storage()
+
+
+WARMUP_STEPS: Dict[str, Callable[[], None]] = {
+    "firebase": _warm_firebase,
+    "storage": _warm_storage,
+    "fatsecret": lambda: FatSecretService().prefetch_token(),
+    "openai": get_openai_client,
+}
+
+
+async def _timed_step(name: str, step: Callable[[], None]):
+    start = perf_counter()
+    try:
+        await run_in_threadpool(step)
+        return name, perf_counter() - start, None
+    except Exception as e:
+        return name, perf_counter() - start, e
+
+
+async def warm_up() -> Dict[str, float]:
+    """Initialize every external client concurrently ahead of the first request.
+
+    Failures are logged and left for the first request to surface, so a missing
+    credential only disables the feature that needs it.
+    """
+    results = await asyncio.gather(*(_timed_step(name, step) for name, step in WARMUP_STEPS.items()))
+    timings = {}
+    for name, seconds, error in results:
+        timings[name] = seconds
+        if error is not None:
+            logger.warning("Warm-up of %s failed after %.3fs: %s", name, seconds, error)
+        else:
+            logger.info("Warmed up %s in %.3fs", name, seconds)
+    return timings
+
+
+def close_clients():
+    for close in (close_storage, close_openai_client, close_firebase_app):
+        try:
+            close()
+        except Exception as e:
+            logger.warning("Failed to close client: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    access_log_listener.start()
+    if get_settings().warmup_on_startup:
+        await warm_up()
+    start_email_sender()
+    try:
+        yield
+    finally:
+        await stop_email_sender()
+        # Requests are already drained by the server; this covers calls made
+        # outside a request before their client is closed
+        if not await run_in_threadpool(drain_openai_calls, get_settings().openai_drain_timeout):
+            logger.warning("Shutting down with OpenAI calls still in flight")
+        await run_in_threadpool(close_clients)
+        await close_http_client()
+        access_log_listener.stop()
@@ -1,14 +1,32 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, profile, insights, food_logging, food_search, chat, food_recognition
+from app.config import get_settings
+from app.lifespan import lifespan
+from app.middleware.access_log import AccessLogMiddleware
+from app.middleware.deadline import DeadlineMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiler import ProfilerMiddleware
+from app.middleware.request_scope import RequestScopeMiddleware
+from app.routers import admin, auth, profile, insights, food_logging, food_search, chat, food_recognition, metrics
 from app.routers.food_recognition import calorie_route
 import logging
 
-# Configure logging
+# Configure logging once for the whole application
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+settings = get_settings()
+
+app = FastAPI(lifespan=lifespan)
+
+# Innermost, so that CORS headers are added to the 504 of a request that ran out of time,
+# and metrics and the access log see it
+app.add_middleware(
+    DeadlineMiddleware,
+    default_timeout=settings.request_timeout,
+    max_timeout=settings.request_timeout_max,
+    routes=settings.request_timeout_routes,
+)
 
 # Configure CORS with more permissive settings for development
 app.add_middleware(
@@ -20,13 +38,26 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-@app.middleware("http")
-async def log_requests(request, call_next):
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    logger.info(f"Headers: {request.headers}")
-    response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
-    return response
+# Only installed when profiling can actually happen, so it costs nothing otherwise
+if settings.profiler_enabled or settings.profiler_secret:
+    app.add_middleware(
+        ProfilerMiddleware,
+        enabled=settings.profiler_enabled,
+        secret=settings.profiler_secret,
+        routes=settings.profiler_routes,
+        sample_rate=settings.profiler_sample_rate,
+        output_dir=settings.profiler_output_dir,
+        max_files=settings.profiler_max_files,
+    )
+app.add_middleware(MetricsMiddleware, fastapi_app=app)
+app.add_middleware(
+    AccessLogMiddleware,
+    sample_rate=settings.access_log_sample_rate,
+    headers=settings.access_log_headers,
+    redact_headers=settings.access_log_redact_headers,
+)
+# Outermost, so the access log can still read the request's Mongo round trips
+app.add_middleware(RequestScopeMiddleware)
 
 # Include the routers
 app.include_router(food_recognition.router)
@@ -37,6 +68,8 @@ app.include_router(food_logging.router)
 app.include_router(food_search.router)
 app.include_router(chat.router)
 app.include_router(calorie_route)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,108 @@
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from time import perf_counter
+from typing import Iterable
+
+from app.services.request_scope import current_request_scope
+from app.services.timing import start_upstream_timings, stop_upstream_timings
+
+access_logger = logging.getLogger("mealmeter.access")
+
+REDACTED = "[REDACTED]"
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def prepare(self, record):
+        # The record message is already a fully formatted line, skip the re-formatting
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def setup_access_log(max_queue_size: int = 10000) -> QueueListener:
+    """Route access log records through a queue drained by a background thread.
+
+    The returned listener must be started on application startup and stopped
+    on shutdown so that queued lines are flushed.
+    """
+    log_queue = queue.Queue(maxsize=max_queue_size)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    access_logger.handlers = [_DroppingQueueHandler(log_queue)]
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    return QueueListener(log_queue, stream_handler, respect_handler_level=False)
+
+
+def _split_setting(value: str) -> Iterable[str]:
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+class AccessLogMiddleware:
+    """Pure ASGI middleware writing one structured line per sampled request.
+
+    Server errors are always logged; other requests are logged with probability
+    ``sample_rate``. Only headers listed in ``headers`` are included and those
+    listed in ``redact_headers`` are masked.
+    """
+
+    def __init__(self, app, sample_rate: float = 1.0, headers: str = "", redact_headers: str = ""):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.headers = {name.encode("latin-1") for name in _split_setting(headers)}
+        self.redact_headers = {name.encode("latin-1") for name in _split_setting(redact_headers)}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status_code = 500
+        timings, token = start_upstream_timings()
+        # Started by the RequestScopeMiddleware around this one, when installed
+        request_scope = current_request_scope()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_upstream_timings(token)
+            duration = perf_counter() - start
+            if status_code >= 500 or random.random() < self.sample_rate:
+                mongo_round_trips = request_scope.mongo_round_trips if request_scope is not None else 0
+                self._log(scope, status_code, duration, timings, mongo_round_trips)
+
+    def _log(self, scope, status_code, duration, timings, mongo_round_trips=0):
+        route = scope.get("route")
+        line = {
+            "method": scope["method"],
+            "route": getattr(route, "path", None) or scope["path"],
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "upstream_ms": {name: round(seconds * 1000, 2) for name, seconds in timings.items()},
+            "mongo_round_trips": mongo_round_trips,
+        }
+        if self.headers:
+            line["headers"] = {
+                name.decode("latin-1"): REDACTED if name in self.redact_headers else value.decode("latin-1")
+                for name, value in scope["headers"]
+                if name in self.headers
+            }
+        access_logger.info(json.dumps(line, separators=(",", ":")))
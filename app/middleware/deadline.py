@@ -0,0 +1,97 @@
+import json
+import math
+from typing import Optional
+
+import anyio
+
+from app.services.deadline import expired, request_deadline
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+_TIMEOUT_BODY = json.dumps({"detail": "Request deadline exceeded"}).encode()
+
+
+def parse_route_timeouts(routes: str):
+    """Parse ``"/chat=60,/admin=0"`` into (path prefix, seconds) pairs, longest prefix first."""
+    timeouts = []
+    for item in routes.split(","):
+        prefix, _, seconds = item.partition("=")
+        if prefix.strip() and seconds.strip():
+            timeouts.append((prefix.strip(), float(seconds)))
+    return sorted(timeouts, key=lambda timeout: len(timeout[0]), reverse=True)
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware giving each request a time budget.
+
+    The budget comes from the ``X-Request-Timeout`` header (in seconds, capped
+    at ``max_timeout``), else from the longest matching prefix of ``routes``,
+    else ``default_timeout``. A budget of 0 means no deadline, e.g. for
+    streamed exports and imports.
+
+    Upstream calls made for the request are given what is left of it (see
+    app.services.deadline). When it runs out before the response has started,
+    the handler is cancelled and the client gets a 504; a server error sent
+    after it ran out is reported as a 504 too.
+    """
+
+    def __init__(self, app, default_timeout: float = 30.0, max_timeout: float = 120.0, routes: str = ""):
+        self.app = app
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        self.routes = parse_route_timeouts(routes)
+
+    def _budget(self, scope) -> Optional[float]:
+        for name, value in scope["headers"]:
+            if name == TIMEOUT_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_timeout)
+                break
+        for prefix, seconds in self.routes:
+            if scope["path"].startswith(prefix):
+                return seconds or None
+        return self.default_timeout or None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self._budget(scope)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+        replaced = False
+
+        async def send_timeout():
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json")],
+            })
+            await send({"type": "http.response.body", "body": _TIMEOUT_BODY})
+
+        async def send_wrapper(message):
+            nonlocal started, replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+                # The response is on its way; let it finish
+                cancel_scope.deadline = math.inf
+                if message["status"] >= 500 and expired():
+                    replaced = True
+                    await send_timeout()
+                    return
+            await send(message)
+
+        with request_deadline(budget):
+            with anyio.CancelScope(deadline=anyio.current_time() + budget) as cancel_scope:
+                await self.app(scope, receive, send_wrapper)
+        if cancel_scope.cancelled_caught and not started:
+            await send_timeout()
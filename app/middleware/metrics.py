@@ -0,0 +1,80 @@
+from functools import lru_cache
+from time import perf_counter
+
+from starlette.routing import Match
+
+from app.services.metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _flatten_routes(routes):
+    """Yield an application's routes, with the routes of included routers in place of the routers.
+
+    Newer FastAPI versions list each included router as a single entry; the
+    routes it yields are the ones the router puts in ``scope["route"]``.
+    """
+    for route in routes:
+        contexts = getattr(route, "effective_route_contexts", None)
+        if contexts is None:
+            yield route
+        else:
+            yield from (context.original_route for context in contexts())
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route latency and in-flight requests.
+
+    Requests are labelled by route template (e.g. ``/food-log/daily/{date}``)
+    so that path parameters do not blow up label cardinality. Templates are
+    resolved before the request is routed, by matching the application's
+    routes the way its router does (including routes left out of the OpenAPI
+    schema), so the in-flight gauge can carry the route label too.
+    """
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self._resolve = lru_cache(maxsize=4096)(self._match_route)
+
+    def _match_route(self, method: str, path: str) -> str:
+        scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+        # A route matching the path but not the method answers 405; label it as the router would
+        partial = None
+        try:
+            for route in _flatten_routes(self.fastapi_app.routes):
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    return route.path
+                if match == Match.PARTIAL and partial is None:
+                    partial = route.path
+        except Exception:
+            # Metrics must never break request handling, fall back to a single label
+            return UNMATCHED_ROUTE
+        return partial or UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._resolve(method, scope["path"])
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method=method, route=route)
+        in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(method=method, route=route, status=str(status_code)).observe(
+                perf_counter() - start
+            )
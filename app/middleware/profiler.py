@@ -0,0 +1,122 @@
+import hashlib
+import hmac
+import os
+import random
+import re
+import time
+from typing import Optional
+
+import anyio
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+def sign_profile_request(secret: str, path: str, ttl_seconds: int = 300) -> str:
+    """Build a value for the X-Profile-Token header that profiles one path.
+
+    The token is ``<expiry>.<hmac>`` where the HMAC-SHA256 covers the expiry
+    timestamp and the request path, so it cannot be replayed on other routes.
+    """
+    expires = int(time.time()) + ttl_seconds
+    return f"{expires}.{_signature(secret, expires, path)}"
+
+
+def _signature(secret: str, expires: int, path: str) -> str:
+    message = f"{expires}:{path}".encode("utf-8")
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify_profile_token(secret: str, token: str, path: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(secret, int(expires), path))
+
+
+class ProfilerMiddleware:
+    """Opt-in sampling profiler for selected routes.
+
+    Requests whose path starts with one of ``routes`` (all paths when empty)
+    are profiled with probability ``sample_rate`` when ``enabled`` is set.
+    A request carrying a valid ``X-Profile-Token`` signed with ``secret`` is
+    always profiled. Each profile is written to ``output_dir`` in speedscope
+    format, which flamegraph viewers such as https://www.speedscope.app load
+    directly, keeping at most ``max_files`` of the most recent profiles.
+
+    The middleware is only installed when profiling is enabled or a secret is
+    configured, so it costs nothing otherwise.
+    """
+
+    def __init__(
+        self,
+        app,
+        enabled: bool = False,
+        secret: Optional[str] = None,
+        routes: str = "",
+        sample_rate: float = 0.01,
+        output_dir: str = "profiles",
+        max_files: int = 50,
+        interval: float = 0.001,
+    ):
+        # Imported lazily, pyinstrument is only needed when profiling is configured
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        self._profiler_class = Profiler
+        self._renderer_class = SpeedscopeRenderer
+        self.app = app
+        self.enabled = enabled
+        self.secret = secret
+        self.routes = tuple(route.strip() for route in routes.split(",") if route.strip())
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.interval = interval
+
+    def _should_profile(self, scope) -> bool:
+        path = scope["path"]
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return verify_profile_token(self.secret, value.decode("latin-1"), path)
+        if not self.enabled:
+            return False
+        if self.routes and not path.startswith(self.routes):
+            return False
+        return random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # async_mode keeps samples from other concurrent requests out of this profile
+        profiler = self._profiler_class(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            await anyio.to_thread.run_sync(self._write_profile, profiler, scope["method"], route)
+
+    def _write_profile(self, profiler, method: str, route: str):
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}-{method}-{slug}.speedscope.json"
+        with open(os.path.join(self.output_dir, filename), "w") as output:
+            output.write(profiler.output(self._renderer_class()))
+        self._rotate()
+
+    def _rotate(self):
+        if self.max_files <= 0:
+            return
+        profiles = sorted(
+            (entry for entry in os.scandir(self.output_dir) if entry.name.endswith(".speedscope.json")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in profiles[:-self.max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,23 @@
+from app.services.request_scope import start_request_scope, stop_request_scope
+
+
+class RequestScopeMiddleware:
+    """Pure ASGI middleware giving each HTTP request its own RequestScope.
+
+    The scope holds the request's identity map of Mongo documents and its
+    count of Mongo round trips; see app.services.request_scope.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        _, token = start_request_scope()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stop_request_scope(token)
@@ -0,0 +1,43 @@
+import codecs
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.services.import_service import IMPORT_FORMATS, FoodLogImporter, read_rows
+from app.services.mongodb_service import MongoDBService, get_mongodb_service
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_admin_key: str = Header(None)):
+    admin_api_key = get_settings().admin_api_key
+    if not admin_api_key:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, admin_api_key):
+        raise HTTPException(status_code=403, detail="Invalid admin key")
+
+
+@router.post("/import/food-logs", dependencies=[Depends(require_admin)])
+async def import_food_logs(
+    file: UploadFile = File(...),
+    format: str = Query("jsonl", description="jsonl or csv"),
+    import_id: Optional[str] = None,
+    chunk_size: Optional[int] = Query(None, ge=1),
+    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+):
+    """Import historical food entries; pass the same import_id to resume an interrupted import."""
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be jsonl or csv")
+
+    importer = FoodLogImporter(
+        mongodb_service, import_id=import_id, chunk_size=chunk_size or get_settings().import_chunk_size
+    )
+    # The upload is spooled to disk; it is read and written a chunk at a time in the threadpool
+    stream = codecs.getreader("utf-8")(file.file)
+    try:
+        return await run_in_threadpool(importer.run, read_rows(stream, format))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import file: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Header, status
 from fastapi.responses import HTMLResponse
+from starlette.concurrency import run_in_threadpool
 from app.services.firebase_service import (
+    get_firebase_app,
     verify_token,
     create_user,
     verify_email_verification_code,
@@ -10,7 +12,9 @@ from app.services.firebase_service import (
 )
 from pydantic import BaseModel, Field
 from firebase_admin import auth  # Import the `auth` module from Firebase Admin SDK
-from app.services.mongodb_service import MongoDBService, get_mongodb_service
+from app.services.circuit_breaker import UpstreamUnavailable, service_unavailable
+from app.services.deadline import DeadlineExceeded
+from app.services.storage import StorageBackend, get_storage
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -39,14 +43,16 @@ class UpdatePasswordRequest(BaseModel):
 @router.post("/signup")
 async def signup(
     request: SignupRequest,
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     try:
-        # Create the user in Firebase
-        user = create_user(email=request.email, password=request.password)
+        # Create the user in Firebase; the Admin SDK blocks, so keep it off the event loop
+        user = await run_in_threadpool(create_user, email=request.email, password=request.password)
 
         # Generate an email verification link
-        email_verification_link = auth.generate_email_verification_link(request.email)
+        email_verification_link = await run_in_threadpool(
+            auth.generate_email_verification_link, request.email, app=get_firebase_app()
+        )
 
         # Send the verification email
         await send_verification_email(request.email, email_verification_link)
@@ -57,7 +63,7 @@ async def signup(
             "email": request.email,  # Include the email in the profile data
             "is_setup": False
         }
-        created = await mongodb_service.create_user_profile(user.uid, profile_data)
+        created = await storage.create_user_profile(user.uid, profile_data)
         if not created:
             raise HTTPException(
                 status_code=500,
@@ -94,13 +100,15 @@ async def verify_email(oob_code: str):
 async def login(request: LoginRequest):
     try:
         # Call the login_user function to verify credentials and get tokens
-        login_data = login_user(email=request.email, password=request.password)
+        login_data = await login_user(email=request.email, password=request.password)
         return {
             "message": "Login successful",
             "id_token": login_data["id_token"],
             "refresh_token": login_data["refresh_token"],
             "email": login_data["email"],
         }
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -109,7 +117,9 @@ async def login(request: LoginRequest):
 async def reset_password(request: ResetPasswordRequest):
     try:
         # Generate password reset link
-        reset_link = auth.generate_password_reset_link(request.email)
+        reset_link = await run_in_threadpool(
+            auth.generate_password_reset_link, request.email, app=get_firebase_app()
+        )
 
         # Send the link via email using the service function
         await send_password_reset_email(request.email, reset_link)
@@ -136,16 +146,21 @@ async def update_password(
         )
     id_token = authorization.split(" ")[1]  # Extract the token past "Bearer"
     try:
-        # Decode the ID token and verify the old password
-        decoded_token = auth.verify_id_token(id_token)
-        user_email = decoded_token["email"]
-        user = auth.get_user_by_email(user_email)
+        # Decode the ID token (checked locally against cached public keys)
+        decoded_token = verify_token(id_token)
 
         # Verify old password by re-authenticating the user
-        login_user(email=user_email, password=request.old_password)
+        await login_user(email=decoded_token["email"], password=request.old_password)
 
         # Update the password in Firebase
-        auth.update_user(user.uid, password=request.new_password)
+        await run_in_threadpool(
+            auth.update_user,
+            decoded_token["uid"],
+            password=request.new_password,
+            app=get_firebase_app(),
+        )
         return {"message": "Password updated successfully."}
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
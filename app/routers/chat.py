@@ -1,9 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
 from pydantic import BaseModel
 from typing import List, Optional
+from app.config import get_settings
+from app.services.chat_history import (
+    CHAT_MODEL,
+    MAX_UNSUMMARIZED_TURNS,
+    build_prompt,
+    estimate_tokens,
+    schedule_summary,
+)
+from app.services.circuit_breaker import UpstreamUnavailable, service_unavailable
+from app.services.deadline import DeadlineExceeded
 from app.services.firebase_service import verify_token
-from openai import OpenAI
-from app.config import settings
+from starlette.concurrency import run_in_threadpool
+from app.services.openai_service import create_chat_completion
+from app.services.storage import StorageBackend, get_storage
+from app.services.timing import timed
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -28,8 +40,16 @@ Be encouraging and supportive of users' health goals while maintaining a profess
 @router.post("/message")
 async def send_message(
     chat_message: ChatMessage,
-    authorization: str = Header(None)
+    authorization: str = Header(None),
+    storage: StorageBackend = Depends(get_storage),
 ):
+    """Reply to a message in the context of the user's conversation so far.
+
+    The prompt holds a rolling summary of older turns and the last
+    CHAT_HISTORY_TURNS turns verbatim, so its size stays flat however long
+    the conversation runs. Once the turns not yet summarized exceed
+    CHAT_HISTORY_TOKEN_BUDGET, the summary is refreshed in the background.
+    """
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=401,
@@ -37,32 +57,65 @@ async def send_message(
         )
 
     token = authorization[7:]  # Remove 'Bearer ' prefix
-    verify_token(token)  # Just verify the token without assignment
+    current_user = verify_token(token)
+    settings = get_settings()
 
     try:
-        # Initialize OpenAI client
-        client = OpenAI(api_key=settings.openai_api_key)
-
-        # Get response from OpenAI
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": SYSTEM_MESSAGE},
-                {"role": "user", "content": chat_message.message}
-            ],
-            max_tokens=500,
-            temperature=0.7,
-        )
+        history = await storage.get_chat_history(current_user["uid"], MAX_UNSUMMARIZED_TURNS)
+
+        # Get response from OpenAI, off the event loop
+        with timed("openai.chat"):
+            response = await run_in_threadpool(
+                create_chat_completion,
+                model=CHAT_MODEL,
+                messages=build_prompt(SYSTEM_MESSAGE, history, chat_message.message, settings.chat_history_turns),
+                max_tokens=500,
+                temperature=0.7,
+            )
 
         # Extract and return the AI's response
         ai_response = response.choices[0].message.content
 
+        tokens = estimate_tokens(chat_message.message) + estimate_tokens(ai_response)
+        await storage.add_chat_turn(
+            current_user["uid"], chat_message.message, ai_response, tokens, settings.chat_history_ttl
+        )
+        unsummarized = sum(turn["tokens"] for turn in history["turns"]) + tokens
+        if unsummarized > settings.chat_history_token_budget:
+            schedule_summary(storage, current_user["uid"])
+
         return {
             "response": ai_response
         }
 
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get chat response: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.delete("/history")
+async def delete_chat_history(
+    authorization: str = Header(None),
+    storage: StorageBackend = Depends(get_storage),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="Missing or invalid Authorization header"
+        )
+
+    token = authorization[7:]
+    current_user = verify_token(token)
+
+    try:
+        await storage.delete_chat_history(current_user["uid"], get_settings().chat_history_ttl)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to delete chat history: {str(e)}"
+        )
+    return {"message": "Chat history deleted successfully"}
@@ -1,10 +1,13 @@
 from datetime import date
 from enum import Enum
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from typing import List, Optional, Dict
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from app.services.export_service import EXPORT_FORMATS, encode_export
 from app.services.firebase_service import verify_token
-from app.services.mongodb_service import MongoDBService, get_mongodb_service
+from app.services.storage import StorageBackend, get_storage
 
 
 # Dependency to get the current user from the Firebase token
@@ -26,15 +29,37 @@ class MealType(str, Enum):
 class FoodEntry(BaseModel):
     food_name: str
     meal_type: MealType
-    calories: float
+    calories: float = Field(..., ge=0)
     serving_size: Optional[str] = None
     date: date
+    protein_grams: Optional[float] = Field(None, ge=0)
+    carbs_grams: Optional[float] = Field(None, ge=0)
+    fats_grams: Optional[float] = Field(None, ge=0)
+
+
+class FoodEntryUpdate(BaseModel):
+    food_name: Optional[str] = None
+    calories: Optional[float] = Field(None, ge=0)
+    serving_size: Optional[str] = None
+    protein_grams: Optional[float] = Field(None, ge=0)
+    carbs_grams: Optional[float] = Field(None, ge=0)
+    fats_grams: Optional[float] = Field(None, ge=0)
 
 
 class MealEntries(BaseModel):
+    entry_id: Optional[str] = None
     food_name: str
     calories: float
     serving_size: Optional[str] = None
+    protein_grams: Optional[float] = None
+    carbs_grams: Optional[float] = None
+    fats_grams: Optional[float] = None
+
+
+class Macros(BaseModel):
+    protein_grams: float = 0
+    carbs_grams: float = 0
+    fats_grams: float = 0
 
 
 class DailyFoodLog(BaseModel):
@@ -42,6 +67,10 @@ class DailyFoodLog(BaseModel):
     total_calories: float
     target_calories: float = 2000
     remaining_calories: float
+    # Absent on days logged before macros were tracked, until they are next written
+    macro_totals: Optional[Macros] = None
+    macro_targets: Optional[Macros] = None
+    macro_remaining: Optional[Macros] = None
     meals: Dict[str, List[MealEntries]]
 
 
@@ -49,7 +78,7 @@ class DailyFoodLog(BaseModel):
 async def log_food_entry(
     entry: FoodEntry,
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -64,22 +93,85 @@ async def log_food_entry(
         entry_dict = entry.dict()
         entry_dict["date"] = entry_dict["date"].isoformat()
 
-        result = await mongodb_service.add_food_entry(current_user["uid"], entry_dict)
-        if not result:
+        entry_id = await storage.add_food_entry(current_user["uid"], entry_dict)
+        if not entry_id:
             raise HTTPException(status_code=500, detail="Failed to log food entry")
 
-        return {"message": "Food entry logged successfully"}
+        return {"message": "Food entry logged successfully", "entry_id": entry_id}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid food entry: {str(e)}")
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to log food entry: {str(e)}"
         )
 
 
+@router.put("/entry/{entry_id}")
+async def update_food_entry(
+    entry_id: str,
+    date: date,
+    meal_type: MealType,
+    changes: FoodEntryUpdate,
+    authorization: str = Header(None),
+    storage: StorageBackend = Depends(get_storage),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401, detail="Missing or invalid Authorization header"
+        )
+
+    token = authorization[7:]
+    current_user = verify_token(token)
+
+    try:
+        updated = await storage.update_food_entry(
+            current_user["uid"], date.isoformat(), meal_type, entry_id, changes.dict(exclude_unset=True)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid food entry: {str(e)}")
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to update food entry: {str(e)}"
+        )
+    if not updated:
+        raise HTTPException(status_code=404, detail="Food entry not found")
+    return {"message": "Food entry updated successfully"}
+
+
+@router.delete("/entry/{entry_id}")
+async def delete_food_entry(
+    entry_id: str,
+    date: date,
+    meal_type: MealType,
+    authorization: str = Header(None),
+    storage: StorageBackend = Depends(get_storage),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401, detail="Missing or invalid Authorization header"
+        )
+
+    token = authorization[7:]
+    current_user = verify_token(token)
+
+    try:
+        deleted = await storage.delete_food_entry(
+            current_user["uid"], date.isoformat(), meal_type, entry_id
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to delete food entry: {str(e)}"
+        )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Food entry not found")
+    return {"message": "Food entry deleted successfully"}
+
+
 @router.get("/daily/{date}", response_model=DailyFoodLog)
 async def get_daily_log(
     date: date,
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -90,7 +182,7 @@ async def get_daily_log(
     current_user = verify_token(token)
 
     try:
-        daily_log = await mongodb_service.get_daily_food_log(current_user["uid"], date)
+        daily_log = await storage.get_daily_food_log(current_user["uid"], date)
         if not daily_log:
             return DailyFoodLog(
                 date=date,
@@ -109,7 +201,7 @@ async def get_daily_log(
 @router.get("/all", response_model=List[DailyFoodLog])
 async def get_all_food_logs(
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -120,9 +212,47 @@ async def get_all_food_logs(
     current_user = verify_token(token)
 
     try:
-        all_logs = await mongodb_service.get_all_user_food_logs(current_user["uid"])
+        all_logs = await storage.get_all_user_food_logs(current_user["uid"])
         return all_logs
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to get food logs: {str(e)}"
         )
+
+
+@router.get("/export")
+async def export_food_logs(
+    format: str = Query("csv", description="csv or ndjson"),
+    gzip: bool = False,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    authorization: str = Header(None),
+    storage: StorageBackend = Depends(get_storage),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401, detail="Missing or invalid Authorization header"
+        )
+
+    token = authorization[7:]
+    current_user = verify_token(token)
+
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be csv or ndjson")
+    media_type, extension = EXPORT_FORMATS[format]
+
+    rows = storage.iter_food_log_rows(
+        current_user["uid"],
+        start=start.isoformat() if start else None,
+        end=end.isoformat() if end else None,
+    )
+    filename = f"food-log.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", f"{filename}.gz"
+
+    # The cursor and encoding run in the threadpool, one chunk at a time
+    return StreamingResponse(
+        iterate_in_threadpool(encode_export(rows, format, gzip=gzip)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
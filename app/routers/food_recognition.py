@@ -1,23 +1,54 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.routers.food_logging import DailyFoodLog, MealType
+from app.services.circuit_breaker import UpstreamUnavailable, service_unavailable
+from app.services.deadline import DeadlineExceeded
+from app.services.firebase_service import verify_token
 from app.services.food_recognition_service import recognize_food_from_image
+from app.services.storage import StorageBackend, get_storage
 import logging
 import tempfile
 import os
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.post("/food-recognition")
-async def food_recognition(image: UploadFile = File(...)):
+async def food_recognition(
+    image: UploadFile = File(...),
+    date: Optional[date] = None,
+    meal_type: Optional[MealType] = None,
+    authorization: str = Header(None),
+    storage: StorageBackend = Depends(get_storage),
+):
+    """Recognize the food in a meal photo.
+
+    Given a ``date`` and ``meal_type``, the recognized items are also logged
+    to that meal in one write, and the updated daily log is returned with them.
+    """
     logger.info(f"Received image upload: {image.filename}")
     
     if not image.content_type.startswith('image/'):
         logger.error(f"Invalid content type: {image.content_type}")
         raise HTTPException(status_code=400, detail="File must be an image")
 
+    log_to = None
+    if date is not None or meal_type is not None:
+        if date is None or meal_type is None:
+            raise HTTPException(status_code=400, detail="Logging needs both date and meal_type")
+        if not authorization or not authorization.startswith("Bearer "):
+            raise HTTPException(
+                status_code=401, detail="Missing or invalid Authorization header"
+            )
+        # Checked before the image is sent, so a bad token costs no tokens
+        current_user = verify_token(authorization[7:])
+        log_to = (current_user["uid"], date.isoformat(), meal_type)
+
     try:
         # Create temporary file
         with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
@@ -33,16 +64,25 @@ async def food_recognition(image: UploadFile = File(...)):
 
         try:
             # Use the actual food recognition service
-            result = recognize_food_from_image(temp_file_path)
+            result = await run_in_threadpool(recognize_food_from_image, temp_file_path, image.content_type)
             logger.info(f"Recognition result: {result}")
             
             # Format the response according to the expected structure
             response_data = {
                 "calories": {
-                    "total": sum(float(item.get('calories', 0)) for item in result.get('food_items', []))
+                    "total": result["total"]
                 },
-                "food_items": result.get('food_items', [])
+                "food_items": result["food_items"]
             }
+
+            if log_to is not None:
+                user_id, date_str, meal = log_to
+                entries = [
+                    {"food_name": item["name"], "calories": item["calories"], "serving_size": item["serving"]}
+                    for item in result["food_items"]
+                ]
+                daily_log = await storage.add_food_entries(user_id, date_str, meal, entries)
+                response_data["daily_log"] = jsonable_encoder(DailyFoodLog(**daily_log))
             
             logger.info(f"Sending response: {response_data}")
             return JSONResponse(content=response_data)
@@ -53,6 +93,8 @@ async def food_recognition(image: UploadFile = File(...)):
                 os.unlink(temp_file_path)
                 logger.info("Cleaned up temporary file")
 
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise service_unavailable(e)
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from fastapi.security import OAuth2PasswordBearer
-from app.services.fatsecret_service import FatSecretService
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.services.circuit_breaker import UpstreamUnavailable, service_unavailable
+from app.services.deadline import DeadlineExceeded
+from app.services.fatsecret_service import SEARCH_RESULT_FIELDS, FatSecretService, normalize_gtin
 from app.services.firebase_service import verify_token
+from app.services.storage import StorageBackend, get_storage
 
 router = APIRouter(
     prefix="/food",
@@ -13,6 +19,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 @router.get("/search")
 async def search_food(
     query: str,
+    fields: Optional[str] = None,
     authorization: str = Header(None),
     fatsecret_service: FatSecretService = Depends()
 ):
@@ -24,8 +31,62 @@ async def search_food(
 
     token = authorization[7:]
     verify_token(token)
+
+    # Optional comma-separated projection, e.g. fields=food_name,calories
+    selected = None
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(selected) - set(SEARCH_RESULT_FIELDS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+
     try:
-        results = fatsecret_service.search_foods(query)
+        results = await run_in_threadpool(fatsecret_service.search_foods, query)
+        if selected:
+            results = [{field: result[field] for field in selected} for result in results]
         return {"results": results}
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise service_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/barcode/{gtin}")
+async def lookup_barcode(
+    gtin: str,
+    authorization: str = Header(None),
+    fatsecret_service: FatSecretService = Depends(),
+    storage: StorageBackend = Depends(get_storage),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="Missing or invalid Authorization header",
+        )
+
+    token = authorization[7:]
+    verify_token(token)
+    try:
+        gtin = normalize_gtin(gtin)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Known codes (and recently unknown ones) are answered from Mongo
+        cached = await storage.get_cached_barcode(gtin)
+        if cached is not None:
+            food = cached["food"]
+        else:
+            food = await run_in_threadpool(fatsecret_service.lookup_barcode, gtin)
+            await storage.cache_barcode(gtin, food, get_settings().barcode_negative_ttl)
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise service_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    if food is None:
+        raise HTTPException(status_code=404, detail="No food found for this barcode")
+    return {"result": food}
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from pydantic import BaseModel
 from app.services.firebase_service import verify_token
-from app.services.mongodb_service import MongoDBService, get_mongodb_service
+from app.services.storage import StorageBackend, get_storage
 from app.services.nutrition_service import calculate_nutrition_for_user
 
 router = APIRouter(prefix="/insights", tags=["insights"])
@@ -16,7 +16,7 @@ class MacronutrientDistribution(BaseModel):
 @router.get("/nutrition", response_model=MacronutrientDistribution)
 async def get_nutrition(
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -28,7 +28,7 @@ async def get_nutrition(
     current_user = verify_token(token)
 
     try:
-        tdee, macros = await calculate_nutrition_for_user(current_user["uid"], mongodb_service)
+        tdee, macros = await calculate_nutrition_for_user(current_user["uid"], storage)
 
         return MacronutrientDistribution(
             tdee=tdee,
@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException, Depends, Header
 from typing import List, Optional
 from pydantic import BaseModel, root_validator
 from app.services.firebase_service import verify_token
-from app.services.mongodb_service import MongoDBService, get_mongodb_service
+from app.services.storage import StorageBackend, get_storage
 from app.services.nutrition_service import calculate_nutrition_for_user
 
 
@@ -166,7 +166,7 @@ class UserProfileUpdate(BaseModel):
 @router.get("/profile")
 async def get_profile(
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -179,7 +179,7 @@ async def get_profile(
     except Exception as e:
         raise HTTPException(status_code=403, detail=f"Invalid token: {str(e)}")
 
-    profile = await mongodb_service.get_user_profile(current_user["uid"])
+    profile = await storage.get_user_profile(current_user["uid"])
     if profile:
         return {"message": "Profile retrieved successfully", "profile_data": profile}
     else:
@@ -190,7 +190,7 @@ async def get_profile(
 async def create_profile(
     profile_data: UserProfileCreate,
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -202,7 +202,7 @@ async def create_profile(
     current_user = verify_token(token)
 
     # Retrieve the existing profile, preliminary or otherwise
-    existing_profile = await mongodb_service.get_user_profile(current_user["uid"])
+    existing_profile = await storage.get_user_profile(current_user["uid"])
 
     if existing_profile:
         if not existing_profile.get("is_setup"):
@@ -210,7 +210,7 @@ async def create_profile(
             profile_data_dict = profile_data.dict()
             profile_data_dict["is_setup"] = True  # Ensure setup is marked complete
             profile_data_dict["birthdate"] = profile_data_dict["birthdate"].isoformat()
-            success = await mongodb_service.update_user_profile(
+            success = await storage.update_user_profile(
                 current_user["uid"], profile_data_dict
             )
             if not success:
@@ -219,7 +219,7 @@ async def create_profile(
                     detail="Failed to update existing preliminary profile",
                 )
             # Calculate and store insights
-            await calculate_nutrition_for_user(current_user["uid"], mongodb_service)
+            await calculate_nutrition_for_user(current_user["uid"], storage)
             return {
                 "message": "Profile updated successfully",
                 "profile_data": profile_data.dict(),
@@ -233,13 +233,13 @@ async def create_profile(
         profile_data_dict = profile_data.dict()
         profile_data_dict["birthdate"] = profile_data_dict["birthdate"].isoformat()
         profile_data_dict["is_setup"] = True  # Mark setup as complete upon creation
-        success = await mongodb_service.create_user_profile(
+        success = await storage.create_user_profile(
             current_user["uid"], profile_data_dict
         )
         if not success:
             raise HTTPException(status_code=500, detail="Failed to create profile")
         # Calculate and store insights
-        await calculate_nutrition_for_user(current_user["uid"], mongodb_service)
+        await calculate_nutrition_for_user(current_user["uid"], storage)
         return {
             "message": "Profile created successfully",
             "profile_data": profile_data.dict(),
@@ -250,7 +250,7 @@ async def create_profile(
 async def update_profile(
     profile_data: UserProfileUpdate,
     authorization: str = Header(None),
-    mongodb_service: MongoDBService = Depends(get_mongodb_service),
+    storage: StorageBackend = Depends(get_storage),
 ):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -261,7 +261,7 @@ async def update_profile(
     token = authorization[7:]
     current_user = verify_token(token)
 
-    existing_profile = await mongodb_service.get_user_profile(current_user["uid"])
+    existing_profile = await storage.get_user_profile(current_user["uid"])
     if not existing_profile:
         raise HTTPException(
             status_code=404, detail="Profile not found. Use POST to create."
@@ -271,14 +271,14 @@ async def update_profile(
     if existing_profile.get("is_setup") is False:
         profile_data_dict = profile_data.dict(exclude_unset=True)
         profile_data_dict["is_setup"] = True  # Mark as fully setup after update
-        success = await mongodb_service.update_user_profile(
+        success = await storage.update_user_profile(
             current_user["uid"], profile_data_dict
         )
         if not success:
             raise HTTPException(status_code=500, detail="Failed to update profile")
 
         # Calculate and store insights
-        await calculate_nutrition_for_user(current_user["uid"], mongodb_service)
+        await calculate_nutrition_for_user(current_user["uid"], storage)
         return {"message": "Profile updated successfully"}
     else:
         # Normal update process for already fully setup profiles
@@ -286,12 +286,12 @@ async def update_profile(
             k: v.isoformat() if k == "birthdate" and v is not None else v
             for k, v in profile_data.dict(exclude_unset=True).items()
         }
-        result = await mongodb_service.update_user_profile(
+        result = await storage.update_user_profile(
             current_user["uid"], profile_dict
         )
         if not result:
             raise HTTPException(status_code=500, detail="Failed to update profile")
 
         # Calculate and store insights
-        await calculate_nutrition_for_user(current_user["uid"], mongodb_service)
+        await calculate_nutrition_for_user(current_user["uid"], storage)
         return {"message": "Profile updated successfully"}
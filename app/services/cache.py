@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.services.metrics import CACHE_LOOKUPS
+
+
+class TTLCache:
+    """Bounded, thread-safe in-process cache with per-entry expiry.
+
+    Least recently used entries are evicted beyond ``maxsize``. Entries expire
+    after ``ttl`` seconds, which bounds how long a value written by another
+    worker process can be served stale. Expired entries stay until evicted, so
+    ``get_stale`` can still serve them when the source is unavailable.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hit = CACHE_LOOKUPS.labels(cache=name, outcome="hit")
+        self._miss = CACHE_LOOKUPS.labels(cache=name, outcome="miss")
+        self._stale = CACHE_LOOKUPS.labels(cache=name, outcome="stale")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hit.inc()
+                    return value
+        self._miss.inc()
+        return None
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Return a value even if it has expired, for when it cannot be refreshed."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._stale.inc()
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
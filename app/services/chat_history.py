@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Dict, List, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.services.openai_service import create_chat_completion
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# Unsummarized turns read per request; summaries keep there being far fewer
+MAX_UNSUMMARIZED_TURNS = 50
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a MealMeter user and its nutrition "
+    "assistant for the assistant's later reference. Keep the user's goals, "
+    "preferences, dietary constraints and any facts they shared; drop small talk."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly count the tokens of English text, at about 4 characters a token."""
+    return len(text) // 4 + 1
+
+
+def build_prompt(system_message: str, history: Dict[str, Any], message: str, turns: int) -> List[Dict[str, str]]:
+    """Return the messages for a reply: the summary of older turns, the last ``turns`` turns and the new message.
+
+    Its size does not depend on how long the conversation has run.
+    """
+    messages = [{"role": "system", "content": system_message}]
+    if history.get("summary"):
+        messages.append({"role": "system", "content": f"Summary of the conversation so far: {history['summary']}"})
+    for turn in history["turns"][-turns:] if turns else []:
+        messages.append({"role": "user", "content": turn["message"]})
+        messages.append({"role": "assistant", "content": turn["reply"]})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+async def _summarize(previous: str, turns: List[Dict[str, Any]], max_tokens: int) -> str:
+    transcript = "\n".join(f"User: {turn['message']}\nAssistant: {turn['reply']}" for turn in turns)
+    if previous:
+        transcript = f"Earlier summary: {previous}\n\n{transcript}"
+    response = await run_in_threadpool(
+        create_chat_completion,
+        operation="chat_summary",
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ],
+        max_tokens=max_tokens,
+        temperature=0,
+    )
+    return response.choices[0].message.content
+
+
+async def summarize_chat(storage, user_id: str):
+    """Fold all but the last turns of a user's conversation into its rolling summary.
+
+    Turns are folded in oldest first, at most MAX_UNSUMMARIZED_TURNS per
+    completion, so a summary only ever claims turns it was given.
+    """
+    settings = get_settings()
+    keep = settings.chat_history_turns
+    page_size = MAX_UNSUMMARIZED_TURNS + keep
+    while True:
+        history = await storage.get_chat_history(user_id, page_size, oldest_first=True)
+        turns = history["turns"][:-keep or None]
+        if not turns:
+            return
+        summary = await _summarize(history.get("summary"), turns, settings.chat_summary_max_tokens)
+        saved = await storage.save_chat_summary(user_id, summary, turns[-1]["created_at"], settings.chat_history_ttl)
+        # Done once a page is not full, or when another worker has summarized further meanwhile
+        if not saved or len(history["turns"]) < page_size:
+            return
+
+
+# Users whose summary is being refreshed by this worker, and the tasks doing it
+_summarizing: Set[str] = set()
+_summary_tasks: Set[asyncio.Task] = set()
+
+
+async def _refresh_summary(storage, user_id: str):
+    try:
+        await summarize_chat(storage, user_id)
+    except Exception as e:
+        # The turns stay unsummarized and are tried again after the next message
+        logger.warning("Failed to summarize the chat of %s: %s", user_id, e)
+    finally:
+        _summarizing.discard(user_id)
+
+
+def schedule_summary(storage, user_id: str):
+    """Refresh a user's summary in the background, unless this worker is already at it."""
+    if user_id in _summarizing:
+        return
+    _summarizing.add(user_id)
+    # Started in an empty context, so it is not bound by the request's deadline
+    task = contextvars.Context().run(asyncio.ensure_future, _refresh_summary(storage, user_id))
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
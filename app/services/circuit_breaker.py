@@ -0,0 +1,177 @@
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.services.deadline import DeadlineExceeded, expired
+from app.services.metrics import CIRCUIT_BREAKER_CALLS, CIRCUIT_BREAKER_STATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+_STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half-open", OPEN: "open"}
+
+
+class UpstreamUnavailable(RuntimeError):
+    """An upstream call failed, or was not made because the upstream's circuit is open."""
+
+    def __init__(self, upstream: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures, then probe it for recovery.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls
+    fail at once with UpstreamUnavailable. After ``reset_timeout`` seconds one
+    call is let through as a probe (half-open): its success closes the circuit,
+    its failure opens it again. ``is_failure`` decides which exceptions mean
+    the upstream is in trouble; other errors, such as a rejected password, are
+    answers and count as successes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_failure: Callable[[BaseException], bool],
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._gauge = CIRCUIT_BREAKER_STATE.labels(upstream=name)
+        self._gauge.set(CLOSED)
+
+    @property
+    def state(self) -> int:
+        return self._state
+
+    def _set_state(self, state: int):
+        if state != self._state:
+            logger.warning("Circuit of %s is now %s", self.name, _STATE_NAMES[state])
+            self._state = state
+            self._gauge.set(state)
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self._reject(remaining)
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    self._reject(1.0)
+                self._probing = True
+
+    def _reject(self, retry_after: float):
+        CIRCUIT_BREAKER_CALLS.labels(upstream=self.name, outcome="rejected").inc()
+        raise UpstreamUnavailable(self.name, f"{self.name} is unavailable, try again later", retry_after)
+
+    def _on_success(self):
+        CIRCUIT_BREAKER_CALLS.labels(upstream=self.name, outcome="success").inc()
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def _on_failure(self, error: BaseException):
+        CIRCUIT_BREAKER_CALLS.labels(upstream=self.name, outcome="failure").inc()
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+        return UpstreamUnavailable(self.name, f"{self.name} request failed: {error}")
+
+    def _on_cancel(self):
+        # A cancelled call, e.g. when its request ran out of time or the client
+        # went away, says nothing about the upstream; it only frees the probe
+        with self._lock:
+            self._probing = False
+
+    def _on_error(self, error: Exception) -> Exception:
+        """Return the exception to raise for a failed call."""
+        if not self.is_failure(error):
+            self._on_success()
+            return error
+        if expired():
+            # The request ran out of time, which says nothing about the upstream
+            with self._lock:
+                self._probing = False
+            return DeadlineExceeded("Request deadline exceeded")
+        return self._on_failure(error)
+
+    def call(self, func: Callable, *args, **kwargs):
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            error = self._on_error(e)
+            if error is e:
+                raise
+            raise error from e
+        except BaseException:
+            self._on_cancel()
+            raise
+        self._on_success()
+        return result
+
+    async def call_async(self, func: Callable, *args, **kwargs):
+        self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            error = self._on_error(e)
+            if error is e:
+                raise
+            raise error from e
+        except BaseException:
+            self._on_cancel()
+            raise
+        self._on_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, is_failure: Callable[[BaseException], bool]) -> CircuitBreaker:
+    """Return this worker's breaker for an upstream, creating it on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                settings = get_settings()
+                breaker = CircuitBreaker(
+                    name,
+                    is_failure,
+                    failure_threshold=settings.circuit_breaker_failure_threshold,
+                    reset_timeout=settings.circuit_breaker_reset_timeout,
+                )
+                _breakers[name] = breaker
+    return breaker
+
+
+def service_unavailable(error: Exception) -> HTTPException:
+    """Return the 503 for a route whose upstream is unavailable, or the 504 when its time ran out."""
+    if isinstance(error, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(error))
+    headers = {"Retry-After": str(math.ceil(error.retry_after))} if error.retry_after else None
+    return HTTPException(status_code=503, detail=str(error), headers=headers)
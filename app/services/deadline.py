@@ -0,0 +1,50 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import pymongo
+
+# Monotonic time by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before an upstream call could be made."""
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Give the code run inside a budget of ``seconds``.
+
+    Upstream clients size their timeouts with ``timeout_for``. Mongo
+    operations share the budget through pymongo's own timeout, which sends
+    what is left of it as each command's maxTimeMS.
+    """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        with pymongo.timeout(seconds):
+            yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left of the current request's budget, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout_for(default: float) -> float:
+    """Return the timeout for an upstream call: ``default``, capped by the time left."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, left)
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Any, Dict, Optional
+
+import aiosmtplib
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.services.metrics import EMAIL_OUTBOX_DEPTH, EMAILS_SENT
+from app.services.storage import StorageBackend, get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class EmailSender:
+    """Deliver emails from the outbox collection over one reused SMTP connection.
+
+    Requests only enqueue; this sender claims due emails in batches, sends
+    them and retries failures with exponential backoff. It runs on its own
+    thread and event loop, so its (blocking) outbox queries never hold up
+    request handling.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[StorageBackend] = None,
+        batch_size: int = 20,
+        poll_interval: float = 1.0,
+        max_attempts: int = 5,
+        backoff_base: float = 30.0,
+        backoff_max: float = 3600.0,
+        idle_timeout: float = 30.0,
+        sent_ttl: float = 7 * 24 * 3600,
+    ):
+        self.storage = storage
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_timeout = idle_timeout
+        self.sent_ttl = sent_ttl
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._last_used = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), name="email-sender", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    async def stop(self, timeout: float = 10.0):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            await run_in_threadpool(self._thread.join, timeout)
+            self._thread = None
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._ready.set()
+        try:
+            await self._run()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await self._disconnect()
+
+    def retry_delay(self, attempts: int) -> Optional[float]:
+        """Seconds to wait after ``attempts`` failures, or None to give up."""
+        if attempts >= self.max_attempts:
+            return None
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    async def _run(self):
+        while True:
+            try:
+                if self.storage is None:
+                    # Keep retrying if Mongo is down
+                    self.storage = get_storage()
+                sent = await self.send_batch()
+                EMAIL_OUTBOX_DEPTH.set(await self.storage.count_outbox_emails())
+            except Exception:
+                logger.exception("Email outbox pass failed")
+                sent = 0
+            # A full batch means more may be waiting. Polling rather than
+            # waking per enqueue keeps the outbox queries off the request path
+            # and lets busy periods go out in batches.
+            if sent < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+                # Let an idle connection go rather than have the server drop it
+                if time.monotonic() - self._last_used > self.idle_timeout:
+                    await self._disconnect()
+
+    async def send_batch(self) -> int:
+        """Send one batch of due emails and return how many were claimed."""
+        emails = await self.storage.claim_outbox_emails(
+            self.batch_size, lease_seconds=max(60.0, self.poll_interval * 10)
+        )
+        sent_ids = []
+        for email in emails:
+            try:
+                await self._send(email)
+                sent_ids.append(email["_id"])
+                EMAILS_SENT.labels("sent").inc()
+            except Exception as e:
+                await self._disconnect()
+                retry_in = self.retry_delay(email.get("attempts", 0) + 1)
+                EMAILS_SENT.labels("failed" if retry_in is None else "retry").inc()
+                logger.warning("Sending email to %s failed: %s", email["recipient"], e)
+                await self.storage.reschedule_email(email["_id"], str(e), retry_in)
+        if sent_ids:
+            await self.storage.mark_emails_sent(sent_ids, self.sent_ttl)
+        return len(emails)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        if self._smtp is None or not self._smtp.is_connected:
+            settings = get_settings()
+            smtp = aiosmtplib.SMTP(
+                hostname=settings.require("mail_server"),
+                port=settings.require("mail_port"),
+                start_tls=True,  # Gmail requires STARTTLS
+                timeout=30,
+            )
+            await smtp.connect()
+            await smtp.login(settings.require("mail_username"), settings.require("mail_password"))
+            self._smtp = smtp
+        return self._smtp
+
+    async def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+    async def _send(self, email: Dict[str, Any]):
+        settings = get_settings()
+        message = EmailMessage()
+        # Just the address when no display name is set
+        message["From"] = formataddr((settings.mail_from_name, settings.require("mail_from")))
+        message["To"] = email["recipient"]
+        message["Subject"] = email["subject"]
+        message.set_content(email["body"], subtype="html")
+        smtp = await self._connect()
+        await smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+
+_sender: Optional[EmailSender] = None
+
+
+def start_email_sender():
+    """Start the background sender of this worker, if email is configured."""
+    global _sender
+    settings = get_settings()
+    if not settings.email_sender_enabled or not settings.mail_server:
+        return
+    _sender = EmailSender(
+        batch_size=settings.email_batch_size,
+        max_attempts=settings.email_max_attempts,
+        sent_ttl=settings.email_sent_ttl,
+    )
+    _sender.start()
+
+
+async def stop_email_sender():
+    global _sender
+    if _sender is not None:
+        sender, _sender = _sender, None
+        await sender.stop()
+
+
+async def enqueue_email(recipient: str, subject: str, body: str) -> str:
+    """Store an email in the outbox; it is sent in the background."""
+    return await get_storage().enqueue_email(recipient, subject, body)
@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import zlib
+from typing import Any, Dict, Iterable, Iterator
+
+from app.services.mongodb_service import MACROS
+
+EXPORT_COLUMNS = (
+    "date",
+    "meal_type",
+    "entry_id",
+    "food_name",
+    "calories",
+    *MACROS,
+    "serving_size",
+    "time_logged",
+)
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# Rows encoded together before a chunk is handed to the response
+ROWS_PER_CHUNK = 500
+
+
+def _encode_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: row.get(column) for column in EXPORT_COLUMNS}, separators=(",", ":")))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def encode_export(rows: Iterable[Dict[str, Any]], export_format: str, gzip: bool = False) -> Iterator[bytes]:
+    """Encode food log rows as CSV or NDJSON chunks, holding one chunk in memory at a time."""
+    chunks = _encode_csv(rows) if export_format == "csv" else _encode_ndjson(rows)
+    return _gzip(chunks) if gzip else chunks
@@ -1,26 +1,132 @@
+import logging
 import os
+import re
+import time
 import requests
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 from fastapi import Depends
+from app.config import get_settings
+from app.services.cache import TTLCache
+from app.services.circuit_breaker import UpstreamUnavailable, get_circuit_breaker
+from app.services.deadline import timeout_for
+from app.services.timing import timed
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# e.g. "Per 100g - Calories: 89kcal | Fat: 0.33g | Carbs: 22.84g | Protein: 1.09g"
+_SERVING_PATTERN = re.compile(r"^\s*Per\s+(.+?)\s+-\s+")
+_NUTRIENT_PATTERN = re.compile(r"(Calories|Fat|Carbs|Protein):\s*([\d.,]+)\s*(?:kcal|g)", re.IGNORECASE)
+# Named as on food log entries, so a result can be logged as is
+_NUTRIENT_FIELDS = {
+    "calories": "calories",
+    "fat": "fats_grams",
+    "carbs": "carbs_grams",
+    "protein": "protein_grams",
+}
+
+# Fields kept from FatSecret's own result, then the parsed ones
+_FOOD_FIELDS = ("food_id", "food_name", "food_type", "brand_name", "food_url", "food_description")
+SEARCH_RESULT_FIELDS = _FOOD_FIELDS + ("serving_size", "calories", "protein_grams", "carbs_grams", "fats_grams")
+
+
+def parse_food_description(description: Optional[str]) -> Dict[str, Any]:
+    """Parse a FatSecret food_description into a serving size and nutrient amounts.
+
+    Anything that cannot be read is left as None.
+    """
+    parsed = {"serving_size": None, **{field: None for field in _NUTRIENT_FIELDS.values()}}
+    if not description:
+        return parsed
+    serving = _SERVING_PATTERN.match(description)
+    if serving:
+        parsed["serving_size"] = serving.group(1)
+    for name, amount in _NUTRIENT_PATTERN.findall(description):
+        try:
+            parsed[_NUTRIENT_FIELDS[name.lower()]] = float(amount.replace(",", ""))
+        except ValueError:
+            pass
+    return parsed
+
+
+class FatSecretError(requests.exceptions.RequestException):
+    """FatSecret answered, but with an error instead of a result.
+
+    A RequestException, so it counts against the circuit breaker like any
+    other failed call.
+    """
+
+
+def parse_food(food: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a search result with its nutrients as typed fields."""
+    result = {field: food.get(field) for field in _FOOD_FIELDS}
+    result.update(parse_food_description(food.get("food_description")))
+    return result
+
+def normalize_gtin(barcode: str) -> str:
+    """Return a scanned UPC-A, EAN-8, EAN-13 or GTIN-14 code as the GTIN-13 FatSecret expects."""
+    if not barcode.isdigit() or len(barcode) not in (8, 12, 13, 14):
+        raise ValueError("Barcode must be an 8, 12, 13 or 14 digit GTIN")
+    if len(barcode) == 14:
+        if barcode[0] != "0":
+            raise ValueError("GTIN-14 codes of trade units are not supported")
+        return barcode[1:]
+    return barcode.zfill(13)
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_food_details(food: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a food.get result in the shape of a parsed search result, using its default serving."""
+    servings = (food.get("servings") or {}).get("serving") or []
+    if isinstance(servings, dict):
+        servings = [servings]
+    serving = next((s for s in servings if s.get("is_default") == "1"), servings[0] if servings else {})
+    result = {field: food.get(field) for field in _FOOD_FIELDS}
+    result.update({
+        "serving_size": serving.get("serving_description"),
+        "calories": _to_float(serving.get("calories")),
+        "protein_grams": _to_float(serving.get("protein")),
+        "carbs_grams": _to_float(serving.get("carbohydrate")),
+        "fats_grams": _to_float(serving.get("fat")),
+    })
+    return result
+
+
 class FatSecretService:
+    # OAuth2 token shared by every instance; the service is created per request
+    _cached_token = None
+    _search_cache = None
+
     def __init__(self):
         self.client_id = os.getenv("FATSECRET_CLIENT_ID")
         self.client_secret = os.getenv("FATSECRET_CLIENT_SECRET")
-        self.base_url = "https://platform.fatsecret.com/rest/server.api"
+        self.base_url = os.getenv("FATSECRET_API_URL", "https://platform.fatsecret.com/rest/server.api")
+        self.auth_url = os.getenv("FATSECRET_AUTH_URL", "https://oauth.fatsecret.com/connect/token")
+        self.timeout = get_settings().fatsecret_timeout
+        self.breaker = get_circuit_breaker(
+            "fatsecret", lambda error: isinstance(error, requests.exceptions.RequestException)
+        )
 
     def _get_access_token(self):
-        # Check if we have a valid cached token
-        if hasattr(self, '_cached_token') and self._cached_token:
-            return self._cached_token['access_token']
+        # Check if we have a valid cached token, shared by all instances
+        cached = FatSecretService._cached_token
+        if cached and cached["expires_at"] > time.monotonic():
+            return cached["access_token"]
 
         # Get new token from FatSecret OAuth2 endpoint
-        auth_url = "https://oauth.fatsecret.com/connect/token"
+        auth_url = self.auth_url
         auth_data = {
             "grant_type": "client_credentials",
-            "scope": "basic"
+            # food.find_id_for_barcode is only allowed with the barcode scope
+            "scope": "basic barcode"
         }
         auth = (self.client_id, self.client_secret)
 
@@ -30,41 +136,102 @@ class FatSecretService:
                 data=auth_data,
                 auth=auth,
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=timeout_for(self.timeout),
             )
             response.raise_for_status()
 
-            # Cache the token with expiration time
-            self._cached_token = response.json()
-            return self._cached_token['access_token']
+            # Cache the token with expiration time, refreshing a minute early
+            token = response.json()
+            token["expires_at"] = time.monotonic() + float(token.get("expires_in", 3600)) - 60
+            FatSecretService._cached_token = token
+            return token["access_token"]
 
         except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to get access token: {str(e)}")
+            # Still a RequestException, so it counts against the circuit breaker
+            raise requests.exceptions.RequestException(f"Failed to get access token: {str(e)}") from e
 
-    def search_foods(self, query: str):
-        params = {
-            "method": "foods.search",
-            "search_expression": query,
-            "format": "json"
-        }
+    def prefetch_token(self):
+        """Fetch an access token ahead of the first search."""
+        self._get_access_token()
+
+    @classmethod
+    def search_cache(cls) -> TTLCache:
+        if cls._search_cache is None:
+            settings = get_settings()
+            cls._search_cache = TTLCache("food_search", settings.food_search_cache_size, settings.food_search_cache_ttl)
+        return cls._search_cache
 
+    def search_foods(self, query: str) -> List[Dict[str, Any]]:
+        """Search foods, returning parsed results; repeated queries are served from cache.
+
+        While FatSecret is unavailable, expired results of the query are served
+        if there are any.
+        """
+        key = " ".join(query.lower().split())
+        cache = self.search_cache()
+        results = cache.get(key)
+        if results is None:
+            try:
+                results = [parse_food(food) for food in self._search_foods(query)]
+            except UpstreamUnavailable:
+                results = cache.get_stale(key)
+                if results is None:
+                    raise
+                logger.warning("Serving stale search results for %r", key)
+                return results
+            cache.set(key, results)
+        return results
+
+    def _request(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self.breaker.call(self._get, params)
+
+    def _get(self, params: Dict[str, Any]) -> Dict[str, Any]:
         headers = {
             "Authorization": f"Bearer {self._get_access_token()}"
         }
 
         response = requests.get(
             self.base_url,
-            params=params,
+            params={**params, "format": "json"},
             headers=headers,
+            timeout=timeout_for(self.timeout),
         )
-        print(f"FatSecret API Response Status Code: {response.status_code}")
-        print(f"FatSecret API Response Content: {response.content}")
+        if response.status_code != 200:
+            logger.warning("FatSecret %s answered with status %s", params["method"], response.status_code)
         response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        
+
         try:
             response_json = response.json()
-            foods = response_json.get("foods", {}).get("food", [])
-            return foods
         except ValueError as e:
-            print(f"JSONDecodeError: {e}")
-            print(f"Response text: {response.text}")
-            return []
+            logger.warning("FatSecret %s answered with invalid JSON: %.200s", params["method"], response.text)
+            raise FatSecretError(f"FatSecret {params['method']} returned invalid JSON: {e}") from e
+        # Errors (e.g. a missing scope) come back with a 200 status
+        if "error" in response_json:
+            raise FatSecretError(f"FatSecret {params['method']} failed: {response_json['error']}")
+        return response_json
+
+    @timed("fatsecret.search_foods")
+    def _search_foods(self, query: str):
+        response_json = self._request({
+            "method": "foods.search",
+            "search_expression": query,
+        })
+        foods = response_json.get("foods", {}).get("food", [])
+        # A single match comes back as an object rather than a list
+        return [foods] if isinstance(foods, dict) else foods
+
+    @timed("fatsecret.lookup_barcode")
+    def lookup_barcode(self, gtin: str) -> Optional[Dict[str, Any]]:
+        """Return the food with this GTIN-13 as a parsed search result, or None if unknown."""
+        found = self._request({"method": "food.find_id_for_barcode", "barcode": gtin})
+        food_id = (found.get("food_id") or {}).get("value")
+        # "0" is FatSecret's answer for codes it does not know; anything else
+        # unexpected must not be cached as unknown
+        if food_id == "0":
+            return None
+        if not food_id:
+            raise FatSecretError(f"FatSecret returned no food_id for barcode {gtin}")
+        food = self._request({"method": "food.get.v2", "food_id": food_id}).get("food")
+        if not food:
+            raise FatSecretError(f"FatSecret returned no food for food_id {food_id}")
+        return parse_food_details(food)
@@ -1,68 +1,102 @@
+import base64
+import json
+import logging
+import threading
 import firebase_admin
+import httpx
 from firebase_admin import credentials, auth
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from app.config import settings
-import requests
-
-# Initialize Firebase
-cred = credentials.Certificate(settings.firebase_key_file)
-firebase_app = firebase_admin.initialize_app(cred)
-
-# Configure FastAPI-Mail
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME=settings.mail_from_name,
-    MAIL_STARTTLS=True,  # Gmail requires STARTTLS
-    MAIL_SSL_TLS=False,  # Set to False because we use STARTTLS
-    USE_CREDENTIALS=True,  # Enable authentication
-)
-
-
-# Function to create a user and send an email verification
+from app.config import get_settings
+from app.services.circuit_breaker import UpstreamUnavailable, get_circuit_breaker
+from app.services.deadline import DeadlineExceeded, timeout_for
+from app.services.email_service import enqueue_email
+from app.services.timing import timed
+
+logger = logging.getLogger(__name__)
+
+_firebase_app = None
+_firebase_lock = threading.Lock()
+_http_client = None
+
+
+def get_firebase_app():
+    """Initialize the Firebase Admin app on first use and return it."""
+    global _firebase_app
+    if _firebase_app is None:
+        with _firebase_lock:
+            if _firebase_app is None:
+                cred = credentials.Certificate(get_settings().require("firebase_key_file"))
+                _firebase_app = firebase_admin.initialize_app(cred)
+    return _firebase_app
+
+
+def close_firebase_app():
+    global _firebase_app
+    with _firebase_lock:
+        if _firebase_app is not None:
+            firebase_admin.delete_app(_firebase_app)
+            _firebase_app = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled HTTP client used for the identitytoolkit REST API."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=get_settings().firebase_auth_url,
+            timeout=httpx.Timeout(get_settings().identitytoolkit_timeout),
+            limits=httpx.Limits(max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+
+def prefetch_firebase_certificates():
+    """Fetch the public keys used to verify ID tokens into the verifier's cache.
+
+    Otherwise the first verify_token call of each process pays for this fetch.
+    """
+    # firebase_admin has no public hook for this, so reach for the verifier it
+    # uses internally and issue the same cached request it would make
+    verifier = auth._get_client(get_firebase_app())._token_verifier
+    verifier.request(url=verifier.id_token_verifier.cert_url, method="GET")
+
+
+# Function to create a user, in a single Admin API call
+@timed("firebase.create_user")
 def create_user(email: str, password: str):
     try:
-        # Check if the user already exists
-        user = auth.get_user_by_email(email)
-        print(f"User with email {email} already exists.")
-        return user
-    except firebase_admin.auth.UserNotFoundError:
-        # If the user doesn't exist, create a new one
-        user = auth.create_user(email=email, password=password)
-        return user
+        return auth.create_user(email=email, password=password, app=get_firebase_app())
+    except auth.EmailAlreadyExistsError:
+        raise ValueError(f"User with email {email} already exists")
     except Exception as e:
         raise ValueError(f"Error creating user: {e}")
 
 
-# Function to send the email verification link
+# Function to queue the email verification link
 async def send_verification_email(email: str, link: str):
-    message = MessageSchema(
-        subject="Verify Your Email",
-        recipients=[email],  # List of recipients
-        body=f"""
+    body = f"""
         <p>Hello,</p>
         <p>Thank you for signing up. Please verify your email by clicking the link below:</p>
         <p><a href="{link}">Verify Email</a></p>
         <p>If the above link doesn't work, copy and paste this URL into your browser: {link}</p>
-        """,
-        subtype="html",  # Send as HTML
-    )
-
-    fm = FastMail(conf)
+        """
     try:
-        await fm.send_message(message)
-        print(f"Verification email sent to {email}")
+        await enqueue_email(email, "Verify Your Email", body)
     except Exception as e:
-        print(f"Error sending email to {email}: {e}")
+        print(f"Error queueing verification email to {email}: {e}")
 
 
 # Function to verify Firebase ID token
+@timed("firebase.verify_token")
 def verify_token(id_token: str):
     try:
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = auth.verify_id_token(id_token, app=get_firebase_app())
         return decoded_token
     except Exception as e:
         raise ValueError("Invalid token") from e
@@ -72,21 +106,44 @@ def verify_token(id_token: str):
 def verify_email_verification_code(oob_code: str):
     try:
         # Apply the email verification action code
-        auth.apply_action_code(oob_code)
+        auth.apply_action_code(oob_code, app=get_firebase_app())
     except Exception as e:
         raise ValueError(f"Invalid or expired verification code: {e}")
 
 
-def login_user(email: str, password: str):
+def _id_token_claims(id_token: str) -> dict:
+    """Read the claims of an ID token without verifying its signature.
+
+    Only for tokens received directly from identitytoolkit over TLS; tokens
+    sent by clients go through verify_token.
+    """
+    payload = id_token.split(".")[1]
+    return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+
+async def _sign_in(api_key: str, payload: dict) -> httpx.Response:
+    response = await get_http_client().post(
+        "/v1/accounts:signInWithPassword",
+        params={"key": api_key},
+        json=payload,
+        timeout=timeout_for(get_settings().identitytoolkit_timeout),
+    )
+    # Rejected credentials are an answer; only server errors count against the breaker
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+
+@timed("firebase.login_user")
+async def login_user(email: str, password: str, require_verified: bool = True):
     try:
         # Get the Firebase Web API Key from the environment
-        api_key = settings.firebase_api_key
+        api_key = get_settings().require("firebase_api_key")
 
         # Login with email and password
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={api_key}"
         payload = {"email": email, "password": password, "returnSecureToken": True}
-
-        response = requests.post(url, json=payload)
+        breaker = get_circuit_breaker("identitytoolkit", lambda error: isinstance(error, httpx.HTTPError))
+        response = await breaker.call_async(_sign_in, api_key, payload)
         response_data = response.json()
 
         if response.status_code != 200:
@@ -94,9 +151,10 @@ def login_user(email: str, password: str):
                 response_data.get("error", {}).get("message", "Login failed")
             )
 
-        # Retrieve user details to check email verification status
-        user = auth.get_user_by_email(email)
-        if not user.email_verified:
+        # The returned ID token carries the email verification status, so no
+        # separate admin lookup of the user is needed
+        claims = _id_token_claims(response_data["idToken"])
+        if require_verified and not claims.get("email_verified"):
             raise ValueError(
                 "Email not verified. Please verify your email before logging in."
             )
@@ -108,26 +166,13 @@ def login_user(email: str, password: str):
             "email": response_data["email"],
             "local_id": response_data["localId"],
         }
+    except (UpstreamUnavailable, DeadlineExceeded):
+        raise
     except Exception as e:
         raise ValueError(f"Error logging in user: {e}")
 
 
-# In firebase_service.py
-
-
-# Function to send password reset email
+# Function to queue the password reset email
 async def send_password_reset_email(email: str, link: str):
-    message = MessageSchema(
-        subject="Reset Your Password",
-        recipients=[email],  # List of recipients
-        body=f"Please reset your password by clicking on this link: {link}",
-        subtype="html",
-    )
-
-    fm = FastMail(conf)
-    try:
-        await fm.send_message(message)
-        print(f"Password reset email sent to {email}")
-    except Exception as e:
-        print(f"Error sending password reset email to {email}: {e}")
-        raise
+    body = f"Please reset your password by clicking on this link: {link}"
+    await enqueue_email(email, "Reset Your Password", body)
@@ -1,59 +1,117 @@
-from openai import OpenAI
-from dotenv import load_dotenv
 import base64
 import json
-from app.config import settings
+from typing import Any, Dict
 
-load_dotenv()
-client = OpenAI(api_key=settings.openai_api_key)
+from app.config import get_settings
+from app.services.openai_service import create_chat_completion
+from app.services.timing import timed
 
-def recognize_food_from_image(image_path):
-    with open(image_path, "rb") as image:
-        base64_image = base64.b64encode(image.read()).decode("utf-8")
+SYSTEM_PROMPT = (
+    "You are a dietitian. List the food items in the meal photo with an "
+    "estimated serving and its calories (kcal), and the meal's total calories."
+)
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        response_format={"type": "json_object"},
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a dietitian. A user sends you an image of a meal and "
-                    "you tell them how many calories are in it. Use the following "
-                    "JSON format:\n\n"
-                    "{\n"
-                    "    \"reasoning\": \"reasoning for the total calories\",\n"
-                    "    \"food_items\": [\n"
-                    "        {\n"
-                    "            \"name\": \"food item name\",\n"
-                    "            \"calories\": \"calories in the food item\",\n"
-                    "            \"serving\": \"serving size of the food item\"\n"
-                    "        }\n"
-                    "    ],\n"
-                    "    \"total\": \"total calories in the meal\"\n"
-                    "}"
-                )
+# Structured output: the model must answer with this shape, with calories as
+# numbers, so nothing is left to re-parse from prose
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "meal_calories",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "food_items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "serving": {"type": "string"},
+                            "calories": {"type": "number"},
+                        },
+                        "required": ["name", "serving", "calories"],
+                        "additionalProperties": False,
+                    },
+                },
+                "total": {"type": "number"},
             },
+            "required": ["food_items", "total"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _calories(value: Any) -> float:
+    """Read a calorie amount, as a number or a numeric string such as "250" or "250 kcal"."""
+    if isinstance(value, bool):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.lower().replace("kcal", "").strip())
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def parse_recognition(content: str) -> Dict[str, Any]:
+    """Parse the model's answer into food items with numeric calories and their total.
+
+    The total is the sum of the items, so it always agrees with them.
+    """
+    result = json.loads(content)
+    food_items = [
+        {
+            "name": str(item.get("name", "")),
+            "serving": str(item.get("serving", "")),
+            "calories": _calories(item.get("calories")),
+        }
+        for item in result.get("food_items") or []
+        if isinstance(item, dict)
+    ]
+    return {"food_items": food_items, "total": sum(item["calories"] for item in food_items)}
+
+
+def recognition_request(base64_image: str, content_type: str = "image/jpeg") -> Dict[str, Any]:
+    """Return the chat completion arguments for recognizing the food in an image."""
+    settings = get_settings()
+    return {
+        "model": settings.food_recognition_model,
+        "response_format": RESPONSE_FORMAT,
+        "max_tokens": settings.food_recognition_max_tokens,
+        "temperature": 0,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "text",
-                        "text": "How many calories is in this meal?"
-                    },
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url":
-                                f"data:image/jpeg;base64,{base64_image}"
-                        }
+                            "url": f"data:{content_type};base64,{base64_image}",
+                            # "low" sends a 512px version of the image at a fixed, small token cost
+                            "detail": settings.food_recognition_image_detail,
+                        },
                     }
-                ]
+                ],
             },
         ],
-    )
+    }
+
 
-    response_message = response.choices[0].message
-    content = response_message.content
+@timed("openai.food_recognition")
+def recognize_food_from_image(image_path, content_type: str = "image/jpeg"):
+    with open(image_path, "rb") as image:
+        base64_image = base64.b64encode(image.read()).decode("utf-8")
+
+    response = create_chat_completion(
+        operation="food_recognition", **recognition_request(base64_image, content_type)
+    )
 
-    return json.loads(content)
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        raise ValueError("Food recognition answer was cut off; raise FOOD_RECOGNITION_MAX_TOKENS")
+    return parse_recognition(choice.message.content)
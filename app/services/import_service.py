@@ -0,0 +1,135 @@
+import csv
+import json
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from app.services.mongodb_service import MACROS, MongoDBService, normalize_entry, normalize_meal_type
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("jsonl", "csv")
+
+# Validation errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def read_rows(stream: TextIO, import_format: str) -> Iterator[Dict[str, Any]]:
+    """Yield rows from a JSONL or CSV stream without reading it whole.
+
+    Lines that are not JSON objects are yielded as rows that fail validation,
+    so they are counted against the import rather than ending it.
+    """
+    if import_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            row = {"_error": f"Invalid JSON: {e.msg}"}
+        yield row if isinstance(row, dict) else {"_error": "Row must be a JSON object"}
+
+
+def validate_row(row: Dict[str, Any]) -> Tuple[str, str, str, Dict[str, Any]]:
+    """Return (user_id, date, meal_type, entry) for an import row, or raise ValueError."""
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    user_id = str(row.get("user_id") or "").strip()
+    if not user_id:
+        raise ValueError("user_id is required")
+    food_name = str(row.get("food_name") or "").strip()
+    if not food_name:
+        raise ValueError("food_name is required")
+    date_str = date.fromisoformat(str(row.get("date", "")).strip()).isoformat()
+    meal_type = normalize_meal_type(str(row.get("meal_type", "")))
+    # CSV has no nulls, only empty cells
+    entry = normalize_entry({
+        "food_name": food_name,
+        "calories": row.get("calories"),
+        "serving_size": row.get("serving_size") or None,
+        "time_logged": row.get("time_logged") or None,
+        **{macro: row.get(macro) if row.get(macro) != "" else None for macro in MACROS},
+        **({"entry_id": row["entry_id"]} if row.get("entry_id") else {}),
+    })
+    return user_id, date_str, meal_type, entry
+
+
+class FoodLogImporter:
+    """Import historical food entries in chunks, resumable from a checkpoint.
+
+    Rows are validated a chunk at a time, grouped per (user, day) and written
+    with one unordered bulk write per chunk. After each chunk the number of
+    rows done is checkpointed under ``import_id``, and running the same import
+    again skips them. Entries without an ID get one derived from the import
+    and row number, so re-writing a chunk that was interrupted midway does not
+    add its entries twice.
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, import_id: Optional[str] = None, chunk_size: int = 5000):
+        self.mongodb_service = mongodb_service
+        self.import_id = import_id or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+
+    def run(self, rows: Iterable[Dict[str, Any]], progress=None) -> Dict[str, Any]:
+        checkpoint = self.mongodb_service.get_import_checkpoint(self.import_id) or {}
+        stats = {
+            "import_id": self.import_id,
+            "rows": checkpoint.get("rows", 0),
+            "imported": checkpoint.get("imported", 0),
+            "rejected": checkpoint.get("rejected", 0),
+            "errors": [],
+        }
+        skip = stats["rows"]
+        started = time.monotonic()
+        processed = 0
+
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        for number, row in enumerate(rows, start=1):
+            if number <= skip:
+                continue
+            chunk.append((number, row))
+            if len(chunk) >= self.chunk_size:
+                processed += self._import_chunk(chunk, stats)
+                chunk = []
+                self._report(stats, processed, started, progress)
+        if chunk:
+            processed += self._import_chunk(chunk, stats)
+        self.mongodb_service.save_import_checkpoint(self.import_id, stats, finished=True)
+        self._report(stats, processed, started, progress)
+        return stats
+
+    def _import_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]], stats: Dict[str, Any]) -> int:
+        days: Dict[Tuple[str, str], List[Tuple[str, Dict[str, Any]]]] = defaultdict(list)
+        for number, row in chunk:
+            try:
+                # Rows without an ID (or with an empty one) get the same ID on every run
+                if not row.get("entry_id"):
+                    row["entry_id"] = uuid.uuid5(uuid.NAMESPACE_OID, f"{self.import_id}:{number}").hex
+                user_id, date_str, meal_type, entry = validate_row(row)
+            except (ValueError, TypeError) as e:
+                stats["rejected"] += 1
+                if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                    stats["errors"].append({"row": number, "error": str(e)})
+                continue
+            days[(user_id, date_str)].append((meal_type, entry))
+
+        if days:
+            self.mongodb_service.import_food_entries(days)
+        stats["imported"] += sum(len(entries) for entries in days.values())
+        stats["rows"] += len(chunk)
+        self.mongodb_service.save_import_checkpoint(self.import_id, stats)
+        return len(chunk)
+
+    @staticmethod
+    def _report(stats: Dict[str, Any], processed: int, started: float, progress):
+        elapsed = time.monotonic() - started
+        stats["elapsed_seconds"] = round(elapsed, 2)
+        stats["rows_per_second"] = round(processed / elapsed, 1) if elapsed > 0 else 0.0
+        if progress is not None:
+            progress(stats)
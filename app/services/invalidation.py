@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from pymongo import CursorType
+from pymongo.database import Database
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+from app.services.metrics import CACHE_INVALIDATION_LAG
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "cache_invalidations"
+# Old messages are only needed by listeners that are catching up, so a small
+# capped collection is enough
+COLLECTION_SIZE_BYTES = 1024 * 1024
+COLLECTION_MAX_DOCUMENTS = 10000
+
+# Change streams need a replica set or sharded cluster
+CHANGE_STREAMS_UNSUPPORTED = (40573, 40324)
+
+
+class InvalidationBus:
+    """Tell the in-process caches of every worker that a key has changed.
+
+    Writers publish (namespace, key) messages to a capped collection. Each
+    worker follows that collection on a background thread, with a change
+    stream when the deployment supports it and a tailable cursor otherwise,
+    and calls the callbacks subscribed to the namespace. A worker ignores its
+    own messages, as it updates its caches when it writes.
+
+    Delivery is best effort; caches keep their TTL as a bound on staleness.
+    """
+
+    def __init__(self, db: Database, use_change_streams: bool = True):
+        self.db = db
+        self.collection = db[COLLECTION]
+        self.use_change_streams = use_change_streams
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._resume_token = None
+        self._last_id = None
+        self._positioned = False
+
+    def setup(self):
+        """Create the capped collection if it does not exist yet."""
+        try:
+            self.db.create_collection(
+                COLLECTION, capped=True, size=COLLECTION_SIZE_BYTES, max=COLLECTION_MAX_DOCUMENTS
+            )
+        except CollectionInvalid:
+            pass  # Already created by another worker
+
+    def subscribe(self, namespace: str, callback: Callable[[str], None]):
+        """Call ``callback(key)`` when another worker invalidates a key of ``namespace``."""
+        self._subscribers[namespace].append(callback)
+
+    def publish(self, namespace: str, key: str):
+        try:
+            self.collection.insert_one({
+                "namespace": namespace,
+                "key": key,
+                "origin": self.origin,
+                "published_at": datetime.utcnow(),
+            })
+        except PyMongoError as e:
+            logger.warning("Failed to publish invalidation of %s/%s: %s", namespace, key, e)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="cache-invalidations", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _deliver(self, message: dict):
+        self._last_id = message["_id"]
+        if message.get("origin") == self.origin:
+            return
+        published_at = message.get("published_at")
+        if published_at is not None:
+            # Includes any clock difference between the publishing and receiving hosts
+            CACHE_INVALIDATION_LAG.observe(max(0.0, (datetime.utcnow() - published_at).total_seconds()))
+        for callback in self._subscribers.get(message.get("namespace"), ()):
+            try:
+                callback(message["key"])
+            except Exception:
+                logger.exception("Invalidation callback for %s failed", message.get("namespace"))
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            try:
+                if self.use_change_streams:
+                    self._watch()
+                else:
+                    self._tail()
+            except OperationFailure as e:
+                if self.use_change_streams and e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams are not supported here, tailing %s instead", COLLECTION)
+                    self.use_change_streams = False
+                    continue
+                logger.warning("Invalidation listener failed: %s", e)
+                self._stopped.wait(1.0)
+            except PyMongoError as e:
+                logger.warning("Invalidation listener failed: %s", e)
+                self._stopped.wait(1.0)
+
+    def _watch(self):
+        with self.collection.watch(
+            [{"$match": {"operationType": "insert"}}],
+            start_after=self._resume_token,
+            max_await_time_ms=500,
+        ) as stream:
+            while not self._stopped.is_set():
+                change = stream.try_next()
+                self._resume_token = stream.resume_token
+                if change is not None:
+                    self._deliver(change["fullDocument"])
+
+    def _tail(self):
+        if not self._positioned:
+            # Start from the newest message; older ones predate this worker's caches
+            newest = self.collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+            self._last_id = newest["_id"] if newest else None
+            self._positioned = True
+        query = {"_id": {"$gt": self._last_id}} if self._last_id is not None else {}
+        cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=500)
+        try:
+            while cursor.alive and not self._stopped.is_set():
+                for message in cursor:
+                    self._deliver(message)
+                    if self._stopped.is_set():
+                        return
+        finally:
+            cursor.close()
+        if not self._stopped.is_set():
+            # A tailable cursor on an empty collection dies right away
+            self._stopped.wait(0.5)
@@ -0,0 +1,344 @@
+import copy
+import itertools
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services.mongodb_service import (
+    MACROS,
+    MEAL_TYPES,
+    apply_increment,
+    entry_amounts,
+    logged_entry,
+    new_food_log,
+    normalize_entry_changes,
+    normalize_meal_type,
+    sum_amounts,
+    targets_from_insights,
+    totals_increment,
+)
+
+
+class InMemoryStorage:
+    """A storage backend that keeps everything in process memory.
+
+    Follows the semantics of MongoDBService with embedded entries: totals move
+    by increments, the targets of days logged from today on follow insight
+    updates, and outbox emails are leased to one sender at a time. Every
+    operation holds one lock, so each is atomic as a single Mongo update is.
+    Stored and returned documents are copies, as they would be over the wire.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._insights: Dict[str, Dict[str, Any]] = {}
+        self._food_logs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._barcodes: Dict[str, Dict[str, Any]] = {}
+        self._outbox: Dict[int, Dict[str, Any]] = {}
+        self._email_ids = itertools.count(1)
+        self._chat_turns: Dict[str, List[Dict[str, Any]]] = {}
+        self._chat_summaries: Dict[str, Dict[str, Any]] = {}
+
+    def close(self):
+        pass
+
+    async def create_user_profile(self, user_id: str, profile_data: Dict[str, Any]) -> bool:
+        with self._lock:
+            if user_id in self._profiles:
+                return False
+            profile_data["user_id"] = user_id
+            self._profiles[user_id] = {**copy.deepcopy(profile_data), "_id": uuid.uuid4().hex}
+            return True
+
+    async def update_user_profile(self, user_id: str, profile_data: Dict[str, Any], is_new: bool = False) -> bool:
+        with self._lock:
+            profile_data["user_id"] = user_id
+            profile = self._profiles.setdefault(user_id, {"_id": uuid.uuid4().hex})
+            profile.update(copy.deepcopy(profile_data))
+            return True
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(self._profiles.get(user_id))
+
+    def _get_targets(self, user_id: str) -> Dict[str, Any]:
+        return targets_from_insights(self._insights.get(user_id))
+
+    async def add_food_entry(self, user_id: str, entry_data: Dict[str, Any]) -> str:
+        """Log an entry and return its ID."""
+        meal_type, entry = logged_entry(entry_data)
+        with self._lock:
+            key = (user_id, entry_data["date"])
+            if key not in self._food_logs:
+                self._food_logs[key] = new_food_log(user_id, entry_data["date"], self._get_targets(user_id))
+            log = self._food_logs[key]
+            log["meals"][meal_type].append(entry)
+            apply_increment(log, totals_increment(entry_amounts(entry)))
+        return entry["entry_id"]
+
+    async def add_food_entries(
+        self, user_id: str, date_str: str, meal_type: str, entries_data: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Log several entries to one meal and return the updated daily log."""
+        entries = [logged_entry({**entry_data, "meal_type": meal_type})[1] for entry_data in entries_data]
+        meal_type = normalize_meal_type(meal_type)
+        with self._lock:
+            key = (user_id, date_str)
+            if key not in self._food_logs:
+                self._food_logs[key] = new_food_log(user_id, date_str, self._get_targets(user_id))
+            log = self._food_logs[key]
+            log["meals"][meal_type].extend(entries)
+            apply_increment(log, totals_increment(sum_amounts(entries)))
+            return copy.deepcopy(log)
+
+    def _find_entry(self, user_id: str, date_str: str, meal_type: str, entry_id: str):
+        log = self._food_logs.get((user_id, date_str))
+        if log is None:
+            return None, None
+        for entry in log["meals"][meal_type]:
+            if entry["entry_id"] == entry_id:
+                return log, entry
+        return log, None
+
+    async def update_food_entry(
+        self, user_id: str, date_str: str, meal_type: str, entry_id: str, changes: Dict[str, Any]
+    ) -> bool:
+        """Update fields of a logged entry, keeping the day's totals in step.
+
+        Returns False when there is no such entry.
+        """
+        meal_type = normalize_meal_type(meal_type)
+        changes = normalize_entry_changes(changes)
+        with self._lock:
+            log, entry = self._find_entry(user_id, date_str, meal_type, entry_id)
+            if entry is None:
+                return False
+            before = entry_amounts(entry)
+            entry.update(changes)
+            after = entry_amounts(entry)
+            apply_increment(log, totals_increment({key: after[key] - before[key] for key in before}))
+            return True
+
+    async def delete_food_entry(self, user_id: str, date_str: str, meal_type: str, entry_id: str) -> bool:
+        """Remove a logged entry and its amounts from the day's totals.
+
+        Returns False when there is no such entry.
+        """
+        meal_type = normalize_meal_type(meal_type)
+        with self._lock:
+            log, entry = self._find_entry(user_id, date_str, meal_type, entry_id)
+            if entry is None:
+                return False
+            log["meals"][meal_type].remove(entry)
+            apply_increment(log, totals_increment({key: -value for key, value in entry_amounts(entry).items()}))
+            return True
+
+    async def get_daily_food_log(self, user_id: str, date_param: date) -> Optional[Dict[str, Any]]:
+        date_str = date_param.isoformat()
+        with self._lock:
+            log = self._food_logs.get((user_id, date_str))
+            if log is not None:
+                return copy.deepcopy(log)
+            # Return an empty daily log with the user's targets
+            empty_log = new_food_log(user_id, date_str, self._get_targets(user_id))
+        del empty_log["user_id"]
+        return empty_log
+
+    def _user_logs(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            logs = [copy.deepcopy(log) for (owner, _), log in self._food_logs.items() if owner == user_id]
+        return sorted(logs, key=lambda log: log["date"])
+
+    async def get_all_user_food_logs(self, user_id: str) -> List[Dict[str, Any]]:
+        # Most recent first
+        return self._user_logs(user_id)[::-1]
+
+    def iter_food_log_rows(
+        self,
+        user_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        batch_size: int = 200,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield one flat row per logged entry, oldest day first.
+
+        ``start`` and ``end`` are inclusive ISO dates.
+        """
+        for log in self._user_logs(user_id):
+            if (start and log["date"] < start) or (end and log["date"] > end):
+                continue
+            for meal_type in MEAL_TYPES:
+                for entry in log["meals"][meal_type]:
+                    yield {**entry, "date": log["date"], "meal_type": meal_type}
+
+    async def update_user_insights(self, user_id: str, insights_data: Dict[str, Any]) -> bool:
+        with self._lock:
+            insights = self._insights.setdefault(user_id, {"user_id": user_id})
+            insights.update(copy.deepcopy(insights_data))
+            if "tdee" in insights_data:
+                self._refresh_targets(user_id, targets_from_insights(insights_data))
+            return True
+
+    def _refresh_targets(self, user_id: str, targets: Dict[str, Any]):
+        """Apply new targets to the user's logs from today on, keeping what they have logged."""
+        today = date.today().isoformat()
+        for (owner, date_str), log in self._food_logs.items():
+            if owner != user_id or date_str < today:
+                continue
+            log["target_calories"] = targets["calories"]
+            log["remaining_calories"] = targets["calories"] - log["total_calories"]
+            for macro in MACROS:
+                log["macro_targets"][macro] = targets[macro]
+                log["macro_remaining"][macro] = targets[macro] - log["macro_totals"][macro]
+
+    async def get_cached_barcode(self, gtin: str) -> Optional[Dict[str, Any]]:
+        """Return the cached lookup of a barcode, or None if it was never looked up.
+
+        A cached lookup's "food" is None for codes FatSecret does not know.
+        """
+        with self._lock:
+            cached = self._barcodes.get(gtin)
+            if cached is None:
+                return None
+            if cached.get("expires_at") and cached["expires_at"] <= datetime.utcnow():
+                del self._barcodes[gtin]
+                return None
+            return {"_id": gtin, "food": copy.deepcopy(cached["food"])}
+
+    async def cache_barcode(self, gtin: str, food: Optional[Dict[str, Any]], negative_ttl: float):
+        """Store a barcode lookup; found foods are kept, unknown codes for ``negative_ttl`` seconds."""
+        now = datetime.utcnow()
+        cached = {"food": copy.deepcopy(food), "cached_at": now}
+        if food is None:
+            cached["expires_at"] = now + timedelta(seconds=negative_ttl)
+        with self._lock:
+            self._barcodes[gtin] = cached
+
+    async def get_chat_history(self, user_id: str, limit: int, oldest_first: bool = False) -> Dict[str, Any]:
+        """Return a user's chat summary and the last ``limit`` turns it does not cover, oldest first.
+
+        With ``oldest_first``, the first ``limit`` turns it does not cover instead.
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            summary = self._chat_summaries.get(user_id)
+            if summary is not None and summary["expires_at"] <= now:
+                del self._chat_summaries[user_id]
+                summary = None
+            turns = [
+                turn for turn in self._chat_turns.get(user_id, [])
+                if turn["expires_at"] > now and (summary is None or turn["created_at"] > summary["until"])
+            ]
+            turns = [
+                {key: turn[key] for key in ("message", "reply", "tokens", "created_at")}
+                for turn in (turns[:limit] if oldest_first else turns[-limit:])
+            ]
+            return {"summary": summary["summary"] if summary else None, "turns": turns}
+
+    async def add_chat_turn(self, user_id: str, message: str, reply: str, tokens: int, ttl: float):
+        """Store a message and its reply, kept for ``ttl`` seconds."""
+        now = datetime.utcnow()
+        with self._lock:
+            turns = self._chat_turns.setdefault(user_id, [])
+            # Expired turns are dropped as new ones come in
+            turns[:] = [turn for turn in turns if turn["expires_at"] > now]
+            turns.append({
+                "message": message,
+                "reply": reply,
+                "tokens": tokens,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl),
+            })
+
+    async def save_chat_summary(self, user_id: str, summary: str, until: datetime, ttl: float) -> bool:
+        """Store the summary of a user's turns up to ``until``, unless a later one is stored already."""
+        with self._lock:
+            stored = self._chat_summaries.get(user_id)
+            if stored is not None and stored["until"] >= until:
+                return False
+            self._chat_summaries[user_id] = {
+                "summary": summary,
+                "until": until,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+            }
+            return True
+
+    async def delete_chat_history(self, user_id: str, ttl: float):
+        """Delete a user's chat turns and summary.
+
+        An empty summary of everything until now is left for ``ttl`` seconds,
+        so a summary of the deleted turns still being made is not stored.
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            self._chat_turns.pop(user_id, None)
+            self._chat_summaries[user_id] = {"summary": None, "until": now, "expires_at": now + timedelta(seconds=ttl)}
+
+    async def enqueue_email(self, recipient: str, subject: str, body: str) -> str:
+        now = datetime.utcnow()
+        with self._lock:
+            email_id = next(self._email_ids)
+            self._outbox[email_id] = {
+                "_id": email_id,
+                "recipient": recipient,
+                "subject": subject,
+                "body": body,
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now,
+            }
+        return str(email_id)
+
+    async def claim_outbox_emails(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """Lease up to ``limit`` due emails to this sender."""
+        now = datetime.utcnow()
+        with self._lock:
+            due = [email for email in self._outbox.values() if self._is_due(email, now)]
+            due.sort(key=lambda email: email["next_attempt_at"])
+            for email in due[:limit]:
+                email["status"] = "sending"
+                email["leased_until"] = now + timedelta(seconds=lease_seconds)
+            return copy.deepcopy(due[:limit])
+
+    @staticmethod
+    def _is_due(email: Dict[str, Any], now: datetime) -> bool:
+        if email["status"] == "pending":
+            return email["next_attempt_at"] <= now
+        # Emails whose lease ran out (their sender died mid-batch) are due again
+        return email["status"] == "sending" and email["leased_until"] <= now
+
+    async def mark_emails_sent(self, email_ids: List[Any], ttl: float):
+        """Mark emails sent; they are kept for ``ttl`` seconds."""
+        now = datetime.utcnow()
+        with self._lock:
+            # Expired emails are dropped as others are sent
+            for email_id, email in list(self._outbox.items()):
+                if email.get("expires_at", now) < now:
+                    del self._outbox[email_id]
+            for email_id in email_ids:
+                email = self._outbox.get(email_id)
+                if email is not None:
+                    email.update(status="sent", sent_at=now, expires_at=now + timedelta(seconds=ttl))
+                    email.pop("leased_until", None)
+
+    async def reschedule_email(self, email_id: Any, error: str, retry_in: Optional[float]):
+        """Record a failed attempt; retry after ``retry_in`` seconds, or give up when it is None."""
+        with self._lock:
+            email = self._outbox.get(email_id)
+            if email is None:
+                return
+            email["attempts"] += 1
+            email["last_error"] = error
+            email.pop("leased_until", None)
+            if retry_in is None:
+                email["status"] = "failed"
+            else:
+                email["status"] = "pending"
+                email["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=retry_in)
+
+    async def count_outbox_emails(self) -> int:
+        with self._lock:
+            return sum(1 for email in self._outbox.values() if email["status"] in ("pending", "sending"))
@@ -0,0 +1,94 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Buckets cover fast local lookups (ms) up to slow model calls (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "mealmeter_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "mealmeter_http_requests_in_flight",
+    "HTTP requests currently being handled, by route template",
+    ["method", "route"],
+    # Summed across live workers when running under gunicorn
+    multiprocess_mode="livesum",
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "mealmeter_upstream_call_duration_seconds",
+    "Latency of calls to Firebase, MongoDB, FatSecret and OpenAI",
+    ["operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EMAIL_OUTBOX_DEPTH = Gauge(
+    "mealmeter_email_outbox_depth",
+    "Emails waiting in the outbox or being sent",
+    # Every worker sees the same collection
+    multiprocess_mode="livemax",
+)
+
+EMAILS_SENT = Counter(
+    "mealmeter_emails_sent_total",
+    "Outbox send attempts by outcome (sent, retry, failed)",
+    ["outcome"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "mealmeter_cache_lookups_total",
+    "In-process cache lookups by cache and outcome (hit, miss)",
+    ["cache", "outcome"],
+)
+
+CACHE_INVALIDATION_LAG = Histogram(
+    "mealmeter_cache_invalidation_lag_seconds",
+    "Time from publishing a cache invalidation to its delivery in another worker",
+    buckets=LATENCY_BUCKETS,
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "mealmeter_circuit_breaker_state",
+    "Circuit breaker state by upstream: 0 closed, 1 half-open, 2 open",
+    ["upstream"],
+    # Breakers are per worker; the most open one is reported
+    multiprocess_mode="livemax",
+)
+
+CIRCUIT_BREAKER_CALLS = Counter(
+    "mealmeter_circuit_breaker_calls_total",
+    "Upstream calls through a circuit breaker by outcome (success, failure, rejected)",
+    ["upstream", "outcome"],
+)
+
+OPENAI_TOKENS = Counter(
+    "mealmeter_openai_tokens_total",
+    "OpenAI tokens used by operation and kind (prompt, completion)",
+    ["operation", "kind"],
+)
+
+
+def render_metrics():
+    """Return the current metrics in Prometheus text format and its content type.
+
+    With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py), every worker
+    writes its samples there and any one of them can serve the combined view.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,66 +1,425 @@
-from typing import Dict, Any, List, Optional
-from datetime import date, datetime
-from pymongo import MongoClient
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import bson
+import functools
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from pymongo import MongoClient, ReturnDocument, UpdateOne, ASCENDING, DESCENDING
+from pymongo.client_session import ClientSession
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from pymongo.server_api import ServerApi
-from pymongo.errors import PyMongoError
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from fastapi import Depends
+from app.services.cache import TTLCache
+from app.services.invalidation import InvalidationBus
+from app.services.request_scope import MISSING, MongoRoundTripCounter, current_request_scope
+from app.services.timing import timed
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snacks", "drinks")
+MACROS = ("protein_grams", "carbs_grams", "fats_grams")
+
+# Targets of users without insights: 2000 kcal, with the macros of
+# calculate_macros(2000, "weight maintenance")
+DEFAULT_TARGETS = {"calories": 2000, "protein_grams": 137.0, "carbs_grams": 237.0, "fats_grams": 50.0}
+
+# Daily logs are served straight from the cursor, without Mongo's internal id
+LOG_PROJECTION = {"_id": 0}
+
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(name: str, max_staleness: Optional[int] = None):
+    """Return the read preference called ``name``, avoiding secondaries more than ``max_staleness`` seconds behind."""
+    if name not in READ_PREFERENCES:
+        raise RuntimeError(f"Unknown MONGODB_READ_PREFERENCE: {name}")
+    if name == "primary":
+        return Primary()
+    return READ_PREFERENCES[name](max_staleness=-1 if max_staleness is None else max_staleness)
+
+
+def write_concern(w: Optional[str] = None, journal: Optional[bool] = None) -> WriteConcern:
+    """Return the write concern for ``w`` ("majority" or a number of members); unset leaves the server default."""
+    if w is not None and w.isdigit():
+        w = int(w)
+    return WriteConcern(w=w, j=journal)
+
+
+# Causally consistent session of the user write in progress, when reads may go to secondaries
+_write_session: ContextVar[Optional[ClientSession]] = ContextVar("mongo_write_session", default=None)
+
+
+def causal_write(method):
+    """Run a write method for a user (its first argument) in a causally consistent session.
+
+    See MongoDBService._causal_write.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, user_id: str, *args, **kwargs):
+        with self._causal_write(user_id):
+            return await method(self, user_id, *args, **kwargs)
+
+    return wrapper
+
+
+def normalize_meal_type(meal_type: str) -> str:
+    # MealType is a str enum, str() would give its qualified name rather than its value
+    meal_type = getattr(meal_type, "value", meal_type).lower()
+    if meal_type not in MEAL_TYPES:
+        raise ValueError(f"Unknown meal type: {meal_type}")
+    return meal_type
+
+
+def normalize_amount(value: Any, name: str) -> float:
+    amount = float(value)
+    if amount != amount or amount in (float("inf"), float("-inf")):
+        raise ValueError(f"{name} must be a finite number")
+    if amount < 0:
+        raise ValueError(f"{name} cannot be negative")
+    return amount
+
+
+def normalize_calories(value: Any) -> float:
+    return normalize_amount(value, "Calories")
+
+
+def normalize_target(value: Any) -> int:
+    return int(float(value))
+
+
+def new_entry_id() -> str:
+    return uuid.uuid4().hex
+
+
+def normalize_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a meal entry with the types the read paths expect.
+
+    Entries logged before they had IDs are given one.
+    """
+    normalized = dict(entry)
+    normalized["calories"] = normalize_calories(entry.get("calories", 0))
+    for macro in MACROS:
+        # Macros are optional; an entry without them counts as 0 g
+        if normalized.get(macro) is None:
+            normalized.pop(macro, None)
+        else:
+            normalized[macro] = normalize_amount(normalized[macro], macro)
+    normalized.setdefault("entry_id", new_entry_id())
+    return normalized
+
+
+def logged_entry(entry_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Return the meal type and the entry to store for a food log request, logged now."""
+    entry = normalize_entry({
+        "food_name": entry_data["food_name"],
+        "calories": entry_data["calories"],
+        "serving_size": entry_data.get("serving_size"),
+        "time_logged": datetime.now().strftime("%H:%M:%S"),
+        **{macro: entry_data.get(macro) for macro in MACROS},
+    })
+    return normalize_meal_type(entry_data["meal_type"]), entry
+
+
+def normalize_entry_changes(changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the editable fields of an entry update, with their amounts checked."""
+    editable = ("food_name", "calories", "serving_size") + MACROS
+    changes = {key: value for key, value in changes.items() if key in editable}
+    for key in ("food_name", "calories"):
+        if key in changes and changes[key] is None:
+            raise ValueError(f"{key} cannot be null")
+    if "calories" in changes:
+        changes["calories"] = normalize_calories(changes["calories"])
+    for macro in MACROS:
+        if changes.get(macro) is not None:
+            changes[macro] = normalize_amount(changes[macro], macro)
+    return changes
+
+
+def entry_amounts(entry: Dict[str, Any]) -> Dict[str, float]:
+    """Return the calories and macro grams an entry adds to its day."""
+    amounts = {"calories": entry["calories"]}
+    for macro in MACROS:
+        amounts[macro] = entry.get(macro) or 0.0
+    return amounts
+
+
+def sum_amounts(entries: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Return the calories and macro grams several entries add to their day."""
+    totals = {key: 0.0 for key in ("calories",) + MACROS}
+    for entry in entries:
+        for key, amount in entry_amounts(entry).items():
+            totals[key] += amount
+    return totals
+
+
+def totals_increment(amounts: Dict[str, float]) -> Dict[str, float]:
+    """Return the $inc that adds ``amounts`` to a daily log's totals and takes them from its remaining."""
+    increment = {
+        "total_calories": amounts["calories"],
+        "remaining_calories": -amounts["calories"],
+    }
+    for macro in MACROS:
+        increment[f"macro_totals.{macro}"] = amounts[macro]
+        increment[f"macro_remaining.{macro}"] = -amounts[macro]
+    return increment
+
+
+def targets_from_insights(insights: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the daily calorie (TDEE) and macro targets stored in a user's insights."""
+    if not insights:
+        return dict(DEFAULT_TARGETS)
+    targets = {"calories": normalize_target(insights["tdee"])}
+    for macro in MACROS:
+        targets[macro] = float(insights.get(macro, DEFAULT_TARGETS[macro]))
+    return targets
+
+
+def new_food_log(user_id: str, date_str: str, targets: Dict[str, Any], embedded: bool = True) -> Dict[str, Any]:
+    """Return an empty daily log with the given targets."""
+    log = {
+        "user_id": user_id,
+        "date": date_str,
+        "total_calories": 0.0,
+        "target_calories": targets["calories"],
+        "remaining_calories": float(targets["calories"]),
+        "macro_totals": {macro: 0.0 for macro in MACROS},
+        "macro_targets": {macro: targets[macro] for macro in MACROS},
+        "macro_remaining": {macro: float(targets[macro]) for macro in MACROS},
+    }
+    if embedded:
+        log["meals"] = {meal: [] for meal in MEAL_TYPES}
+    return log
+
+
+def apply_increment(log: Dict[str, Any], increment: Dict[str, float]):
+    for path, value in increment.items():
+        *parents, field = path.split(".")
+        target = log
+        for parent in parents:
+            target = target[parent]
+        target[field] += value
+
+
+def normalize_food_log(log: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the numeric fields and meals of a daily log in their canonical types."""
+    meals = log.get("meals") or {}
+    return {
+        "total_calories": float(log.get("total_calories", 0)),
+        "target_calories": normalize_target(log.get("target_calories", 2000)),
+        "remaining_calories": float(log.get("remaining_calories", 0)),
+        "meals": {
+            meal: [normalize_entry(entry) for entry in meals.get(meal, [])]
+            for meal in (*MEAL_TYPES, *(meal for meal in meals if meal not in MEAL_TYPES))
+        },
+    }
+
+
+def merge_food_logs(logs: List[Dict[str, Any]], entries: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Return the fields of one daily log holding everything in ``logs``, several logs of a user for the same day.
+
+    Entries are merged by ID and the totals recomputed from them, so merging
+    again gives the same log. The targets are those of the last log. In
+    collection storage the logs only hold totals; pass the day's ``entries``.
+    """
+    latest = logs[-1]
+    macro_targets = latest.get("macro_targets") or {}
+    targets = {"calories": normalize_target(latest.get("target_calories", DEFAULT_TARGETS["calories"]))}
+    for macro in MACROS:
+        targets[macro] = float(macro_targets.get(macro, DEFAULT_TARGETS[macro]))
+    merged = new_food_log(latest["user_id"], latest["date"], targets, embedded=entries is None)
+    if entries is None:
+        entries = []
+        seen = set()
+        for log in logs:
+            for meal, meal_entries in (log.get("meals") or {}).items():
+                merged["meals"].setdefault(meal, [])
+                for entry in map(normalize_entry, meal_entries):
+                    if entry["entry_id"] not in seen:
+                        seen.add(entry["entry_id"])
+                        merged["meals"][meal].append(entry)
+                        entries.append(entry)
+    apply_increment(merged, totals_increment(sum_amounts(entries)))
+    return merged
 
 
 class MongoDBService:
     def __init__(self):
-        from app.config import settings
+        from app.config import get_settings
 
+        settings = get_settings()
+        min_pool_size, max_pool_size = settings.mongodb_pool_sizes()
         try:
             # Add connection timeout and explicitly specify database
             self.client = MongoClient(
-                settings.mongodb_uri,
+                settings.require("mongodb_uri"),
                 server_api=ServerApi("1"),
                 connectTimeoutMS=5000,
                 socketTimeoutMS=5000,
+                minPoolSize=min_pool_size,
+                maxPoolSize=max_pool_size,
+                event_listeners=[MongoRoundTripCounter()],
             )
+            # Calorie and macro targets (from insights) read on every food log write
+            self.targets = TTLCache("daily_targets", settings.target_cache_size, settings.target_cache_ttl)
             # Test connection with more detailed logging
             self.client.admin.command("ping")
             print("Successfully connected to MongoDB!")
             # Initialize database and collections
-            self.db = self.client.get_database("mealmeter")
+            self.db = self.client.get_database(
+                "mealmeter",
+                write_concern=write_concern(settings.mongodb_write_concern, settings.mongodb_write_journal),
+            )
+            existing_collections = self.db.list_collection_names()
             # Create profiles collection if it doesn't exist
-            if "profiles" not in self.db.list_collection_names():
+            if "profiles" not in existing_collections:
                 self.db.create_collection("profiles")
                 print("Created profiles collection")
             self.profiles = self.db.profiles
 
             # Create food_logs collection if it doesn't exist
-            if "food_logs" not in self.db.list_collection_names():
+            if "food_logs" not in existing_collections:
                 self.db.create_collection("food_logs")
                 print("Created food_logs collection")
             self.food_logs = self.db.food_logs
+            try:
+                self.ensure_food_log_index()
+            except DuplicateKeyError:
+                print("food_logs has days logged more than once; run scripts.normalize_food_logs to merge them")
+
+            # Entries live embedded in the daily log, or in their own collection
+            self.food_log_storage = settings.food_log_storage
+            if self.food_log_storage not in ("embedded", "collection"):
+                raise RuntimeError(f"Unknown FOOD_LOG_STORAGE: {self.food_log_storage}")
+            self.food_entries = self.db.food_entries
+            if self.food_log_storage == "collection":
+                self.food_entries.create_index(
+                    [("user_id", ASCENDING), ("date", DESCENDING), ("meal_type", ASCENDING)]
+                )
 
             # Create insights collection if it doesn't exist
-            if "user_insights" not in self.db.list_collection_names():
+            if "user_insights" not in existing_collections:
                 self.db.create_collection("user_insights")
                 print("Created insights collection")
             self.user_insights = self.db.user_insights
 
+            # Outgoing email waiting for the background sender; sent emails expire
+            if "email_outbox" not in existing_collections:
+                self.db.create_collection("email_outbox")
+                print("Created email outbox collection")
+            self.email_outbox = self.db.email_outbox
+            self.email_outbox.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+            self.email_outbox.create_index("expires_at", expireAfterSeconds=0)
+
+            # Barcode lookups, keyed by GTIN-13; unknown codes expire so they are retried
+            self.barcodes = self.db.barcodes
+            self.barcodes.create_index("expires_at", expireAfterSeconds=0)
+
+            # Profile and daily log reads tolerate some lag, so they can be
+            # spread over secondaries. A user's reads still see their own last
+            # write made in this worker, for MONGODB_CAUSAL_TTL seconds.
+            self.read_preference = read_preference(settings.mongodb_read_preference, settings.mongodb_max_staleness)
+            self.scaled_reads = settings.mongodb_read_preference != "primary"
+            self.profile_reads = self.profiles.with_options(read_preference=self.read_preference)
+            self.food_log_reads = self.food_logs.with_options(read_preference=self.read_preference)
+            self.food_entry_reads = self.food_entries.with_options(read_preference=self.read_preference)
+            self.last_writes = TTLCache("last_writes", settings.target_cache_size, settings.mongodb_causal_ttl)
+
+            # Chat turns and each user's rolling summary of older turns; both expire
+            self.chat_turns = self.db.chat_turns
+            self.chat_turns.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+            self.chat_turns.create_index("expires_at", expireAfterSeconds=0)
+            self.chat_summaries = self.db.chat_summaries
+            self.chat_summaries.create_index("expires_at", expireAfterSeconds=0)
+
+            # Progress of bulk imports, keyed by import ID, so they can be resumed
+            self.import_checkpoints = self.db.import_checkpoints
+
+            # Keep the caches of other workers in step with writes made here
+            self.invalidations = InvalidationBus(self.db)
+            self.invalidations.subscribe("user_insights", self.targets.delete)
+            if settings.cache_invalidation_enabled:
+                self.invalidations.setup()
+                self.invalidations.start()
+
         except Exception as e:
             print(f"MongoDB connection failed: {str(e)}")
             raise RuntimeError(f"Failed to connect to MongoDB: {str(e)}")
 
+    def close(self):
+        self.invalidations.stop()
+        self.client.close()
+
+    def ensure_food_log_index(self):
+        """Create the unique (user_id, date) index of daily logs.
+
+        Raises DuplicateKeyError while a user has several logs for one day;
+        merge_duplicate_food_logs merges them.
+        """
+        self.food_logs.create_index([("user_id", ASCENDING), ("date", DESCENDING)], unique=True)
+
+    @contextmanager
+    def _causal_write(self, user_id: str):
+        """Run a user's writes in a causally consistent session when reads may go to secondaries.
+
+        The session's cluster and operation times are kept, so that the user's
+        next reads wait for a secondary to catch up with the write.
+        """
+        if not self.scaled_reads or _write_session.get() is not None:
+            yield
+            return
+        with self.client.start_session(causal_consistency=True) as session:
+            token = _write_session.set(session)
+            try:
+                yield
+            finally:
+                _write_session.reset(token)
+                if session.operation_time is not None:
+                    self.last_writes.set(user_id, (session.cluster_time, session.operation_time))
+
+    @contextmanager
+    def _causal_read(self, user_id: str):
+        """Yield the session for a user's reads: one that sees their last write, or None without one."""
+        last_write = self.last_writes.get(user_id) if self.scaled_reads else None
+        if last_write is None:
+            yield None
+            return
+        cluster_time, operation_time = last_write
+        with self.client.start_session(causal_consistency=True) as session:
+            session.advance_cluster_time(cluster_time)
+            session.advance_operation_time(operation_time)
+            yield session
+
+    @timed("mongo.create_user_profile")
+    @causal_write
     async def create_user_profile(self, user_id: str, profile_data: Dict[str, Any]):
         try:
-            # Check if profile already exists
-            existing = await self.get_user_profile(user_id)
-            if existing:
+            # Check if profile already exists, on the primary, which any secondary may lag behind
+            if self.profiles.find_one({"user_id": user_id}, {"_id": 1}, session=_write_session.get()):
                 return False
 
             # Add user_id to profile data
             profile_data["user_id"] = user_id
 
             # Insert new profile
-            result = self.profiles.insert_one(profile_data)
+            result = self.profiles.insert_one(profile_data, session=_write_session.get())
+            scope = current_request_scope()
+            if scope is not None:
+                scope.remember("profiles", user_id, {**profile_data, "_id": str(result.inserted_id)})
             return result.acknowledged
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
+    @timed("mongo.update_user_profile")
+    @causal_write
     async def update_user_profile(self, user_id: str, profile_data: Dict[str, Any], is_new: bool = False):
         try:
             # Add user_id to profile data
@@ -70,182 +429,846 @@ class MongoDBService:
             result = self.profiles.update_one(
                 {"user_id": user_id},
                 {"$set": profile_data},
-                upsert=True  # This creates a new document if it doesn't exist
+                upsert=True,  # This creates a new document if it doesn't exist
+                session=_write_session.get(),
             )
-            
+            scope = current_request_scope()
+            if scope is not None:
+                scope.update("profiles", user_id, profile_data)
+
             return result.acknowledged
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
+    @timed("mongo.get_user_profile")
     async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         try:
-            profile = self.profiles.find_one({"user_id": user_id})
+            # Served from the request's identity map after the first read
+            scope = current_request_scope()
+            if scope is not None:
+                profile = scope.get("profiles", user_id)
+                if profile is not MISSING:
+                    return profile
+
+            with self._causal_read(user_id) as session:
+                profile = self.profile_reads.find_one({"user_id": user_id}, session=session)
             if profile:
                 profile["_id"] = str(profile["_id"])  # Convert ObjectId to string
+            if scope is not None:
+                scope.remember("profiles", user_id, profile)
             return profile
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
-    async def add_food_entry(self, user_id: str, entry_data: Dict[str, Any]):
+    def _get_targets(self, user_id: str) -> Dict[str, Any]:
+        """Return the user's daily targets: calories (their TDEE) and macro grams."""
+        targets = self.targets.get(user_id)
+        if targets is not None:
+            return targets
+
+        projection = {"tdee": 1, **{macro: 1 for macro in MACROS}}
+        targets = targets_from_insights(self.user_insights.find_one({"user_id": user_id}, projection))
+        self.targets.set(user_id, targets)
+        return targets
+
+    @timed("mongo.add_food_entry")
+    @causal_write
+    async def add_food_entry(self, user_id: str, entry_data: Dict[str, Any]) -> str:
+        """Log an entry and return its ID."""
         try:
             date_str = entry_data["date"]
-            current_time = datetime.now().strftime("%H:%M:%S")
-            
-            # Get user's TDEE from insights
-            user_insights = self.user_insights.find_one({"user_id": user_id})
-            target_calories = user_insights["tdee"] if user_insights else 2000  # Default if no insights
-            
-            new_calories = entry_data["calories"]
-            new_entry = {
-                "food_name": entry_data["food_name"],
-                "calories": new_calories,
-                "serving_size": entry_data.get("serving_size"),
-                "time_logged": current_time
-            }
-            
-            daily_log = self.food_logs.find_one({
-                "user_id": user_id,
-                "date": date_str
-            })
-            
-            if not daily_log:
-                initial_log = {
+
+            # Get user's TDEE and macro targets from insights
+            targets = self._get_targets(user_id)
+
+            meal_type, new_entry = logged_entry(entry_data)
+            increment = totals_increment(entry_amounts(new_entry))
+
+            if self.food_log_storage == "collection":
+                self.food_entries.insert_one({
+                    "_id": new_entry["entry_id"],
                     "user_id": user_id,
                     "date": date_str,
-                    "total_calories": new_calories,
-                    "target_calories": target_calories,  # Use TDEE from insights
-                    "remaining_calories": target_calories - new_calories,
-                    "meals": {
-                        "breakfast": [],
-                        "lunch": [],
-                        "dinner": [],
-                        "snacks": [],
-                        "drinks": []
-                    }
-                }
-                
-                meal_type = entry_data["meal_type"].lower()
-                initial_log["meals"][meal_type].append(new_entry)
-                
-                # Insert the new document
-                result = self.food_logs.insert_one(initial_log)
-                return result.acknowledged
+                    "meal_type": meal_type,
+                    **new_entry,
+                }, session=_write_session.get())
+                self._add_to_daily_totals(user_id, date_str, targets, {"$inc": increment})
             else:
-                # Update existing daily log
-                current_total = daily_log.get("total_calories", 0)
-                new_total = current_total + new_calories
-                remaining = target_calories - new_total  # Use TDEE from insights
-                
-                meal_type = entry_data["meal_type"].lower()
+                self._add_to_daily_totals(
+                    user_id, date_str, targets,
+                    {"$push": {f"meals.{meal_type}": new_entry}, "$inc": increment},
+                    [new_entry], meal_type,
+                )
+            return new_entry["entry_id"]
                 
-                # Update the existing document
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.add_food_entries")
+    @causal_write
+    async def add_food_entries(
+        self, user_id: str, date_str: str, meal_type: str, entries_data: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Log several entries to one meal and return the updated daily log.
+
+        With embedded entries this is a single find-and-update of the day, so
+        the entries are logged together or not at all.
+        """
+        try:
+            targets = self._get_targets(user_id)
+
+            entries = [logged_entry({**entry_data, "meal_type": meal_type})[1] for entry_data in entries_data]
+            meal_type = normalize_meal_type(meal_type)
+            increment = totals_increment(sum_amounts(entries))
+
+            if self.food_log_storage == "collection":
+                if entries:
+                    self.food_entries.insert_many([
+                        {
+                            "_id": entry["entry_id"],
+                            "user_id": user_id,
+                            "date": date_str,
+                            "meal_type": meal_type,
+                            **entry,
+                        }
+                        for entry in entries
+                    ], session=_write_session.get())
+                log = self._add_to_daily_totals(user_id, date_str, targets, {"$inc": increment}, return_log=True)
+                return self._attach_entries(user_id, [log], session=_write_session.get())[0]
+            return self._add_to_daily_totals(
+                user_id, date_str, targets,
+                {"$push": {f"meals.{meal_type}": {"$each": entries}}, "$inc": increment},
+                entries, meal_type, return_log=True,
+            )
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    def _add_to_daily_totals(
+        self,
+        user_id: str,
+        date_str: str,
+        targets: Dict[str, Any],
+        update: Dict[str, Any],
+        entries: Optional[List[Dict[str, Any]]] = None,
+        meal_type: Optional[str] = None,
+        return_log: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply an update of entries to their daily log, creating the log if needed.
+
+        Totals only ever move by $inc, so concurrent writes to the same day
+        cannot lose each other's calories. With ``return_log`` the updated log
+        is returned, read back by the same write.
+        """
+        query = {"user_id": user_id, "date": date_str, "macro_totals": {"$exists": True}}
+        session = _write_session.get()
+        for _ in range(3):
+            if return_log:
+                log = self.food_logs.find_one_and_update(
+                    query, update, projection=LOG_PROJECTION, return_document=ReturnDocument.AFTER, session=session
+                )
+                if log is not None:
+                    return log
+            elif self.food_logs.update_one(query, update, session=session).matched_count:
+                return None
+            # The day may exist, logged before macros were tracked. This is not
+            # left to the unique index, which an unmigrated database lacks.
+            if self._start_macro_totals(user_id, date_str, targets):
+                continue
+            log = new_food_log(user_id, date_str, targets, embedded=entries is not None)
+            apply_increment(log, update["$inc"])
+            if entries is not None:
+                log["meals"][meal_type].extend(entries)
+            try:
+                self.food_logs.insert_one(log, session=session)
+                # insert_one adds Mongo's id to the document
+                log.pop("_id", None)
+                return log if return_log else None
+            except DuplicateKeyError:
+                # Another request created the day first
+                pass
+        raise RuntimeError("Food log is being modified concurrently, try again")
+
+    def _start_macro_totals(self, user_id: str, date_str: str, targets: Dict[str, Any]) -> bool:
+        """Start the macro totals of a day logged before macros were tracked.
+
+        Its entries have no macros, so the totals start at 0. Returns whether
+        there was such a day.
+        """
+        return bool(self.food_logs.update_one(
+            {"user_id": user_id, "date": date_str, "macro_totals": {"$exists": False}},
+            {"$set": {
+                "macro_totals": {macro: 0.0 for macro in MACROS},
+                "macro_targets": {macro: targets[macro] for macro in MACROS},
+                "macro_remaining": {macro: float(targets[macro]) for macro in MACROS},
+            }},
+            session=_write_session.get(),
+        ).matched_count)
+
+    def _refresh_targets(self, user_id: str, targets: Dict[str, Any]):
+        """Apply new targets to the user's logs from today on, keeping what they have logged.
+
+        Only logs whose stored targets differ are rewritten, so this is decided
+        by the logs themselves rather than by what this worker has cached.
+        """
+        macro_totals = {macro: {"$ifNull": [f"$macro_totals.{macro}", 0.0]} for macro in MACROS}
+        stale = [{"target_calories": {"$ne": targets["calories"]}}]
+        stale += [{f"macro_targets.{macro}": {"$ne": targets[macro]}} for macro in MACROS]
+        self.food_logs.update_many(
+            {"user_id": user_id, "date": {"$gte": date.today().isoformat()}, "$or": stale},
+            [
+                {"$set": {
+                    "target_calories": targets["calories"],
+                    "macro_targets": {macro: targets[macro] for macro in MACROS},
+                    "macro_totals": macro_totals,
+                }},
+                {"$set": {
+                    "remaining_calories": {"$subtract": [targets["calories"], "$total_calories"]},
+                    "macro_remaining": {
+                        macro: {"$subtract": [targets[macro], f"$macro_totals.{macro}"]} for macro in MACROS
+                    },
+                }},
+            ],
+            session=_write_session.get(),
+        )
+
+    def _adjust_daily_totals(self, user_id: str, date_str: str, increment: Dict[str, float]):
+        """Apply a change in logged amounts to a daily log's totals."""
+        if any(increment.values()):
+            self.food_logs.update_one(
+                {"user_id": user_id, "date": date_str}, {"$inc": increment}, session=_write_session.get()
+            )
+
+    @timed("mongo.update_food_entry")
+    @causal_write
+    async def update_food_entry(
+        self, user_id: str, date_str: str, meal_type: str, entry_id: str, changes: Dict[str, Any]
+    ) -> bool:
+        """Update fields of a logged entry, keeping the day's totals in step.
+
+        Returns False when there is no such entry.
+        """
+        meal_type = normalize_meal_type(meal_type)
+        changes = normalize_entry_changes(changes)
+        try:
+            if self.food_log_storage == "collection":
+                before = self.food_entries.find_one_and_update(
+                    {"_id": entry_id, "user_id": user_id, "date": date_str, "meal_type": meal_type},
+                    {"$set": changes},
+                    projection={"calories": 1, **{macro: 1 for macro in MACROS}},
+                    session=_write_session.get(),
+                )
+                if before is None:
+                    return False
+                self._adjust_daily_totals(user_id, date_str, self._change_increment(before, changes))
+                return True
+
+            field = f"meals.{meal_type}"
+            for _ in range(3):
+                entry = self._find_embedded_entry(user_id, date_str, field, entry_id)
+                if entry is None:
+                    return False
+                # Only applies if the entry still has the amounts the change was
+                # computed from; otherwise it changed meanwhile and is read again
                 result = self.food_logs.update_one(
-                    {"user_id": user_id, "date": date_str},
+                    {"user_id": user_id, "date": date_str, field: {"$elemMatch": self._entry_match(entry)}},
                     {
-                        "$push": {f"meals.{meal_type}": new_entry},
-                        "$set": {
-                            "total_calories": new_total,
-                            "remaining_calories": remaining,
-                            "target_calories": target_calories  # Update target calories
-                        }
-                    }
+                        "$set": {f"{field}.$.{key}": value for key, value in changes.items()},
+                        "$inc": self._change_increment(entry, changes),
+                    },
+                    session=_write_session.get(),
                 )
-                return result.acknowledged
-                
+                if result.matched_count:
+                    return True
+            raise RuntimeError("Food entry is being modified concurrently, try again")
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
+    @timed("mongo.delete_food_entry")
+    @causal_write
+    async def delete_food_entry(self, user_id: str, date_str: str, meal_type: str, entry_id: str) -> bool:
+        """Remove a logged entry and its amounts from the day's totals.
+
+        Returns False when there is no such entry.
+        """
+        meal_type = normalize_meal_type(meal_type)
+        try:
+            if self.food_log_storage == "collection":
+                deleted = self.food_entries.find_one_and_delete(
+                    {"_id": entry_id, "user_id": user_id, "date": date_str, "meal_type": meal_type},
+                    projection={"calories": 1, **{macro: 1 for macro in MACROS}},
+                    session=_write_session.get(),
+                )
+                if deleted is None:
+                    return False
+                self._adjust_daily_totals(user_id, date_str, self._removal_increment(deleted))
+                return True
+
+            field = f"meals.{meal_type}"
+            for _ in range(3):
+                entry = self._find_embedded_entry(user_id, date_str, field, entry_id)
+                if entry is None:
+                    return False
+                result = self.food_logs.update_one(
+                    {"user_id": user_id, "date": date_str, field: {"$elemMatch": self._entry_match(entry)}},
+                    {"$pull": {field: {"entry_id": entry_id}}, "$inc": self._removal_increment(entry)},
+                    session=_write_session.get(),
+                )
+                if result.matched_count:
+                    return True
+            raise RuntimeError("Food entry is being modified concurrently, try again")
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @staticmethod
+    def _entry_match(entry: Dict[str, Any]) -> Dict[str, Any]:
+        # A missing macro matches None as well
+        return {"entry_id": entry["entry_id"], "calories": entry["calories"], **{m: entry.get(m) for m in MACROS}}
+
+    @staticmethod
+    def _change_increment(entry: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, float]:
+        before = entry_amounts(entry)
+        after = entry_amounts({**entry, **changes})
+        return totals_increment({key: after[key] - before[key] for key in before})
+
+    @staticmethod
+    def _removal_increment(entry: Dict[str, Any]) -> Dict[str, float]:
+        return totals_increment({key: -value for key, value in entry_amounts(entry).items()})
+
+    def _find_embedded_entry(self, user_id: str, date_str: str, field: str, entry_id: str) -> Optional[Dict[str, Any]]:
+        # Only the meal's entries are read, a handful per day
+        log = self.food_logs.find_one(
+            {"user_id": user_id, "date": date_str, f"{field}.entry_id": entry_id},
+            {field: 1, "macro_totals": 1},
+            session=_write_session.get(),
+        )
+        if log is None:
+            return None
+        if "macro_totals" not in log:
+            # $inc of the macro totals needs them to start from the right place
+            self._start_macro_totals(user_id, date_str, self._get_targets(user_id))
+        entries = log
+        for part in field.split("."):
+            entries = entries[part]
+        return next(entry for entry in entries if entry.get("entry_id") == entry_id)
+
+    def _attach_entries(
+        self, user_id: str, logs: List[Dict[str, Any]], entries=None, session: Optional[ClientSession] = None
+    ) -> List[Dict[str, Any]]:
+        """Fill in the meals of daily logs whose entries are kept in their own collection.
+
+        Entries are read from ``entries``, the primary's food_entries by default.
+        """
+        if not logs:
+            return logs
+        by_date = {log["date"]: log for log in logs}
+        for log in logs:
+            log["meals"] = {meal: [] for meal in MEAL_TYPES}
+        query = {"user_id": user_id, "date": {"$in": list(by_date)}}
+        projection = {"_id": 0, "user_id": 0}
+        entries = self.food_entries if entries is None else entries
+        for entry in entries.find(query, projection, session=session).sort("time_logged", ASCENDING):
+            log = by_date[entry.pop("date")]
+            log["meals"][entry.pop("meal_type")].append(entry)
+        return logs
+
+    @timed("mongo.get_daily_food_log")
     async def get_daily_food_log(
         self, user_id: str, date_param: date
     ) -> Optional[Dict[str, Any]]:
         try:
             date_str = date_param.isoformat()
 
-            # Find the daily log
-            daily_log = self.food_logs.find_one({"user_id": user_id, "date": date_str})
+            # Stored values are normalized on write, so the document is returned as-is
+            with self._causal_read(user_id) as session:
+                daily_log = self.food_log_reads.find_one(
+                    {"user_id": user_id, "date": date_str}, LOG_PROJECTION, session=session
+                )
+
+                if daily_log and self.food_log_storage == "collection":
+                    self._attach_entries(user_id, [daily_log], self.food_entry_reads, session)
 
             if not daily_log:
-                # Get user's TDEE from insights
-                user_insights = self.user_insights.find_one({"user_id": user_id})
-                target_calories = user_insights["tdee"] if user_insights else 2000  # Default if no insights
+                # Return an empty daily log with the user's targets
+                empty_log = new_food_log(user_id, date_str, self._get_targets(user_id))
+                del empty_log["user_id"]
+                return empty_log
 
-                # Return empty daily log structure with TDEE as target
-                return {
-                    "date": date_str,
-                    "total_calories": 0,
-                    "target_calories": target_calories,
-                    "remaining_calories": target_calories,
-                    "meals": {
-                        "breakfast": [],
-                        "lunch": [],
-                        "dinner": [],
-                        "snacks": [],
-                        "drinks": [],
-                    },
-                }
+            return daily_log
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
-            # Remove MongoDB-specific fields
-            if "_id" in daily_log:
-                daily_log.pop("_id")
+    @timed("mongo.get_all_user_food_logs")
+    async def get_all_user_food_logs(self, user_id: str) -> List[Dict[str, Any]]:
+        try:
+            # Most recent first, served by the (user_id, date) index
+            with self._causal_read(user_id) as session:
+                logs = self.food_log_reads.find({"user_id": user_id}, LOG_PROJECTION, session=session)
+                logs = list(logs.sort("date", DESCENDING))
+                if self.food_log_storage == "collection":
+                    return self._attach_entries(user_id, logs, self.food_entry_reads, session)
+                return logs
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
-            # Convert number types to float/int
-            daily_log["total_calories"] = float(daily_log["total_calories"])
-            daily_log["target_calories"] = int(daily_log["target_calories"])
-            daily_log["remaining_calories"] = float(daily_log["remaining_calories"])
+    def iter_food_log_rows(
+        self,
+        user_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        batch_size: int = 200,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield one flat row per logged entry, oldest day first, reading the cursor in batches.
 
-            # Convert nested number types in meals
-            for meal_type in daily_log["meals"]:
-                for entry in daily_log["meals"][meal_type]:
-                    if "calories" in entry:
-                        entry["calories"] = float(entry["calories"])
+        ``start`` and ``end`` are inclusive ISO dates.
+        """
+        query: Dict[str, Any] = {"user_id": user_id}
+        if start or end:
+            query["date"] = {}
+            if start:
+                query["date"]["$gte"] = start
+            if end:
+                query["date"]["$lte"] = end
+        try:
+            if self.food_log_storage == "collection":
+                cursor = self.food_entries.find(query, {"_id": 0, "user_id": 0}, batch_size=batch_size)
+                yield from cursor.sort([("date", ASCENDING), ("time_logged", ASCENDING)])
+                return
 
-            return daily_log
+            cursor = self.food_logs.find(query, {"_id": 0, "date": 1, "meals": 1}, batch_size=batch_size)
+            for log in cursor.sort("date", ASCENDING):
+                for meal_type in MEAL_TYPES:
+                    for entry in (log.get("meals") or {}).get(meal_type, []):
+                        yield {**entry, "date": log["date"], "meal_type": meal_type}
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
-    async def get_all_user_food_logs(self, user_id: str) -> List[Dict[str, Any]]:
+    def normalize_legacy_food_logs(self, batch_size: int = 500) -> Dict[str, int]:
+        """Rewrite food logs stored with inconsistent number types.
+
+        Streams the collection in batches and only rewrites documents whose
+        normalized form differs from what is stored. Documents with values
+        that cannot be normalized (e.g. negative calories) are reported and
+        left as they are.
+        """
+        scanned = 0
+        rewritten = 0
+        failed = 0
+        pending = []
+        try:
+            cursor = self.food_logs.find({}, batch_size=batch_size)
+            for log in cursor:
+                scanned += 1
+                try:
+                    normalized = normalize_food_log(log)
+                except (ValueError, TypeError) as e:
+                    failed += 1
+                    print(f"Skipping food log {log['_id']}: {e}")
+                    continue
+                stored = {key: log.get(key) for key in normalized}
+                # Compare encoded BSON so that e.g. 2000 vs 2000.0 counts as a difference
+                if bson.encode(normalized) != bson.encode(stored):
+                    pending.append(UpdateOne({"_id": log["_id"]}, {"$set": normalized}))
+                if len(pending) >= batch_size:
+                    rewritten += self.food_logs.bulk_write(pending, ordered=False).modified_count
+                    pending = []
+            if pending:
+                rewritten += self.food_logs.bulk_write(pending, ordered=False).modified_count
+            return {"scanned": scanned, "rewritten": rewritten, "failed": failed}
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    def merge_duplicate_food_logs(self) -> int:
+        """Merge the logs a user has for the same day into one, returning the number of days merged.
+
+        Needed before the unique (user_id, date) index can be built. Each day
+        is written to its oldest log before the others are deleted; merging is
+        repeatable, so an interrupted run can simply be started again.
+        """
+        merged = 0
+        try:
+            days = list(self.food_logs.aggregate([
+                {"$group": {
+                    "_id": {"user_id": "$user_id", "date": "$date"},
+                    "ids": {"$push": "$_id"},
+                    "count": {"$sum": 1},
+                }},
+                {"$match": {"count": {"$gt": 1}}},
+            ]))
+            for day in days:
+                logs = list(self.food_logs.find({"_id": {"$in": day["ids"]}}).sort("_id", ASCENDING))
+                entries = None
+                if self.food_log_storage == "collection":
+                    entries = list(self.food_entries.find(day["_id"]))
+                try:
+                    fields = merge_food_logs(logs, entries)
+                except (ValueError, TypeError) as e:
+                    print(f"Skipping the food logs of {day['_id']}: {e}")
+                    continue
+                self.food_logs.update_one({"_id": logs[0]["_id"]}, {"$set": fields})
+                self.food_logs.delete_many({"_id": {"$in": [log["_id"] for log in logs[1:]]}})
+                merged += 1
+            return merged
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    def import_food_entries(self, days: Dict[Any, List[Any]]):
+        """Write imported entries, grouped as {(user_id, date): [(meal_type, entry), ...]}.
+
+        Each day is one upsert in a single unordered bulk write. Entries whose
+        ID is already logged are skipped, so importing the same rows again
+        leaves the logs as they were.
+        """
+        try:
+            if self.food_log_storage == "collection":
+                self._import_entry_documents(days)
+                return
+            operations = []
+            for (user_id, date_str), entries in days.items():
+                by_meal: Dict[str, List[Dict[str, Any]]] = {}
+                for meal_type, entry in entries:
+                    by_meal.setdefault(meal_type, []).append(entry)
+                operations.append(UpdateOne(
+                    {"user_id": user_id, "date": date_str},
+                    self._import_pipeline(self._get_targets(user_id), by_meal),
+                    upsert=True,
+                ))
+            self.food_logs.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    def _import_entry_documents(self, days: Dict[Any, List[Any]]):
+        operations = []
+        for (user_id, date_str), entries in days.items():
+            for meal_type, entry in entries:
+                operations.append(UpdateOne(
+                    {"_id": entry["entry_id"]},
+                    {"$setOnInsert": {"user_id": user_id, "date": date_str, "meal_type": meal_type, **entry}},
+                    upsert=True,
+                ))
         try:
-            # Find all logs for the user
-            logs = self.food_logs.find({"user_id": user_id})
+            self.food_entries.bulk_write(operations, ordered=False)
+        except BulkWriteError:
+            # The entries that were written still count
+            self._import_day_totals(list(days))
+            raise
+        self._import_day_totals(list(days))
 
-            # Convert cursor to list and process each log
-            all_logs = []
-            for log in logs:
-                # Remove MongoDB-specific fields
-                if "_id" in log:
-                    log.pop("_id")
+    def _import_day_totals(self, days: List[Tuple[str, str]]):
+        """Set the totals of imported days to the sum of every entry stored for them.
 
-                # Convert number types to float/int
-                log["total_calories"] = float(log["total_calories"])
-                log["target_calories"] = int(log["target_calories"])
-                log["remaining_calories"] = float(log["remaining_calories"])
+        Summing what is stored, rather than what this write added, also counts
+        entries stored by an earlier run that stopped before its totals.
+        """
+        sums = self.food_entries.aggregate([
+            {"$match": {"$or": [{"user_id": user_id, "date": date_str} for user_id, date_str in days]}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "date": "$date"},
+                "calories": {"$sum": "$calories"},
+                **{macro: {"$sum": f"${macro}"} for macro in MACROS},
+            }},
+        ])
+        operations = []
+        for day in sums:
+            user_id, date_str = day["_id"]["user_id"], day["_id"]["date"]
+            totals = {
+                "total_calories": float(day["calories"]),
+                "macro_totals": {macro: float(day[macro]) for macro in MACROS},
+            }
+            operations.append(UpdateOne(
+                {"user_id": user_id, "date": date_str},
+                self._imported_totals_pipeline(self._get_targets(user_id), totals),
+                upsert=True,
+            ))
+        if operations:
+            self.food_logs.bulk_write(operations, ordered=False)
 
-                # Convert nested number types in meals
-                for meal_type in log["meals"]:
-                    for entry in log["meals"][meal_type]:
-                        if "calories" in entry:
-                            entry["calories"] = float(entry["calories"])
+    @classmethod
+    def _import_pipeline(cls, targets: Dict[str, Any], by_meal: Dict[str, List[Dict[str, Any]]]) -> List[Dict]:
+        meals = {}
+        for meal_type in MEAL_TYPES:
+            logged = {"$ifNull": [f"$meals.{meal_type}", []]}
+            if meal_type not in by_meal:
+                meals[f"meals.{meal_type}"] = logged
+                continue
+            meals[f"meals.{meal_type}"] = {"$concatArrays": [logged, {"$filter": {
+                "input": {"$literal": by_meal[meal_type]},
+                "as": "entry",
+                "cond": {"$not": {"$in": [
+                    "$$entry.entry_id", {"$ifNull": [f"$meals.{meal_type}.entry_id", []]}
+                ]}},
+            }}]}
+        # The totals are summed from the entries, which also starts them on days
+        # logged before macros were tracked
+        totals = {
+            "total_calories": {"$add": [{"$sum": f"$meals.{meal}.calories"} for meal in MEAL_TYPES]},
+            "macro_totals": {
+                macro: {"$add": [{"$sum": f"$meals.{meal}.{macro}"} for meal in MEAL_TYPES]} for macro in MACROS
+            },
+        }
+        return [{"$set": meals}, *cls._imported_totals_pipeline(targets, totals)]
 
-                all_logs.append(log)
+    @staticmethod
+    def _imported_totals_pipeline(targets: Dict[str, Any], totals: Dict[str, Any]) -> List[Dict]:
+        # Days that already exist keep their targets
+        return [
+            {"$set": {
+                "target_calories": {"$ifNull": ["$target_calories", targets["calories"]]},
+                "macro_targets": {
+                    macro: {"$ifNull": [f"$macro_targets.{macro}", targets[macro]]} for macro in MACROS
+                },
+                **totals,
+            }},
+            {"$set": {
+                "remaining_calories": {"$subtract": ["$target_calories", "$total_calories"]},
+                "macro_remaining": {
+                    macro: {"$subtract": [f"$macro_targets.{macro}", f"$macro_totals.{macro}"]} for macro in MACROS
+                },
+            }},
+        ]
 
-            # Sort by date (most recent first)
-            all_logs.sort(key=lambda x: x["date"], reverse=True)
+    def get_import_checkpoint(self, import_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.import_checkpoints.find_one({"_id": import_id})
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
-            return all_logs
+    def save_import_checkpoint(self, import_id: str, stats: Dict[str, Any], finished: bool = False):
+        """Record how many input rows of an import are done."""
+        try:
+            self.import_checkpoints.update_one(
+                {"_id": import_id},
+                {"$set": {
+                    "rows": stats["rows"],
+                    "imported": stats["imported"],
+                    "rejected": stats["rejected"],
+                    "finished": finished,
+                    "updated_at": datetime.utcnow(),
+                }},
+                upsert=True,
+            )
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
+    @timed("mongo.update_user_insights")
+    @causal_write
     async def update_user_insights(self, user_id: str, insights_data: Dict[str, Any]):
         try:
             result = self.user_insights.update_one(
                 {"user_id": user_id},
                 {"$set": insights_data},
-                upsert=True
+                upsert=True,
+                session=_write_session.get(),
             )
+            # Write through, so this worker's next log entry uses the new targets,
+            # and move the targets of today's (and later) logs
+            if "tdee" in insights_data:
+                targets = targets_from_insights(insights_data)
+                self._refresh_targets(user_id, targets)
+                self.targets.set(user_id, targets)
+            if self.invalidations.is_running:
+                self.invalidations.publish("user_insights", user_id)
             return result.acknowledged
         except PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {str(e)}")
 
+    @timed("mongo.get_cached_barcode")
+    async def get_cached_barcode(self, gtin: str) -> Optional[Dict[str, Any]]:
+        """Return the cached lookup of a barcode, or None if it was never looked up.
+
+        A cached lookup's "food" is None for codes FatSecret does not know.
+        """
+        try:
+            return self.barcodes.find_one({"_id": gtin}, {"food": 1})
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.cache_barcode")
+    async def cache_barcode(self, gtin: str, food: Optional[Dict[str, Any]], negative_ttl: float):
+        """Store a barcode lookup; found foods are kept, unknown codes for ``negative_ttl`` seconds."""
+        try:
+            now = datetime.utcnow()
+            document = {"food": food, "cached_at": now}
+            update = {"$set": document}
+            if food is None:
+                document["expires_at"] = now + timedelta(seconds=negative_ttl)
+            else:
+                update["$unset"] = {"expires_at": ""}
+            self.barcodes.update_one({"_id": gtin}, update, upsert=True)
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.get_chat_history")
+    async def get_chat_history(self, user_id: str, limit: int, oldest_first: bool = False) -> Dict[str, Any]:
+        """Return a user's chat summary and the last ``limit`` turns it does not cover, oldest first.
+
+        With ``oldest_first``, the first ``limit`` turns it does not cover instead.
+        """
+        try:
+            summary = self.chat_summaries.find_one({"_id": user_id})
+            query = {"user_id": user_id}
+            if summary:
+                query["created_at"] = {"$gt": summary["until"]}
+            projection = {"_id": 0, "message": 1, "reply": 1, "tokens": 1, "created_at": 1}
+            order = ASCENDING if oldest_first else DESCENDING
+            turns = list(self.chat_turns.find(query, projection).sort("created_at", order).limit(limit))
+            return {"summary": summary["summary"] if summary else None, "turns": turns if oldest_first else turns[::-1]}
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.add_chat_turn")
+    async def add_chat_turn(self, user_id: str, message: str, reply: str, tokens: int, ttl: float):
+        """Store a message and its reply, kept for ``ttl`` seconds."""
+        try:
+            now = datetime.utcnow()
+            self.chat_turns.insert_one({
+                "user_id": user_id,
+                "message": message,
+                "reply": reply,
+                "tokens": tokens,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl),
+            })
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.save_chat_summary")
+    async def save_chat_summary(self, user_id: str, summary: str, until: datetime, ttl: float) -> bool:
+        """Store the summary of a user's turns up to ``until``, unless a later one is stored already."""
+        try:
+            now = datetime.utcnow()
+            self.chat_summaries.update_one(
+                {"_id": user_id, "until": {"$lt": until}},
+                {"$set": {"summary": summary, "until": until, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # Another worker summarized further already
+            return False
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.delete_chat_history")
+    async def delete_chat_history(self, user_id: str, ttl: float):
+        """Delete a user's chat turns and summary.
+
+        An empty summary of everything until now is left for ``ttl`` seconds,
+        so a summary of the deleted turns still being made is not stored.
+        """
+        try:
+            now = datetime.utcnow()
+            self.chat_summaries.replace_one(
+                {"_id": user_id},
+                {"summary": None, "until": now, "expires_at": now + timedelta(seconds=ttl)},
+                upsert=True,
+            )
+            self.chat_turns.delete_many({"user_id": user_id})
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.enqueue_email")
+    async def enqueue_email(self, recipient: str, subject: str, body: str) -> str:
+        try:
+            now = datetime.utcnow()
+            result = self.email_outbox.insert_one({
+                "recipient": recipient,
+                "subject": subject,
+                "body": body,
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now,
+            })
+            return str(result.inserted_id)
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.claim_outbox_emails")
+    async def claim_outbox_emails(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """Lease up to ``limit`` due emails to this sender.
+
+        Emails whose lease ran out (their sender died mid-batch) are claimed again.
+        """
+        try:
+            now = datetime.utcnow()
+            due = {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "leased_until": {"$lte": now}},
+            ]}
+            lease = {"$set": {"status": "sending", "leased_until": now + timedelta(seconds=lease_seconds)}}
+            claimed = []
+            while len(claimed) < limit:
+                email = self.email_outbox.find_one_and_update(
+                    due, lease, sort=[("next_attempt_at", ASCENDING)], return_document=ReturnDocument.AFTER
+                )
+                if email is None:
+                    break
+                claimed.append(email)
+            return claimed
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.mark_emails_sent")
+    async def mark_emails_sent(self, email_ids: List[Any], ttl: float):
+        """Mark emails sent; they are kept for ``ttl`` seconds."""
+        try:
+            now = datetime.utcnow()
+            self.email_outbox.update_many(
+                {"_id": {"$in": email_ids}},
+                {
+                    "$set": {"status": "sent", "sent_at": now, "expires_at": now + timedelta(seconds=ttl)},
+                    "$unset": {"leased_until": ""},
+                },
+            )
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.reschedule_email")
+    async def reschedule_email(self, email_id: Any, error: str, retry_in: Optional[float]):
+        """Record a failed attempt; retry after ``retry_in`` seconds, or give up when it is None."""
+        try:
+            update = {
+                "$inc": {"attempts": 1},
+                "$set": {"last_error": error},
+                "$unset": {"leased_until": ""},
+            }
+            if retry_in is None:
+                update["$set"]["status"] = "failed"
+            else:
+                update["$set"]["status"] = "pending"
+                update["$set"]["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=retry_in)
+            self.email_outbox.update_one({"_id": email_id}, update)
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+    @timed("mongo.count_outbox_emails")
+    async def count_outbox_emails(self) -> int:
+        try:
+            return self.email_outbox.count_documents({"status": {"$in": ["pending", "sending"]}})
+        except PyMongoError as e:
+            raise RuntimeError(f"MongoDB operation failed: {str(e)}")
+
+
+_mongodb_service = None
+_mongodb_service_lock = threading.Lock()
+
 
 def get_mongodb_service():
-    return MongoDBService()
+    """Return the process-wide MongoDBService, connecting on first use.
+
+    The underlying MongoClient is a connection pool and is shared by all requests.
+    """
+    global _mongodb_service
+    if _mongodb_service is None:
+        with _mongodb_service_lock:
+            if _mongodb_service is None:
+                _mongodb_service = MongoDBService()
+    return _mongodb_service
+
+
+def close_mongodb_service():
+    global _mongodb_service
+    with _mongodb_service_lock:
+        if _mongodb_service is not None:
+            _mongodb_service.close()
+            _mongodb_service = None
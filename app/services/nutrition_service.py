@@ -1,6 +1,6 @@
 from datetime import date
 from fastapi import HTTPException
-from app.services.mongodb_service import MongoDBService
+from app.services.storage import StorageBackend
 from typing import Dict, Tuple
 
 # Activity level multipliers
@@ -52,10 +52,10 @@ def calculate_macros(tdee: float, goal: str) -> Dict[str, int]:
         "fats_grams": int((tdee * ratios["fats"]) / 9),
     }
 
-async def calculate_nutrition_for_user(user_id: str, mongodb_service: MongoDBService) -> Tuple[float, Dict[str, float]]:
+async def calculate_nutrition_for_user(user_id: str, storage: StorageBackend) -> Tuple[float, Dict[str, float]]:
     try:
         # Get profile from MongoDB
-        profile_data = await mongodb_service.get_user_profile(user_id)
+        profile_data = await storage.get_user_profile(user_id)
         if not profile_data:
             raise HTTPException(
                 status_code=404,
@@ -90,7 +90,7 @@ async def calculate_nutrition_for_user(user_id: str, mongodb_service: MongoDBSer
         macros = calculate_macros(tdee, profile_data["goal"])
 
         # Store the insights
-        await mongodb_service.update_user_insights(user_id, {
+        await storage.update_user_insights(user_id, {
             "tdee": tdee,
             "protein_grams": macros["protein_grams"],
             "carbs_grams": macros["carbs_grams"],
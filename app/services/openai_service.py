@@ -0,0 +1,90 @@
+import threading
+from app.config import get_settings
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.deadline import remaining, timeout_for
+from app.services.metrics import OPENAI_TOKENS
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """Create the shared OpenAI client on first use.
+
+    The client keeps a pooled HTTP connection, so it is reused by every request.
+    The openai package itself is imported here too, as it is the single most
+    expensive import of the app.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                settings = get_settings()
+                _client = OpenAI(api_key=settings.require("openai_api_key"), timeout=settings.openai_timeout)
+    return _client
+
+
+def close_openai_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# Calls currently waiting on OpenAI, so shutdown can let them finish first
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_idle = threading.Event()
+_idle.set()
+
+
+def _is_outage(error: BaseException) -> bool:
+    # Only called once a call has failed, so the client has been imported already
+    import openai
+
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError))
+
+
+def record_token_usage(operation: str, usage):
+    """Count the prompt and completion tokens a call used, which are what it is billed by."""
+    if usage is None:
+        return
+    OPENAI_TOKENS.labels(operation=operation, kind="prompt").inc(usage.prompt_tokens or 0)
+    OPENAI_TOKENS.labels(operation=operation, kind="completion").inc(usage.completion_tokens or 0)
+
+
+def create_chat_completion(operation: str = "chat", **kwargs):
+    """Run a chat completion on the shared client, tracked as in flight.
+
+    Its token usage is counted under ``operation``.
+    """
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+        _idle.clear()
+    try:
+        client = get_openai_client()
+        if remaining() is not None:
+            # Within a request, the call gets what is left of its budget, and
+            # no retries, which would outlive it
+            client = client.with_options(timeout=timeout_for(get_settings().openai_timeout), max_retries=0)
+        breaker = get_circuit_breaker("openai", _is_outage)
+        response = breaker.call(client.chat.completions.create, **kwargs)
+        record_token_usage(operation, response.usage)
+        return response
+    finally:
+        with _in_flight_lock:
+            _in_flight -= 1
+            if _in_flight == 0:
+                _idle.set()
+
+
+def drain_openai_calls(timeout: float) -> bool:
+    """Block until no OpenAI call is in flight or ``timeout`` seconds pass.
+
+    Returns whether all calls finished.
+    """
+    return _idle.wait(timeout)
@@ -0,0 +1,75 @@
+import copy
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+# Marks a document the identity map knows nothing about, as opposed to one
+# it knows does not exist (None)
+MISSING = object()
+
+
+class RequestScope:
+    """Per-request identity map of Mongo documents and count of Mongo round trips.
+
+    Documents are keyed by (collection, user id). Reads within the request are
+    served from the map once loaded, and writes update it, so a profile that is
+    read by the router, the service and the nutrition calculation is fetched once.
+    """
+
+    def __init__(self):
+        self.documents: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+        self.mongo_round_trips = 0
+
+    def get(self, collection: str, key: str):
+        document = self.documents.get((collection, key), MISSING)
+        # Callers are free to mutate what they get back
+        return document if document is MISSING or document is None else copy.deepcopy(document)
+
+    def remember(self, collection: str, key: str, document: Optional[Dict[str, Any]]):
+        self.documents[(collection, key)] = copy.deepcopy(document)
+
+    def update(self, collection: str, key: str, fields: Dict[str, Any]):
+        """Apply a $set to a remembered document, or forget it if it is unknown."""
+        document = self.documents.get((collection, key))
+        if document is None:
+            # An upsert of an absent or unknown document; the stored result
+            # (e.g. its _id) is not known here
+            self.forget(collection, key)
+        else:
+            document.update(copy.deepcopy(fields))
+
+    def forget(self, collection: str, key: str):
+        self.documents.pop((collection, key), None)
+
+
+_request_scope: ContextVar[Optional[RequestScope]] = ContextVar("request_scope", default=None)
+
+
+def start_request_scope():
+    """Start a fresh identity map and round-trip count for the current request."""
+    scope = RequestScope()
+    return scope, _request_scope.set(scope)
+
+
+def stop_request_scope(token):
+    _request_scope.reset(token)
+
+
+def current_request_scope() -> Optional[RequestScope]:
+    return _request_scope.get()
+
+
+class MongoRoundTripCounter(monitoring.CommandListener):
+    """Count the commands sent to MongoDB on behalf of the current request."""
+
+    def started(self, event):
+        scope = _request_scope.get()
+        if scope is not None:
+            scope.mongo_round_trips += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
@@ -0,0 +1,119 @@
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Protocol
+
+from app.config import get_settings
+from app.services.memory_storage import InMemoryStorage
+from app.services.mongodb_service import close_mongodb_service, get_mongodb_service
+
+STORAGE_BACKENDS = ("mongodb", "memory")
+
+
+class StorageBackend(Protocol):
+    """The operations the API performs on stored data.
+
+    ``MongoDBService`` is the production implementation; ``InMemoryStorage``
+    has the same semantics for tests and benchmarks that should not need a
+    server. Bulk imports and maintenance scripts stay Mongo-only.
+    """
+
+    async def create_user_profile(self, user_id: str, profile_data: Dict[str, Any]) -> bool:
+        ...
+
+    async def update_user_profile(self, user_id: str, profile_data: Dict[str, Any], is_new: bool = False) -> bool:
+        ...
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    async def add_food_entry(self, user_id: str, entry_data: Dict[str, Any]) -> str:
+        ...
+
+    async def add_food_entries(
+        self, user_id: str, date_str: str, meal_type: str, entries_data: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        ...
+
+    async def update_food_entry(
+        self, user_id: str, date_str: str, meal_type: str, entry_id: str, changes: Dict[str, Any]
+    ) -> bool:
+        ...
+
+    async def delete_food_entry(self, user_id: str, date_str: str, meal_type: str, entry_id: str) -> bool:
+        ...
+
+    async def get_daily_food_log(self, user_id: str, date_param: date) -> Optional[Dict[str, Any]]:
+        ...
+
+    async def get_all_user_food_logs(self, user_id: str) -> List[Dict[str, Any]]:
+        ...
+
+    def iter_food_log_rows(
+        self, user_id: str, start: Optional[str] = None, end: Optional[str] = None, batch_size: int = 200
+    ) -> Iterator[Dict[str, Any]]:
+        ...
+
+    async def update_user_insights(self, user_id: str, insights_data: Dict[str, Any]) -> bool:
+        ...
+
+    async def get_cached_barcode(self, gtin: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    async def cache_barcode(self, gtin: str, food: Optional[Dict[str, Any]], negative_ttl: float):
+        ...
+
+    async def get_chat_history(self, user_id: str, limit: int, oldest_first: bool = False) -> Dict[str, Any]:
+        ...
+
+    async def add_chat_turn(self, user_id: str, message: str, reply: str, tokens: int, ttl: float):
+        ...
+
+    async def save_chat_summary(self, user_id: str, summary: str, until: datetime, ttl: float) -> bool:
+        ...
+
+    async def delete_chat_history(self, user_id: str, ttl: float):
+        ...
+
+    async def enqueue_email(self, recipient: str, subject: str, body: str) -> str:
+        ...
+
+    async def claim_outbox_emails(self, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        ...
+
+    async def mark_emails_sent(self, email_ids: List[Any], ttl: float):
+        ...
+
+    async def reschedule_email(self, email_id: Any, error: str, retry_in: Optional[float]):
+        ...
+
+    async def count_outbox_emails(self) -> int:
+        ...
+
+    def close(self):
+        ...
+
+
+_memory_storage = None
+_memory_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Return the process-wide storage backend chosen by STORAGE_BACKEND."""
+    global _memory_storage
+    backend = get_settings().storage_backend
+    if backend not in STORAGE_BACKENDS:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {backend}")
+    if backend == "mongodb":
+        return get_mongodb_service()
+    if _memory_storage is None:
+        with _memory_storage_lock:
+            if _memory_storage is None:
+                _memory_storage = InMemoryStorage()
+    return _memory_storage
+
+
+def close_storage():
+    global _memory_storage
+    close_mongodb_service()
+    with _memory_storage_lock:
+        _memory_storage = None
@@ -0,0 +1,93 @@
+import functools
+import inspect
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Optional
+
+from app.services.metrics import UPSTREAM_LATENCY
+
+# Per-request accumulator of upstream call durations (seconds), keyed by operation.
+# The access log middleware installs a fresh dict for every request it handles.
+_upstream_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "upstream_timings", default=None
+)
+
+
+def start_upstream_timings():
+    """Start collecting upstream timings for the current request."""
+    timings: Dict[str, float] = {}
+    return timings, _upstream_timings.set(timings)
+
+
+def stop_upstream_timings(token):
+    _upstream_timings.reset(token)
+
+
+def record_upstream(operation: str, seconds: float):
+    timings = _upstream_timings.get()
+    if timings is not None:
+        timings[operation] = timings.get(operation, 0.0) + seconds
+
+
+class timed:
+    """Time an upstream call, as a decorator (sync or async) or a context manager.
+
+    Durations are added to the current request's upstream timings and observed
+    in the upstream latency histogram, labelled by operation and outcome.
+
+    Example:
+        @timed("mongo.get_user_profile")
+        async def get_user_profile(...): ...
+
+        with timed("openai.chat"):
+            client.chat.completions.create(...)
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        # Resolve the labelled children once instead of on every observation
+        self._success = UPSTREAM_LATENCY.labels(operation=operation, outcome="success")
+        self._error = UPSTREAM_LATENCY.labels(operation=operation, outcome="error")
+        self._start = 0.0
+
+    def _observe(self, seconds: float, failed: bool):
+        record_upstream(self.operation, seconds)
+        (self._error if failed else self._success).observe(seconds)
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._observe(perf_counter() - self._start, exc_type is not None)
+        return False
+
+    def __call__(self, func):
+        observe = self._observe
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = perf_counter()
+                failed = True
+                try:
+                    result = await func(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    observe(perf_counter() - start, failed)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                observe(perf_counter() - start, failed)
+
+        return wrapper
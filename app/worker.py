@@ -0,0 +1,12 @@
+from uvicorn_worker import UvicornWorker
+
+
+class MealMeterWorker(UvicornWorker):
+    """Gunicorn worker running the app on uvloop with the httptools parser.
+
+    On SIGTERM the worker stops accepting connections, waits for in-flight
+    requests to finish (bounded by gunicorn's graceful_timeout) and then runs
+    the app's lifespan shutdown.
+    """
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
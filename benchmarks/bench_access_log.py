@@ -0,0 +1,95 @@
+"""Micro-benchmark of the access log middleware overhead.
+
+Drives a minimal FastAPI app directly through its ASGI interface (no sockets)
+with and without ``AccessLogMiddleware`` and reports the added cost per request.
+
+Usage:
+    python -m benchmarks.bench_access_log [--requests 20000] [--sample-rate 1.0]
+"""
+import argparse
+import asyncio
+import logging
+from time import perf_counter
+
+from fastapi import FastAPI
+
+from app.middleware.access_log import AccessLogMiddleware, setup_access_log
+
+
+def build_app(with_access_log: bool, sample_rate: float):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"item_id": item_id}
+
+    if with_access_log:
+        app.add_middleware(
+            AccessLogMiddleware,
+            sample_rate=sample_rate,
+            headers="user-agent,authorization",
+            redact_headers="authorization",
+        )
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/items/42",
+        "raw_path": b"/items/42",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"user-agent", b"bench"), (b"authorization", b"Bearer secret")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8000),
+        "state": {},
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up routing and middleware stack construction
+    for _ in range(100):
+        await app(dict(scope), receive, send)
+
+    start = perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Access log middleware overhead")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    args = parser.parse_args()
+
+    listener = setup_access_log()
+    # Discard the output, only the cost of producing and queueing lines is measured
+    listener.handlers = (logging.NullHandler(),)
+    listener.start()
+    try:
+        baseline = asyncio.run(drive(build_app(False, args.sample_rate), args.requests))
+        logged = asyncio.run(drive(build_app(True, args.sample_rate), args.requests))
+    finally:
+        listener.stop()
+
+    per_request_base = baseline / args.requests * 1e6
+    per_request_logged = logged / args.requests * 1e6
+    print(f"requests:          {args.requests}")
+    print(f"sample rate:       {args.sample_rate}")
+    print(f"without middleware {per_request_base:8.1f} us/request")
+    print(f"with middleware    {per_request_logged:8.1f} us/request")
+    print(f"overhead           {per_request_logged - per_request_base:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
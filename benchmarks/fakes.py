@@ -0,0 +1,126 @@
+"""In-process stand-ins for Firebase and MongoDB used by the load tests.
+
+Tokens issued by the fake Firebase are ``bench-<uid>`` and verify locally.
+"""
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+BENCH_ENV = {
+    "FIREBASE_KEY_FILE": "bench_firebase_key.json",
+    "MAIL_USERNAME": "bench@example.com",
+    "MAIL_PASSWORD": "bench",
+    "MAIL_FROM": "bench@example.com",
+    "MAIL_PORT": "587",
+    "MAIL_SERVER": "localhost",
+    "MAIL_FROM_NAME": "MealMeter Bench",
+    "FIREBASE_API_KEY": "bench",
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "FATSECRET_CLIENT_ID": "bench",
+    "FATSECRET_CLIENT_SECRET": "bench",
+    "OPENAI_API_KEY": "bench",
+    "ADMIN_API_KEY": "bench",
+    "ACCESS_LOG_SAMPLE_RATE": "0",
+    # mongomock has no capped collections
+    "CACHE_INVALIDATION_ENABLED": "false",
+}
+
+
+def token_for(uid: str) -> str:
+    return f"bench-{uid}"
+
+
+class FakeFirebase:
+    """Replaces the firebase_admin calls made by the app with an in-memory user store."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.users = {}
+        self._ids = itertools.count(1)
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_user(self, email: str, uid: str = None, email_verified: bool = True):
+        uid = uid or f"user-{next(self._ids)}"
+        user = SimpleNamespace(uid=uid, email=email, email_verified=email_verified)
+        self.users[email] = user
+        return user
+
+    def verify_id_token(self, id_token, *args, **kwargs):
+        if not id_token.startswith("bench-"):
+            raise ValueError("Invalid bench token")
+        uid = id_token[len("bench-"):]
+        return {"uid": uid, "email": f"{uid}@mealmeter-bench.com", "email_verified": True}
+
+    def get_user_by_email(self, email, *args, **kwargs):
+        from firebase_admin import auth
+
+        self._sleep()
+        if email not in self.users:
+            raise auth.UserNotFoundError(f"No user record found for {email}")
+        return self.users[email]
+
+    def create_user(self, email=None, password=None, **kwargs):
+        self._sleep()
+        return self.add_user(email, email_verified=False)
+
+    def generate_link(self, email, *args, **kwargs):
+        return f"http://localhost/verify?email={email}"
+
+    def install(self):
+        import firebase_admin
+        from firebase_admin import auth, credentials
+
+        credentials.Certificate = lambda *args, **kwargs: None
+        firebase_admin.initialize_app = lambda *args, **kwargs: SimpleNamespace(name="bench")
+        firebase_admin.delete_app = lambda *args, **kwargs: None
+        auth.verify_id_token = self.verify_id_token
+        auth.get_user_by_email = self.get_user_by_email
+        auth.create_user = self.create_user
+        auth.generate_email_verification_link = self.generate_link
+        auth.generate_password_reset_link = self.generate_link
+        auth.update_user = lambda *args, **kwargs: None
+        # Certificate prefetching goes through the admin SDK's internal token verifier
+        verifier = SimpleNamespace(
+            request=lambda **kwargs: None, id_token_verifier=SimpleNamespace(cert_url="bench")
+        )
+        auth._get_client = lambda *args, **kwargs: SimpleNamespace(_token_verifier=verifier)
+
+
+def install_fake_mail(latency: float = 0.0):
+    """Make outgoing email a no-op that only waits ``latency`` seconds."""
+    from app.services.email_service import EmailSender
+
+    async def send(self, email, *args, **kwargs):
+        if latency:
+            await asyncio.sleep(latency)
+
+    EmailSender._send = send
+
+
+def install_mongo(uri: str = None):
+    """Point MongoDBService at a local server, or at a shared in-memory mongomock client."""
+    from app.services import mongodb_service
+
+    if uri:
+        import pymongo
+
+        client = pymongo.MongoClient(uri)
+    else:
+        import inspect
+
+        import mongomock
+        from mongomock import collection
+
+        # pymongo 4.11+ passes a sort option with each bulk UpdateOne, which mongomock 4.3 predates
+        add_update = collection.BulkOperationBuilder.add_update
+        if "sort" not in inspect.signature(add_update).parameters:
+            collection.BulkOperationBuilder.add_update = (
+                lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+            )
+        client = mongomock.MongoClient()
+    mongodb_service.MongoClient = lambda *args, **kwargs: client
+    return client
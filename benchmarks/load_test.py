@@ -0,0 +1,369 @@
+"""Offline load test of the real app against local stand-ins for every upstream.
+
+Firebase is replaced in-process, MongoDB is an in-memory mongomock client (or a
+local server with --mongo-uri, or left out with --storage memory), and FatSecret, OpenAI and identitytoolkit are
+served by local HTTP stubs with configurable latency. The app itself runs under
+uvicorn on a local port and every route is driven with concurrent requests.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load_test --requests 200 --concurrency 20 \\
+        --output benchmarks/results/latest.json \\
+        --baseline benchmarks/baselines/default.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.fakes import BENCH_ENV, FakeFirebase, install_fake_mail, install_mongo, token_for
+from benchmarks.stub_upstreams import StubUpstreams
+
+LOG_DATE = "2024-01-25"
+# A handful of products scanned over and over, as in practice
+BARCODES = [f"50000000000{index:02d}" for index in range(10)]
+PROFILE = {
+    "gender": "male",
+    "birthdate": "1990-05-17",
+    "height_cm": 180.0,
+    "weight_kg": 80.0,
+    "activity_level": "moderately active",
+    "goal": "weight loss",
+    "target_weight": 75.0,
+    "weekly_goal_kg": 0.5,
+}
+FOOD_ENTRY = {
+    "food_name": "Chicken Caesar Salad",
+    "meal_type": "lunch",
+    "calories": 450,
+    "serving_size": "1 plate",
+    "date": LOG_DATE,
+}
+# Any bytes do, the stubbed model never looks at the image
+IMAGE_BYTES = b"\xff\xd8\xff\xe0" + b"\x00" * 2048
+# Rows per admin import, spread over a few users and days of their own
+IMPORT_ROWS = 100
+IMPORT_USERS = 10
+
+
+def parse_latencies(value: str) -> Dict[str, float]:
+    latencies = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = item.partition("=")
+        latencies[name.strip()] = float(seconds)
+    return latencies
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def import_file(n: int) -> bytes:
+    """Return the JSONL upload of admin import ``n``."""
+    rows = (
+        {
+            "user_id": f"bench-import-{row % IMPORT_USERS}",
+            "date": f"2023-12-{1 + (n + row) % 28:02d}",
+            "meal_type": "lunch",
+            "food_name": "Oatmeal",
+            "calories": 150 + row % 50,
+        }
+        for row in range(IMPORT_ROWS)
+    )
+    return "\n".join(json.dumps(row) for row in rows).encode()
+
+
+def build_scenarios(users: List[str], entries: List[Tuple[str, str]]) -> Dict[str, Callable]:
+    """Map route names to functions issuing one request for virtual user ``n``.
+
+    ``entries`` are the (user, entry ID) pairs logged before measuring, one
+    for each request that deletes an entry.
+    """
+
+    def headers(n):
+        return {"Authorization": f"Bearer {token_for(users[n % len(users)])}"}
+
+    def entry_request(n):
+        uid, entry_id = entries[n % len(entries)]
+        return {
+            "url": f"/food-log/entry/{entry_id}",
+            "params": {"date": LOG_DATE, "meal_type": FOOD_ENTRY["meal_type"]},
+            "headers": {"Authorization": f"Bearer {token_for(uid)}"},
+        }
+
+    signups = iter(range(10**9))
+
+    return {
+        "POST /auth/signup": lambda client, n: client.post(
+            "/auth/signup", json={"email": f"signup-{next(signups)}@mealmeter-bench.com", "password": "benchpass"}
+        ),
+        "POST /auth/login": lambda client, n: client.post(
+            "/auth/login", json={"email": "login@mealmeter-bench.com", "password": "benchpass"}
+        ),
+        "GET /auth/verify": lambda client, n: client.get(
+            "/auth/verify", params={"id_token": token_for(users[n % len(users)])}
+        ),
+        "GET /users/profile": lambda client, n: client.get("/users/profile", headers=headers(n)),
+        "PUT /users/profile": lambda client, n: client.put(
+            "/users/profile", json={"weight_kg": 79.5}, headers=headers(n)
+        ),
+        "GET /insights/nutrition": lambda client, n: client.get("/insights/nutrition", headers=headers(n)),
+        "POST /food-log/entry": lambda client, n: client.post(
+            "/food-log/entry", json=FOOD_ENTRY, headers=headers(n)
+        ),
+        "PUT /food-log/entry/{entry_id}": lambda client, n: client.put(
+            **entry_request(n), json={"calories": 400 + n % 100}
+        ),
+        "DELETE /food-log/entry/{entry_id}": lambda client, n: client.delete(**entry_request(n)),
+        "GET /food-log/daily/{date}": lambda client, n: client.get(
+            f"/food-log/daily/{LOG_DATE}", headers=headers(n)
+        ),
+        "GET /food-log/all": lambda client, n: client.get("/food-log/all", headers=headers(n)),
+        "GET /food-log/export": lambda client, n: client.get(
+            "/food-log/export", params={"format": "csv"}, headers=headers(n)
+        ),
+        "GET /food/search": lambda client, n: client.get(
+            "/food/search", params={"query": "chicken"}, headers=headers(n)
+        ),
+        "GET /food/barcode/{gtin}": lambda client, n: client.get(
+            f"/food/barcode/{BARCODES[n % len(BARCODES)]}", headers=headers(n)
+        ),
+        "POST /chat/message": lambda client, n: client.post(
+            "/chat/message", json={"message": "Is rice a good carb source?"}, headers=headers(n)
+        ),
+        "POST /food-recognition": lambda client, n: client.post(
+            "/food-recognition", files={"image": ("meal.jpg", IMAGE_BYTES, "image/jpeg")}
+        ),
+        # Recognized and logged to the meal in one request
+        "POST /food-recognition (log)": lambda client, n: client.post(
+            "/food-recognition",
+            params={"date": LOG_DATE, "meal_type": "dinner"},
+            files={"image": ("meal.jpg", IMAGE_BYTES, "image/jpeg")},
+            headers=headers(n),
+        ),
+        "POST /admin/import/food-logs": lambda client, n: client.post(
+            "/admin/import/food-logs",
+            files={"file": ("food-logs.jsonl", import_file(n), "application/jsonl")},
+            headers={"X-Admin-Key": BENCH_ENV["ADMIN_API_KEY"]},
+        ),
+    }
+
+
+async def drive_route(client, issue: Callable, requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    first_error = None
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, first_error
+        for n in counter:
+            start = time.perf_counter()
+            try:
+                response = await issue(client, n)
+                error = f"{response.status_code} {response.text[:200]}" if response.status_code >= 400 else None
+            except Exception as e:
+                error = repr(e)
+            latencies.append(time.perf_counter() - start)
+            if error:
+                errors += 1
+                first_error = first_error or error
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "first_error": first_error,
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run_load(base_url: str, users: List[str], args) -> Dict[str, Dict]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Every virtual user gets a profile (and therefore insights) before measuring
+        for uid in users:
+            response = await client.post(
+                "/users/profile", json=PROFILE, headers={"Authorization": f"Bearer {token_for(uid)}"}
+            )
+            response.raise_for_status()
+        # Entries to update and delete, one for each delete request
+        entries = []
+        for n in range(max(args.requests, len(users))):
+            uid = users[n % len(users)]
+            response = await client.post(
+                "/food-log/entry", json=FOOD_ENTRY, headers={"Authorization": f"Bearer {token_for(uid)}"}
+            )
+            response.raise_for_status()
+            entries.append((uid, response.json()["entry_id"]))
+
+        scenarios = build_scenarios(users, entries)
+        selected = [name for name in scenarios if not args.routes or any(r in name for r in args.routes)]
+        results = {}
+        for name in selected:
+            results[name] = await drive_route(client, scenarios[name], args.requests, args.concurrency)
+            print(f"  {name:<36} {results[name]['throughput_rps']:>9.1f} rps  "
+                  f"p50 {results[name]['p50_ms']:>8.1f} ms  p95 {results[name]['p95_ms']:>8.1f} ms  "
+                  f"p99 {results[name]['p99_ms']:>8.1f} ms  errors {results[name]['errors']}")
+            if results[name]["first_error"]:
+                print(f"    first error: {results[name]['first_error']}")
+        return results
+
+
+# Run parameters that change what is measured; a baseline only applies to runs that share them
+WORKLOAD_META = ("requests_per_route", "concurrency", "users", "latency", "mongo", "storage")
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every route that regressed beyond ``tolerance``.
+
+    Raises ValueError when the baseline was recorded with other run parameters.
+    """
+    baseline_meta = baseline.get("meta", {})
+    mismatched = [
+        f"{key} {results['meta'].get(key)!r} (baseline {baseline_meta.get(key)!r})"
+        for key in WORKLOAD_META
+        if results["meta"].get(key) != baseline_meta.get(key)
+    ]
+    if mismatched:
+        raise ValueError(f"Baseline was recorded with other run parameters: {', '.join(mismatched)}")
+    regressions = []
+    for name, base in baseline.get("routes", {}).items():
+        current = results["routes"].get(name)
+        if current is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if base["throughput_rps"] and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']} rps vs baseline {base['throughput_rps']} rps"
+            )
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against local upstream stand-ins")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20, help="Number of virtual users with profiles")
+    parser.add_argument("--routes", nargs="*", help="Only run routes whose name contains one of these")
+    parser.add_argument(
+        "--latency",
+        default="fatsecret=0.05,openai=0.3,identitytoolkit=0.08",
+        help="Upstream stub latencies in seconds, e.g. fatsecret=0.05,openai=0.3",
+    )
+    parser.add_argument("--firebase-latency", type=float, default=0.0, help="Latency of fake admin calls")
+    parser.add_argument("--mail-latency", type=float, default=0.0)
+    parser.add_argument("--mongo-uri", help="Use a local MongoDB server instead of in-memory mongomock")
+    parser.add_argument(
+        "--storage", choices=("mongodb", "memory"), default="mongodb",
+        help="Storage backend of the app; memory leaves Mongo out of the measurement",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against a previously saved JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    stubs = StubUpstreams(parse_latencies(args.latency)).start()
+    for name, value in {**BENCH_ENV, **stubs.environment()}.items():
+        os.environ.setdefault(name, value)
+    os.environ["STORAGE_BACKEND"] = args.storage
+
+    firebase = FakeFirebase(latency=args.firebase_latency)
+    firebase.install()
+    firebase.add_user("login@mealmeter-bench.com", uid="login")
+    install_fake_mail(args.mail_latency)
+    install_mongo(args.mongo_uri)
+
+    import logging
+    import uvicorn
+    from app.main import app
+
+    # The app logs every step at INFO, which would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    users = [f"bench-user-{index}" for index in range(args.users)]
+    try:
+        print(f"Driving {args.requests} requests per route at concurrency {args.concurrency}")
+        routes = asyncio.run(run_load(f"http://127.0.0.1:{port}", users, args))
+    finally:
+        server.should_exit = True
+        thread.join()
+        stubs.stop()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "requests_per_route": args.requests,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "latency": args.latency,
+            "mongo": "local" if args.mongo_uri else "mongomock",
+            "storage": args.storage,
+        },
+        "routes": routes,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        try:
+            regressions = compare(results, baseline, args.tolerance)
+        except ValueError as e:
+            sys.exit(str(e))
+        unchecked = sorted(set(results["routes"]) - set(baseline.get("routes", {})))
+        if unchecked:
+            print(f"Not in the baseline, so not checked: {', '.join(unchecked)}")
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Break cold-start cost down into module imports and client initialization.
+
+Import cost is measured in a fresh interpreter with ``python -X importtime``;
+initialization cost is measured by running the app's warm-up steps one by one.
+By default the upstreams are the offline stand-ins used by the load test, so
+the numbers are repeatable; pass --live to initialize against the configured
+services instead.
+
+Usage:
+    python -m benchmarks.startup_report [--live] [--top 15]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from time import perf_counter
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def import_times(module: str):
+    """Return (self_us, cumulative_us) per imported module, importing ``module`` from scratch."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def report_imports(top: int):
+    modules = import_times("app.main")
+    total_us = sum(self_us for self_us, _ in modules.values())
+
+    app_modules = sorted(
+        ((name, times) for name, times in modules.items() if name == "app" or name.startswith("app.")),
+        key=lambda item: item[1][1],
+        reverse=True,
+    )
+    by_package = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"Import of app.main: {total_us / 1000:.1f} ms across {len(modules)} modules\n")
+    print("Application modules (cumulative, includes their dependencies):")
+    for name, (self_us, cumulative_us) in app_modules:
+        print(f"  {name:<45} {cumulative_us / 1000:9.1f} ms  (self {self_us / 1000:.1f} ms)")
+    print(f"\nTop {top} packages by own import time:")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {package:<45} {self_us / 1000:9.1f} ms")
+
+
+def report_initialization():
+    from app.lifespan import WARMUP_STEPS
+
+    print("\nClient initialization (run sequentially):")
+    for name, step in WARMUP_STEPS.items():
+        start = perf_counter()
+        try:
+            step()
+            outcome = "ok"
+        except Exception as e:
+            outcome = f"failed: {e}"
+        print(f"  {name:<45} {(perf_counter() - start) * 1000:9.1f} ms  {outcome}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start breakdown")
+    parser.add_argument("--live", action="store_true", help="Initialize against the configured upstreams")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    stubs = None
+    if not args.live:
+        from benchmarks.fakes import BENCH_ENV, FakeFirebase, install_mongo
+        from benchmarks.stub_upstreams import StubUpstreams
+
+        stubs = StubUpstreams().start()
+        for name, value in {**BENCH_ENV, **stubs.environment()}.items():
+            os.environ.setdefault(name, value)
+        FakeFirebase().install()
+        install_mongo()
+
+    try:
+        report_imports(args.top)
+        report_initialization()
+    finally:
+        if stubs:
+            stubs.stop()
+
+
+if __name__ == "__main__":
+    main()
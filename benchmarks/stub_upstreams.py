@@ -0,0 +1,197 @@
+"""Local HTTP stubs for FatSecret, OpenAI and Google identitytoolkit.
+
+Each upstream answers with a canned payload after a configurable delay, so
+load tests exercise the real HTTP clients without leaving the machine.
+"""
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+FOOD_RECOGNITION_CONTENT = {
+    "food_items": [
+        {"name": "Grilled chicken", "calories": 280, "serving": "150 g"},
+        {"name": "Rice", "calories": 205, "serving": "1 cup"},
+    ],
+    "total": 485,
+}
+
+FOODS_SEARCH_RESPONSE = {
+    "foods": {
+        "food": [
+            {
+                "food_id": str(index),
+                "food_name": f"Chicken dish {index}",
+                "food_type": "Generic",
+                "food_description": "Per 100g - Calories: 165kcal | Fat: 3.57g | Carbs: 0.00g | Protein: 31.02g",
+            }
+            for index in range(20)
+        ],
+        "max_results": "20",
+        "page_number": "0",
+        "total_results": "20",
+    }
+}
+
+FOOD_GET_RESPONSE = {
+    "food": {
+        "food_id": "4384",
+        "food_name": "Cereal Bar",
+        "brand_name": "Bench Foods",
+        "food_type": "Brand",
+        "servings": {
+            "serving": {
+                "is_default": "1",
+                "serving_description": "1 bar",
+                "calories": "190",
+                "protein": "3.00",
+                "carbohydrate": "29.00",
+                "fat": "7.00",
+            }
+        },
+    }
+}
+
+
+def _id_token(claims: Dict) -> str:
+    # JWT-shaped but unsigned; the app only reads claims from login responses
+    def part(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b"=").decode()
+
+    return f"{part({'alg': 'none'})}.{part(claims)}.bench"
+
+
+# Prompt tokens of an image by detail, as OpenAI bills a 1024px photo
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+
+def _usage(request: Dict, content: str) -> Dict:
+    """Estimate token usage the way OpenAI bills it: about 4 characters a token, images by detail."""
+    prompt_tokens = len(json.dumps(request.get("response_format") or {})) // 4
+    for message in request.get("messages", []):
+        parts = message["content"] if isinstance(message["content"], list) else [{"text": message["content"]}]
+        for part in parts:
+            if "image_url" in part:
+                prompt_tokens += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), 765)
+            else:
+                prompt_tokens += len(part.get("text", "")) // 4
+    completion_tokens = len(content) // 4
+    if request.get("max_tokens"):
+        completion_tokens = min(completion_tokens, request["max_tokens"])
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _chat_completion(content: str, usage: Dict) -> Dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "stub",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": usage,
+    }
+
+
+class StubUpstreams:
+    """Threaded HTTP server hosting every upstream stub on one local port."""
+
+    def __init__(self, latencies: Dict[str, float] = None, port: int = 0):
+        self.latencies = latencies or {}
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, upstream: str, payload: Dict, status: int = 200):
+                delay = stubs.latencies.get(upstream, 0.0)
+                if delay:
+                    time.sleep(delay)
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def do_GET(self):
+                if self.path.startswith("/fatsecret/rest/server.api"):
+                    method = parse_qs(urlparse(self.path).query).get("method", [""])[0]
+                    if method == "food.find_id_for_barcode":
+                        self._reply("fatsecret", {"food_id": {"value": "4384"}})
+                    elif method == "food.get.v2":
+                        self._reply("fatsecret", FOOD_GET_RESPONSE)
+                    else:
+                        self._reply("fatsecret", FOODS_SEARCH_RESPONSE)
+                else:
+                    self._reply("unknown", {"error": "not found"}, 404)
+
+            def do_POST(self):
+                raw = self._body()
+                if self.path.startswith("/fatsecret/connect/token"):
+                    self._reply("fatsecret", {"access_token": "stub-token", "expires_in": 86400})
+                elif self.path.startswith("/openai/v1/chat/completions"):
+                    request = json.loads(raw or b"{}")
+                    if request.get("response_format"):
+                        content = json.dumps(FOOD_RECOGNITION_CONTENT)
+                    else:
+                        content = "Stubbed nutrition advice."
+                    self._reply("openai", _chat_completion(content, _usage(request, content)))
+                elif self.path.startswith("/identitytoolkit/v1/accounts:signInWithPassword"):
+                    request = json.loads(raw or b"{}")
+                    self._reply(
+                        "identitytoolkit",
+                        {
+                            "idToken": _id_token({"user_id": "login", "email_verified": True}),
+                            "refreshToken": "bench-refresh",
+                            "email": request.get("email"),
+                            "localId": "login",
+                        },
+                    )
+                else:
+                    self._reply("unknown", {"error": "not found"}, 404)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables pointing the app's clients at the stubs."""
+        return {
+            "FATSECRET_API_URL": f"{self.base_url}/fatsecret/rest/server.api",
+            "FATSECRET_AUTH_URL": f"{self.base_url}/fatsecret/connect/token",
+            "OPENAI_BASE_URL": f"{self.base_url}/openai/v1",
+            "FIREBASE_AUTH_URL": f"{self.base_url}/identitytoolkit",
+        }
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,49 @@
+"""Production serving configuration.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every setting can be overridden through the environment variables below.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# One event loop per core; the app is async and I/O bound
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "app.worker.MealMeterWorker"
+
+# Recycle workers after a bounded number of requests, staggered by the jitter
+# so that they do not all restart at once
+max_requests = int(os.getenv("MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "500"))
+
+# Time given to in-flight requests (e.g. OpenAI calls) to finish on shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "60"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Workers read this to split the Mongo connection budget between them
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Must be set before workers import prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/mealmeter-prometheus")
+
+
+def on_starting(server):
+    # Metrics are aggregated across workers through files in this directory,
+    # which must start out empty
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
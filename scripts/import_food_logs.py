@@ -0,0 +1,42 @@
+"""Bulk import of historical food entries from a JSONL or CSV file.
+
+Usage:
+    python -m scripts.import_food_logs entries.jsonl [--format jsonl] [--import-id ID] [--chunk-size 5000]
+
+Each row has user_id, date, meal_type, food_name and calories, and optionally
+serving_size, time_logged, entry_id and the macro grams. Run again with the
+printed import ID to resume an interrupted import.
+"""
+import argparse
+
+from app.services.import_service import IMPORT_FORMATS, FoodLogImporter, read_rows
+from app.services.mongodb_service import MongoDBService
+
+
+def print_progress(stats):
+    print(
+        f"{stats['rows']} rows ({stats['imported']} imported, {stats['rejected']} rejected), "
+        f"{stats['rows_per_second']:.0f} rows/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, default=None, help="Defaults to the file extension")
+    parser.add_argument("--import-id", default=None)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    import_format = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    importer = FoodLogImporter(MongoDBService(), import_id=args.import_id, chunk_size=args.chunk_size)
+    print(f"Import ID: {importer.import_id}")
+    with open(args.path, newline="", encoding="utf-8") as stream:
+        stats = importer.run(read_rows(stream, import_format), progress=print_progress)
+    for error in stats["errors"]:
+        print(f"Row {error['row']}: {error['error']}")
+    print(f"Done in {stats['elapsed_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
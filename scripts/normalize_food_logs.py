@@ -0,0 +1,39 @@
+"""One-off migration that rewrites legacy food logs with canonical number types.
+
+Days logged more than once are then merged, and the unique (user_id, date)
+index is built once none are left.
+
+Usage:
+    python -m scripts.normalize_food_logs [--batch-size 500]
+"""
+import argparse
+
+from pymongo.errors import DuplicateKeyError
+
+from app.services.mongodb_service import MongoDBService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    try:
+        stats = service.normalize_legacy_food_logs(batch_size=args.batch_size)
+        print(
+            f"Scanned {stats['scanned']} food logs, rewrote {stats['rewritten']}, "
+            f"skipped {stats['failed']} that could not be normalized"
+        )
+        print(f"Merged {service.merge_duplicate_food_logs()} days logged more than once")
+        try:
+            service.ensure_food_log_index()
+        except DuplicateKeyError:
+            raise SystemExit("Some days still have several logs; fix the skipped ones and run again")
+        print("Created the unique (user_id, date) index")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Print an X-Profile-Token header value that profiles one request path.
+
+Usage:
+    python -m scripts.sign_profile_header /food/search [--ttl 300]
+"""
+import argparse
+
+from app.config import get_settings
+from app.middleware.profiler import sign_profile_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Request path to profile, e.g. /food/search")
+    parser.add_argument("--ttl", type=int, default=300, help="Seconds the token stays valid")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if not settings.profiler_secret:
+        raise SystemExit("PROFILER_SECRET is not configured")
+    print(f"X-Profile-Token: {sign_profile_request(settings.profiler_secret, args.path, args.ttl)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import inspect
+
+import mongomock
+import pytest
+from mongomock import collection as mongomock_collection
+
+
+def _accept_update_sort():
+    # pymongo 4.11+ passes a sort option with each bulk UpdateOne, which mongomock 4.3 predates
+    add_update = mongomock_collection.BulkOperationBuilder.add_update
+    if "sort" in inspect.signature(add_update).parameters:
+        return
+
+    def add_update_without_sort(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+
+    mongomock_collection.BulkOperationBuilder.add_update = add_update_without_sort
+
+
+_accept_update_sort()
+
+
+@pytest.fixture(scope="session")
+def firebase_app():
+    """Initialize Firebase for tests that call firebase_admin directly.
+
+    The app initializes Firebase lazily on first use, not at import time.
+    """
+    from app.services.firebase_service import get_firebase_app
+
+    return get_firebase_app()
+
+
+@pytest.fixture
+def mongo_service(monkeypatch, request):
+    """A MongoDBService on an in-memory mongomock server.
+
+    Parametrize indirectly with "embedded" or "collection" to pick FOOD_LOG_STORAGE.
+    """
+    from app.config import get_settings
+    from app.services import mongodb_service
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongodb_service, "MongoClient", lambda *args, **kwargs: client)
+    monkeypatch.setenv("MONGODB_URI", "mongodb://localhost:27017")
+    monkeypatch.setenv("FOOD_LOG_STORAGE", getattr(request, "param", "embedded"))
+    # mongomock has no capped collections
+    monkeypatch.setenv("CACHE_INVALIDATION_ENABLED", "false")
+    get_settings.cache_clear()
+    service = mongodb_service.MongoDBService()
+    yield service
+    service.close()
+    get_settings.cache_clear()
@@ -0,0 +1,64 @@
+import json
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware.access_log import AccessLogMiddleware, access_logger
+from app.services.timing import timed
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+def build_client(sample_rate=1.0):
+    app = FastAPI()
+
+    @timed("mongo.get_item")
+    async def get_item(item_id):
+        return {"item_id": item_id}
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return await get_item(item_id)
+
+    app.add_middleware(
+        AccessLogMiddleware,
+        sample_rate=sample_rate,
+        headers="user-agent,authorization",
+        redact_headers="authorization",
+    )
+    return TestClient(app)
+
+
+def capture():
+    handler = CaptureHandler()
+    access_logger.handlers = [handler]
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    return handler
+
+
+def test_access_log_line():
+    """One structured line per request with route template and redacted headers."""
+    handler = capture()
+    build_client().get("/items/42", headers={"Authorization": "Bearer secret-token"})
+
+    assert len(handler.lines) == 1
+    line = handler.lines[0]
+    assert line["route"] == "/items/{item_id}"
+    assert line["status"] == 200
+    assert "mongo.get_item" in line["upstream_ms"]
+    assert line["headers"]["authorization"] == "[REDACTED]"
+    assert "secret-token" not in json.dumps(line)
+
+
+def test_access_log_sampling():
+    """Requests outside the sample are not logged."""
+    handler = capture()
+    build_client(sample_rate=0.0).get("/items/42")
+    assert handler.lines == []
@@ -0,0 +1,60 @@
+import asyncio
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+from app.middleware.deadline import DeadlineMiddleware
+from app.services.deadline import remaining, timeout_for
+
+
+def build_client(cors=False):
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(5)
+        return {"done": True}
+
+    @app.get("/budget")
+    async def budget():
+        return {"remaining": remaining(), "timeout": timeout_for(10.0) if remaining() else None}
+
+    @app.get("/fails-late")
+    async def fails_late():
+        await asyncio.sleep(0.1)
+        raise HTTPException(status_code=500, detail="upstream timed out")
+
+    app.add_middleware(DeadlineMiddleware, default_timeout=2.0, max_timeout=3.0, routes="/slow=0.05")
+    if cors:
+        app.add_middleware(CORSMiddleware, allow_origins=["*"])
+    return TestClient(app)
+
+
+def test_handler_is_cancelled_when_the_budget_runs_out():
+    response = build_client().get("/slow")
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+
+
+def test_budget_from_header_is_capped():
+    client = build_client()
+    assert client.get("/budget").json()["timeout"] <= 2.0
+    assert 2.0 < client.get("/budget", headers={"X-Request-Timeout": "60"}).json()["remaining"] <= 3.0
+    assert client.get("/budget", headers={"X-Request-Timeout": "0.5"}).json()["timeout"] <= 0.5
+
+
+def test_server_error_after_the_deadline_is_a_timeout():
+    client = build_client()
+    assert client.get("/fails-late", headers={"X-Request-Timeout": "0.05"}).status_code == 504
+    assert client.get("/fails-late").status_code == 500
+
+
+def test_timeouts_carry_cors_headers():
+    from app.main import app
+
+    # user_middleware lists the outermost first
+    order = [middleware.cls for middleware in app.user_middleware]
+    assert order.index(CORSMiddleware) < order.index(DeadlineMiddleware)
+
+    response = build_client(cors=True).get("/slow", headers={"Origin": "https://mealmeter.app"})
+    assert response.status_code == 504
+    assert response.headers["access-control-allow-origin"] == "*"
@@ -0,0 +1,68 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.middleware.metrics import UNMATCHED_ROUTE, MetricsMiddleware
+
+REQUESTS = "mealmeter_http_request_duration_seconds_count"
+IN_FLIGHT = "mealmeter_http_requests_in_flight"
+
+
+def requests_for(route, status="200", method="GET"):
+    return REGISTRY.get_sample_value(REQUESTS, {"method": method, "route": route, "status": status}) or 0
+
+
+def build_client():
+    app = FastAPI()
+    in_flight = []
+
+    @app.get("/metrics-test/items/{item_id}")
+    async def read_item(item_id: int):
+        in_flight.append(REGISTRY.get_sample_value(IN_FLIGHT, {"method": "GET", "route": "/metrics-test/items/{item_id}"}))
+        return {"item_id": item_id}
+
+    @app.get("/metrics-test/hidden/{name}", include_in_schema=False)
+    async def hidden(name: str):
+        return {}
+
+    app.add_middleware(MetricsMiddleware, fastapi_app=app)
+    return TestClient(app), in_flight
+
+
+def test_requests_are_labelled_by_route_template():
+    client, in_flight = build_client()
+    before = requests_for("/metrics-test/items/{item_id}")
+
+    client.get("/metrics-test/items/1")
+    client.get("/metrics-test/items/2")
+
+    assert requests_for("/metrics-test/items/{item_id}") == before + 2
+    assert in_flight == [1, 1]
+    assert REGISTRY.get_sample_value(IN_FLIGHT, {"method": "GET", "route": "/metrics-test/items/{item_id}"}) == 0
+
+
+def test_routes_outside_the_schema_and_unknown_paths():
+    client, _ = build_client()
+    hidden = requests_for("/metrics-test/hidden/{name}")
+    wrong_method = requests_for("/metrics-test/items/{item_id}", status="405", method="POST")
+    unmatched = requests_for(UNMATCHED_ROUTE, status="404")
+
+    client.get("/metrics-test/hidden/a")
+    client.post("/metrics-test/items/1")
+    client.get("/metrics-test/nowhere")
+
+    assert requests_for("/metrics-test/hidden/{name}") == hidden + 1
+    assert requests_for("/metrics-test/items/{item_id}", status="405", method="POST") == wrong_method + 1
+    assert requests_for(UNMATCHED_ROUTE, status="404") == unmatched + 1
+
+
+def test_metrics_endpoint_is_scraped_under_its_own_route():
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/metrics")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/metrics"' in response.text
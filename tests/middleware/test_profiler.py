@@ -0,0 +1,80 @@
+import json
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.profiler import ProfilerMiddleware, sign_profile_request
+
+SECRET = "profile-secret"
+
+
+def build_client(output_dir, **options):
+    app = FastAPI()
+
+    @app.get("/work/{item_id}")
+    async def work(item_id: int):
+        return {"total": sum(range(10000))}
+
+    @app.get("/other")
+    async def other():
+        return {}
+
+    app.add_middleware(ProfilerMiddleware, output_dir=str(output_dir), **options)
+    return TestClient(app)
+
+
+def profiles(output_dir):
+    return sorted(os.listdir(output_dir)) if os.path.isdir(output_dir) else []
+
+
+def test_requests_without_a_valid_token_are_not_profiled(tmp_path):
+    client = build_client(tmp_path, secret=SECRET)
+
+    client.get("/work/1")
+    client.get("/work/1", headers={"X-Profile-Token": "garbage"})
+    client.get("/work/1", headers={"X-Profile-Token": sign_profile_request("other-secret", "/work/1")})
+    # Signed for another path, or expired
+    client.get("/work/1", headers={"X-Profile-Token": sign_profile_request(SECRET, "/other")})
+    client.get("/work/1", headers={"X-Profile-Token": sign_profile_request(SECRET, "/work/1", ttl_seconds=-1)})
+
+    assert profiles(tmp_path) == []
+
+
+def test_signed_request_is_profiled(tmp_path):
+    client = build_client(tmp_path, secret=SECRET)
+
+    response = client.get("/work/1", headers={"X-Profile-Token": sign_profile_request(SECRET, "/work/1")})
+
+    assert response.status_code == 200
+    profile, = profiles(tmp_path)
+    assert profile.endswith("-GET-work_item_id.speedscope.json")
+
+
+def test_sampled_request_writes_a_speedscope_profile(tmp_path):
+    client = build_client(tmp_path, enabled=True, sample_rate=1.0, routes="/work")
+
+    client.get("/other")
+    client.get("/work/1")
+
+    profile, = profiles(tmp_path)
+    with open(tmp_path / profile) as output:
+        assert "speedscope" in json.load(output)["$schema"]
+
+
+def test_old_profiles_are_pruned(tmp_path):
+    client = build_client(tmp_path, enabled=True, sample_rate=1.0, max_files=2)
+    now = time.time()
+    for age, name in enumerate(["newer", "older", "oldest"], start=1):
+        path = tmp_path / f"{name}.speedscope.json"
+        path.write_text("{}")
+        os.utime(path, (now - age * 60, now - age * 60))
+    (tmp_path / "notes.txt").write_text("not a profile")
+
+    client.get("/work/1")
+
+    remaining = profiles(tmp_path)
+    assert len(remaining) == 3
+    assert "newer.speedscope.json" in remaining and "notes.txt" in remaining
+    assert any(name.endswith("-GET-work_item_id.speedscope.json") for name in remaining)
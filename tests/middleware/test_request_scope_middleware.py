@@ -0,0 +1,60 @@
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.access_log import AccessLogMiddleware, access_logger
+from app.middleware.request_scope import RequestScopeMiddleware
+from app.services.request_scope import current_request_scope
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+def build_app():
+    app = FastAPI()
+    scopes = []
+
+    @app.get("/round-trips/{count}")
+    async def round_trips(count: int):
+        scope = current_request_scope()
+        scopes.append(scope)
+        if scope is not None:
+            scope.mongo_round_trips += count
+        return {}
+
+    return app, scopes
+
+
+def test_each_request_gets_its_own_scope_without_the_access_log():
+    app, scopes = build_app()
+    app.add_middleware(RequestScopeMiddleware)
+    client = TestClient(app)
+
+    client.get("/round-trips/1")
+    client.get("/round-trips/1")
+
+    first, second = scopes
+    assert first is not None and second is not None and first is not second
+    assert current_request_scope() is None
+
+
+def test_access_log_reports_the_round_trips_of_the_scope():
+    handler = CaptureHandler()
+    access_logger.handlers = [handler]
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    app, _ = build_app()
+    app.add_middleware(AccessLogMiddleware)
+    app.add_middleware(RequestScopeMiddleware)
+
+    TestClient(app).get("/round-trips/3")
+
+    assert handler.lines[0]["mongo_round_trips"] == 3
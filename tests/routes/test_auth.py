@@ -11,7 +11,7 @@ TEST_PASSWORD = "securepassword123"
 
 
 @pytest.fixture(scope="function", autouse=True)
-def cleanup_user():
+def cleanup_user(firebase_app):
     """Clean up the test user from Firebase after each test."""
     yield
     try:
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import food_logging
+from app.services.memory_storage import InMemoryStorage
+from app.services.storage import get_storage
+
+AUTH = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(food_logging, "verify_token", lambda token: {"uid": "u1"})
+    storage = InMemoryStorage()
+    app.dependency_overrides[get_storage] = lambda: storage
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_storage)
+
+
+def test_null_calories_are_a_bad_request(client):
+    entry = {"food_name": "Pasta", "meal_type": "lunch", "calories": 500, "date": "2024-01-25"}
+    entry_id = client.post("/food-log/entry", json=entry, headers=AUTH).json()["entry_id"]
+
+    response = client.put(
+        f"/food-log/entry/{entry_id}",
+        params={"date": "2024-01-25", "meal_type": "lunch"},
+        json={"calories": None},
+        headers=AUTH,
+    )
+
+    assert response.status_code == 400
+    log = client.get("/food-log/daily/2024-01-25", headers=AUTH).json()
+    assert log["total_calories"] == 500
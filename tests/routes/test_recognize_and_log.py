@@ -0,0 +1,72 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import food_recognition
+from app.services.memory_storage import InMemoryStorage
+from app.services.storage import get_storage
+
+IMAGE = ("meal.jpg", b"\xff\xd8\xff\xe0 not really a jpeg", "image/jpeg")
+
+RECOGNIZED = {
+    "food_items": [
+        {"name": "Grilled chicken", "serving": "150 g", "calories": 280.0},
+        {"name": "Rice", "serving": "1 cup", "calories": 205.0},
+    ],
+    "total": 485.0,
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    def recognize(image_path, content_type="image/jpeg"):
+        calls.append(image_path)
+        return RECOGNIZED
+
+    monkeypatch.setattr(food_recognition, "recognize_food_from_image", recognize)
+    monkeypatch.setattr(food_recognition, "verify_token", lambda token: {"uid": "u1"})
+    storage = InMemoryStorage()
+    app.dependency_overrides[get_storage] = lambda: storage
+    yield TestClient(app), storage, calls
+    app.dependency_overrides.pop(get_storage)
+
+
+def test_recognize_only(client):
+    test_client, storage, _ = client
+
+    response = test_client.post("/food-recognition", files={"image": IMAGE})
+
+    assert response.status_code == 200
+    assert response.json()["calories"]["total"] == 485.0
+    assert "daily_log" not in response.json()
+
+
+def test_recognize_and_log(client):
+    test_client, storage, _ = client
+
+    response = test_client.post(
+        "/food-recognition",
+        params={"date": "2024-01-25", "meal_type": "lunch"},
+        files={"image": IMAGE},
+        headers={"Authorization": "Bearer token"},
+    )
+
+    assert response.status_code == 200
+    daily_log = response.json()["daily_log"]
+    assert daily_log["date"] == "2024-01-25"
+    assert daily_log["total_calories"] == 485.0
+    assert [entry["food_name"] for entry in daily_log["meals"]["lunch"]] == ["Grilled chicken", "Rice"]
+    assert all(entry["entry_id"] for entry in daily_log["meals"]["lunch"])
+
+
+def test_logging_needs_a_token_before_recognition(client):
+    test_client, _, calls = client
+
+    response = test_client.post(
+        "/food-recognition", params={"date": "2024-01-25", "meal_type": "lunch"}, files={"image": IMAGE}
+    )
+
+    assert response.status_code == 401
+    assert calls == []
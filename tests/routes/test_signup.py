@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from firebase_admin import auth
+
+from app.main import app
+from app.routers import auth as auth_router
+from app.services import firebase_service
+from app.services.memory_storage import InMemoryStorage
+from app.services.storage import get_storage
+
+TEST_EMAIL = "mealmeter.tester@gmail.com"
+
+
+def on_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+@pytest.fixture
+def admin_calls(monkeypatch):
+    """Stand in for the Admin SDK, recording each call and whether it ran on the event loop."""
+    calls = []
+    users = set()
+
+    def create_user(email=None, password=None, **kwargs):
+        calls.append(("create_user", on_event_loop()))
+        if email in users:
+            raise auth.EmailAlreadyExistsError("already exists", None, None)
+        users.add(email)
+        return SimpleNamespace(uid=f"uid-{email}", email=email)
+
+    def generate_link(email, **kwargs):
+        calls.append(("generate_link", on_event_loop()))
+        return f"http://localhost/verify?email={email}"
+
+    async def send_email(email, link):
+        pass
+
+    fake_app = SimpleNamespace(name="test")
+    monkeypatch.setattr(firebase_service, "get_firebase_app", lambda: fake_app)
+    monkeypatch.setattr(auth_router, "get_firebase_app", lambda: fake_app)
+    monkeypatch.setattr(auth, "create_user", create_user)
+    monkeypatch.setattr(auth, "generate_email_verification_link", generate_link)
+    monkeypatch.setattr(auth, "generate_password_reset_link", generate_link)
+    monkeypatch.setattr(auth_router, "send_verification_email", send_email)
+    monkeypatch.setattr(auth_router, "send_password_reset_email", send_email)
+    return calls
+
+
+@pytest.fixture
+def client():
+    storage = InMemoryStorage()
+    app.dependency_overrides[get_storage] = lambda: storage
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_storage)
+
+
+def test_signup_calls_firebase_off_the_event_loop(client, admin_calls):
+    response = client.post("/auth/signup", json={"email": TEST_EMAIL, "password": "secret123"})
+
+    assert response.status_code == 200
+    assert response.json()["uid"] == f"uid-{TEST_EMAIL}"
+    # One call to create the user, with no lookup first, and none of them blocking the loop
+    assert admin_calls == [("create_user", False), ("generate_link", False)]
+
+
+def test_signup_with_a_taken_email_is_a_bad_request(client, admin_calls):
+    client.post("/auth/signup", json={"email": TEST_EMAIL, "password": "secret123"})
+    admin_calls.clear()
+
+    response = client.post("/auth/signup", json={"email": TEST_EMAIL, "password": "secret123"})
+
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+    assert admin_calls == [("create_user", False)]
+
+
+def test_reset_password_calls_firebase_off_the_event_loop(client, admin_calls):
+    response = client.post("/auth/reset-password", json={"email": TEST_EMAIL})
+
+    assert response.status_code == 200
+    assert admin_calls == [("generate_link", False)]
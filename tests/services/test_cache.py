@@ -0,0 +1,23 @@
+import time
+
+from app.services.cache import TTLCache
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire():
+    cache = TTLCache("test", maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    # Kept until evicted, for when the value cannot be refreshed
+    assert cache.get_stale("a") == 1
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.config import get_settings
+from app.services import chat_history
+from app.services.chat_history import MAX_UNSUMMARIZED_TURNS, build_prompt, estimate_tokens, summarize_chat
+from app.services.memory_storage import InMemoryStorage
+
+TTL = 3600
+
+
+def stub_summaries(monkeypatch):
+    calls = []
+
+    def create_chat_completion(**request):
+        calls.append(request)
+        message = SimpleNamespace(content=f"summary {len(calls)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(chat_history, "create_chat_completion", create_chat_completion)
+    return calls
+
+
+def test_prompt_size_stays_flat(monkeypatch):
+    calls = stub_summaries(monkeypatch)
+    settings = get_settings()
+    storage = InMemoryStorage()
+    prompt_sizes = []
+
+    async def converse():
+        for number in range(60):
+            history = await storage.get_chat_history("u1", MAX_UNSUMMARIZED_TURNS)
+            message = f"Question {number} about my protein intake " * 5
+            prompt = build_prompt("system", history, message, settings.chat_history_turns)
+            prompt_sizes.append(sum(estimate_tokens(part["content"]) for part in prompt))
+            reply = f"Answer {number} " * 40
+            tokens = estimate_tokens(message) + estimate_tokens(reply)
+            await storage.add_chat_turn("u1", message, reply, tokens, TTL)
+            if sum(turn["tokens"] for turn in history["turns"]) + tokens > settings.chat_history_token_budget:
+                await summarize_chat(storage, "u1")
+
+    asyncio.run(converse())
+
+    assert calls, "the history was never summarized"
+    assert max(prompt_sizes[20:]) <= max(prompt_sizes[:20])
+    history = asyncio.run(storage.get_chat_history("u1", MAX_UNSUMMARIZED_TURNS))
+    assert history["summary"] == f"summary {len(calls)}"
+    assert len(history["turns"]) < 20
+    # Each summary builds on the one before
+    assert calls[-1]["messages"][1]["content"].startswith(f"Earlier summary: summary {len(calls) - 1}")
+
+
+def test_prompt_has_summary_and_last_turns():
+    turns = [{"message": f"q{number}", "reply": f"a{number}", "tokens": 2} for number in range(10)]
+
+    prompt = build_prompt("system", {"summary": "likes fish", "turns": turns}, "next", 2)
+
+    assert [part["content"] for part in prompt] == [
+        "system", "Summary of the conversation so far: likes fish", "q8", "a8", "q9", "a9", "next",
+    ]
+
+
+def test_older_summaries_do_not_replace_newer_ones():
+    storage = InMemoryStorage()
+    now = datetime.utcnow()
+
+    assert asyncio.run(storage.save_chat_summary("u1", "newer", now, TTL))
+    assert not asyncio.run(storage.save_chat_summary("u1", "older", now - timedelta(seconds=1), TTL))
+
+    assert asyncio.run(storage.get_chat_history("u1", 10))["summary"] == "newer"
+
+
+def summarize_during_delete(storage):
+    pile_up_turns(storage, 3)
+    covered = asyncio.run(storage.get_chat_history("u1", 10))["turns"][-1]["created_at"]
+
+    asyncio.run(storage.delete_chat_history("u1", TTL))
+    # A summary of the deleted turns, finished after the delete
+    saved = asyncio.run(storage.save_chat_summary("u1", "deleted turns", covered, TTL))
+
+    time.sleep(0.01)
+    asyncio.run(storage.add_chat_turn("u1", "after", "reply", 2, TTL))
+    return saved, asyncio.run(storage.get_chat_history("u1", 10))
+
+
+def test_deleted_history_is_not_summarized_again():
+    saved, history = summarize_during_delete(InMemoryStorage())
+
+    assert not saved
+    assert history["summary"] is None
+    assert [turn["message"] for turn in history["turns"]] == ["after"]
+
+
+def test_expired_turns_are_dropped():
+    storage = InMemoryStorage()
+    asyncio.run(storage.add_chat_turn("u1", "old", "reply", 2, ttl=-1))
+    asyncio.run(storage.add_chat_turn("u1", "new", "reply", 2, ttl=TTL))
+
+    turns = asyncio.run(storage.get_chat_history("u1", 10))["turns"]
+
+    assert [turn["message"] for turn in turns] == ["new"]
+
+
+def pile_up_turns(storage, count):
+    for number in range(count):
+        asyncio.run(storage.add_chat_turn("u1", f"q{number}", f"a{number}", 2, TTL))
+
+
+def test_piled_up_turns_are_all_summarized(monkeypatch):
+    calls = stub_summaries(monkeypatch)
+    keep = get_settings().chat_history_turns
+    storage = InMemoryStorage()
+    pile_up_turns(storage, 2 * MAX_UNSUMMARIZED_TURNS + 30)
+    # Distinct times, as turns are at least a reply apart
+    start = datetime.utcnow() - timedelta(hours=1)
+    for number, turn in enumerate(storage._chat_turns["u1"]):
+        turn["created_at"] = start + timedelta(seconds=number)
+
+    asyncio.run(summarize_chat(storage, "u1"))
+
+    assert len(calls) == 3
+    transcripts = "\n".join(call["messages"][1]["content"] for call in calls)
+    for number in range(2 * MAX_UNSUMMARIZED_TURNS + 30 - keep):
+        assert f"User: q{number}\n" in transcripts
+    history = asyncio.run(storage.get_chat_history("u1", MAX_UNSUMMARIZED_TURNS))
+    assert history["summary"] == "summary 3"
+    assert [turn["message"] for turn in history["turns"]] == [
+        f"q{number}" for number in range(2 * MAX_UNSUMMARIZED_TURNS + 30 - keep, 2 * MAX_UNSUMMARIZED_TURNS + 30)
+    ]
+
+
+def spread_turns(mongo_service):
+    # Inserted faster than Mongo's millisecond dates tell apart
+    start = datetime.utcnow() - timedelta(hours=1)
+    for number, turn in enumerate(mongo_service.chat_turns.find({"user_id": "u1"}).sort("_id", 1)):
+        mongo_service.chat_turns.update_one({"_id": turn["_id"]}, {"$set": {"created_at": start + timedelta(seconds=number)}})
+
+
+def test_mongo_chat_history(mongo_service):
+    pile_up_turns(mongo_service, 5)
+    spread_turns(mongo_service)
+
+    history = asyncio.run(mongo_service.get_chat_history("u1", 2))
+    assert history["summary"] is None
+    assert [turn["message"] for turn in history["turns"]] == ["q3", "q4"]
+    oldest = asyncio.run(mongo_service.get_chat_history("u1", 2, oldest_first=True))["turns"]
+    assert [turn["message"] for turn in oldest] == ["q0", "q1"]
+    assert set(oldest[0]) == {"message", "reply", "tokens", "created_at"}
+
+    assert asyncio.run(mongo_service.save_chat_summary("u1", "first two", oldest[1]["created_at"], TTL))
+    history = asyncio.run(mongo_service.get_chat_history("u1", 10))
+    assert history["summary"] == "first two"
+    assert [turn["message"] for turn in history["turns"]] == ["q2", "q3", "q4"]
+
+
+def test_mongo_keeps_the_later_summary(mongo_service):
+    now = datetime.utcnow().replace(microsecond=0)
+
+    assert asyncio.run(mongo_service.save_chat_summary("u1", "newer", now, TTL))
+    # The filtered upsert finds no older summary and its insert hits the stored one
+    assert not asyncio.run(mongo_service.save_chat_summary("u1", "older", now - timedelta(seconds=1), TTL))
+    assert asyncio.run(mongo_service.save_chat_summary("u1", "latest", now + timedelta(seconds=1), TTL))
+
+    assert asyncio.run(mongo_service.get_chat_history("u1", 10))["summary"] == "latest"
+
+
+def test_mongo_piled_up_turns_are_all_summarized(mongo_service, monkeypatch):
+    calls = stub_summaries(monkeypatch)
+    keep = get_settings().chat_history_turns
+    pile_up_turns(mongo_service, MAX_UNSUMMARIZED_TURNS + keep + 10)
+    spread_turns(mongo_service)
+
+    asyncio.run(summarize_chat(mongo_service, "u1"))
+
+    assert len(calls) == 2
+    turns = asyncio.run(mongo_service.get_chat_history("u1", MAX_UNSUMMARIZED_TURNS))["turns"]
+    assert len(turns) == keep
+
+
+def test_mongo_deleted_history_is_not_summarized_again(mongo_service):
+    saved, history = summarize_during_delete(mongo_service)
+
+    assert not saved
+    assert history["summary"] is None
+    assert [turn["message"] for turn in history["turns"]] == ["after"]
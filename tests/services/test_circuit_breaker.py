@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, UpstreamUnavailable
+
+
+class Outage(Exception):
+    pass
+
+
+def failing():
+    raise Outage("down")
+
+
+def breaker(**kwargs):
+    return CircuitBreaker("test", lambda error: isinstance(error, Outage), **kwargs)
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    circuit = breaker(failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(UpstreamUnavailable):
+            circuit.call(failing)
+    assert circuit.state == OPEN
+
+    calls = []
+    with pytest.raises(UpstreamUnavailable) as error:
+        circuit.call(calls.append, 1)
+    assert calls == []
+    assert 0 < error.value.retry_after <= 60
+
+
+def test_other_errors_are_answers():
+    circuit = breaker(failure_threshold=1)
+    with pytest.raises(ValueError):
+        circuit.call(int, "not a number")
+    assert circuit.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    circuit = breaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(UpstreamUnavailable):
+        circuit.call(failing)
+    with pytest.raises(UpstreamUnavailable):
+        circuit.call(failing)  # The probe fails
+    assert circuit.state == OPEN
+
+    async def recovered():
+        return "ok"
+
+    assert asyncio.run(circuit.call_async(recovered)) == "ok"
+    assert circuit.state == CLOSED
+
+
+def test_only_one_probe_at_a_time():
+    circuit = breaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(UpstreamUnavailable):
+        circuit.call(failing)
+
+    def probe():
+        assert circuit.state == HALF_OPEN
+        with pytest.raises(UpstreamUnavailable):
+            circuit.call(lambda: None)
+        return "probed"
+
+    assert circuit.call(probe) == "probed"
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    circuit = breaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(UpstreamUnavailable):
+        circuit.call(failing)
+
+    async def cancel_probe():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.ensure_future(circuit.call_async(hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+
+    assert circuit.call(lambda: "ok") == "ok"
+    assert circuit.state == CLOSED
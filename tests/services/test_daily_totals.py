@@ -0,0 +1,90 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.mongodb_service import MEAL_TYPES, MongoDBService
+
+TODAY = date.today()
+BOTH_STORAGES = pytest.mark.parametrize("mongo_service", ["embedded", "collection"], indirect=True)
+
+
+def log_entry(service, calories, day=TODAY, user_id="u1"):
+    entry = {"food_name": "Pasta", "meal_type": "lunch", "calories": calories, "date": day.isoformat()}
+    return asyncio.run(service.add_food_entry(user_id, entry))
+
+
+def daily_log(service, day=TODAY):
+    return asyncio.run(service.get_daily_food_log("u1", day))
+
+
+@BOTH_STORAGES
+def test_first_entry_creates_the_day_and_later_ones_add_to_it(mongo_service):
+    asyncio.run(mongo_service.update_user_insights("u1", {"tdee": 2400, "protein_grams": 150}))
+
+    log_entry(mongo_service, 500)
+    log_entry(mongo_service, 300)
+
+    assert mongo_service.food_logs.count_documents({"user_id": "u1"}) == 1
+    log = daily_log(mongo_service)
+    assert log["target_calories"] == 2400
+    assert log["total_calories"] == 800
+    assert log["remaining_calories"] == 1600
+    assert log["macro_targets"]["protein_grams"] == 150
+
+
+@pytest.mark.parametrize("unique_index", [True, False])
+def test_days_logged_before_macros_are_upgraded(mongo_service, unique_index):
+    # A day written before macros were tracked: its totals are started at 0 and
+    # the $inc is tried again, also in a database not yet migrated to the index
+    if not unique_index:
+        mongo_service.food_logs.drop_indexes()
+    mongo_service.food_logs.insert_one({
+        "user_id": "u1",
+        "date": TODAY.isoformat(),
+        "total_calories": 200.0,
+        "target_calories": 2000,
+        "remaining_calories": 1800.0,
+        "meals": {meal: [] for meal in MEAL_TYPES},
+    })
+
+    log_entry(mongo_service, 300)
+
+    assert mongo_service.food_logs.count_documents({"user_id": "u1"}) == 1
+    log = daily_log(mongo_service)
+    assert log["total_calories"] == 500
+    assert log["remaining_calories"] == 1500
+    assert log["macro_totals"] == {"protein_grams": 0.0, "carbs_grams": 0.0, "fats_grams": 0.0}
+    assert len(log["meals"]["lunch"]) == 1
+
+
+def test_new_targets_apply_from_today_on(mongo_service):
+    yesterday, tomorrow = TODAY - timedelta(days=1), TODAY + timedelta(days=1)
+    for day in (yesterday, TODAY, tomorrow):
+        log_entry(mongo_service, 500, day)
+
+    asyncio.run(mongo_service.update_user_insights("u1", {"tdee": 2500, "protein_grams": 160}))
+
+    assert daily_log(mongo_service, yesterday)["target_calories"] == 2000
+    for day in (TODAY, tomorrow):
+        log = daily_log(mongo_service, day)
+        assert log["target_calories"] == 2500
+        assert log["remaining_calories"] == 2000
+        assert log["total_calories"] == 500
+        assert log["macro_remaining"]["protein_grams"] == 160
+
+
+def test_targets_refresh_does_not_trust_this_workers_cache(mongo_service):
+    # Both services share the same mongomock server, like two workers
+    other_worker = MongoDBService()
+    log_entry(mongo_service, 500)
+
+    asyncio.run(mongo_service.update_user_insights("u1", {"tdee": 2500}))
+    asyncio.run(other_worker.update_user_insights("u1", {"tdee": 1800}))
+    # This worker still caches 2500, but the stored log has 1800
+    asyncio.run(mongo_service.update_user_insights("u1", {"tdee": 2500}))
+
+    log = daily_log(mongo_service)
+    assert log["target_calories"] == 2500
+    assert log["remaining_calories"] == 2000
+    other_worker.close()
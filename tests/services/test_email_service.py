@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import Settings
+from app.services import email_service
+from app.services.email_service import EmailSender
+
+
+class FakeOutbox:
+    def __init__(self, emails):
+        self.emails = emails
+        self.sent = []
+        self.rescheduled = []
+
+    async def claim_outbox_emails(self, limit, lease_seconds):
+        claimed, self.emails = self.emails[:limit], self.emails[limit:]
+        return claimed
+
+    async def mark_emails_sent(self, email_ids, ttl):
+        self.sent.extend(email_ids)
+
+    async def reschedule_email(self, email_id, error, retry_in):
+        self.rescheduled.append((email_id, retry_in))
+
+
+def test_retry_delay_backs_off_then_gives_up():
+    sender = EmailSender(FakeOutbox([]), max_attempts=4, backoff_base=10, backoff_max=30)
+    assert [sender.retry_delay(n) for n in (1, 2, 3, 4)] == [10, 20, 30, None]
+
+
+async def test_send_batch_marks_sent_and_reschedules_failures():
+    outbox = FakeOutbox([
+        {"_id": 1, "recipient": "ok@example.com", "attempts": 0},
+        {"_id": 2, "recipient": "bad@example.com", "attempts": 0},
+        {"_id": 3, "recipient": "bad@example.com", "attempts": 4},
+    ])
+    sender = EmailSender(outbox, batch_size=10, max_attempts=5, backoff_base=10)
+
+    async def send(email):
+        if email["recipient"].startswith("bad"):
+            raise OSError("connection refused")
+
+    sender._send = send
+
+    assert await sender.send_batch() == 3
+    assert outbox.sent == [1]
+    assert outbox.rescheduled == [(2, 10), (3, None)]
+
+
+class FakeSMTP:
+    is_connected = True
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, message):
+        self.messages.append(message)
+
+
+@pytest.mark.parametrize("name, sender", [("MealMeter", "MealMeter <team@example.com>"), (None, "team@example.com")])
+async def test_from_header_has_the_name_only_when_set(monkeypatch, name, sender):
+    settings = Settings(_env_file=None, mail_from="team@example.com", mail_from_name=name)
+    monkeypatch.setattr(email_service, "get_settings", lambda: settings)
+    smtp = FakeSMTP()
+    email_sender = EmailSender(FakeOutbox([]))
+    email_sender._smtp = smtp
+
+    await email_sender._send({"recipient": "user@example.com", "subject": "Hi", "body": "<p>Hi</p>"})
+
+    assert smtp.messages[0]["From"] == sender
+
+
+def test_sent_emails_expire_from_the_mongo_outbox(mongo_service):
+    email_id = asyncio.run(mongo_service.enqueue_email("user@example.com", "Hi", "<p>Hi</p>"))
+    claimed, = asyncio.run(mongo_service.claim_outbox_emails(10, lease_seconds=60))
+
+    asyncio.run(mongo_service.mark_emails_sent([claimed["_id"]], ttl=3600))
+
+    email = mongo_service.email_outbox.find_one({"_id": claimed["_id"]})
+    assert str(email["_id"]) == email_id and email["status"] == "sent"
+    assert email["expires_at"] - email["sent_at"] == timedelta(hours=1)
+    assert email["expires_at"] > datetime.utcnow()
+    ttl_index, = [index for index in mongo_service.email_outbox.list_indexes() if "expireAfterSeconds" in index]
+    assert dict(ttl_index["key"]) == {"expires_at": 1}
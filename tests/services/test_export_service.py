@@ -0,0 +1,30 @@
+import csv
+import gzip
+import io
+import json
+
+from app.services import export_service
+from app.services.export_service import encode_export
+
+ROWS = [
+    {"date": "2024-01-25", "meal_type": "lunch", "entry_id": str(index), "food_name": "Pasta", "calories": 750.0}
+    for index in range(7)
+]
+
+
+def test_csv_export_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(export_service, "ROWS_PER_CHUNK", 3)
+    chunks = list(encode_export(iter(ROWS), "csv"))
+    assert len(chunks) == 3
+
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert [row["entry_id"] for row in rows] == [str(index) for index in range(7)]
+    assert rows[0]["protein_grams"] == ""
+
+
+def test_gzipped_ndjson_export():
+    data = gzip.decompress(b"".join(encode_export(iter(ROWS), "ndjson", gzip=True)))
+    lines = [json.loads(line) for line in data.decode().splitlines()]
+    assert len(lines) == 7
+    assert lines[0]["food_name"] == "Pasta"
+    assert lines[0]["serving_size"] is None
@@ -0,0 +1,144 @@
+import pytest
+
+from app.services import circuit_breaker, fatsecret_service
+from app.services.circuit_breaker import UpstreamUnavailable
+from app.services.fatsecret_service import (
+    FatSecretError,
+    FatSecretService,
+    normalize_gtin,
+    parse_food,
+    parse_food_description,
+    parse_food_details,
+)
+
+
+def test_parse_food_description():
+    parsed = parse_food_description("Per 100g - Calories: 89kcal | Fat: 0.33g | Carbs: 22.84g | Protein: 1.09g")
+    assert parsed == {
+        "serving_size": "100g",
+        "calories": 89.0,
+        "fats_grams": 0.33,
+        "carbs_grams": 22.84,
+        "protein_grams": 1.09,
+    }
+
+
+def test_parse_food_keeps_unreadable_descriptions():
+    result = parse_food({"food_id": "1", "food_name": "Mystery", "food_description": "Per serving - n/a"})
+    assert result["food_name"] == "Mystery"
+    assert result["food_description"] == "Per serving - n/a"
+    assert result["serving_size"] == "serving"
+    assert result["calories"] is None
+
+
+def test_normalize_gtin():
+    assert normalize_gtin("012345678905") == "0012345678905"
+    assert normalize_gtin("00012345678905") == "0012345678905"
+    with pytest.raises(ValueError):
+        normalize_gtin("12345")
+
+
+def test_parse_food_details_uses_default_serving():
+    result = parse_food_details({
+        "food_id": "1",
+        "food_name": "Cereal Bar",
+        "servings": {"serving": [
+            {"serving_description": "100 g", "calories": "400"},
+            {"is_default": "1", "serving_description": "1 bar", "calories": "190", "protein": "3", "fat": "7"},
+        ]},
+    })
+    assert result["serving_size"] == "1 bar"
+    assert result["calories"] == 190.0
+    assert result["protein_grams"] == 3.0
+    assert result["carbs_grams"] is None
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.text = str(payload)
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            raise fatsecret_service.requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        if isinstance(self.payload, Exception):
+            raise self.payload
+        return self.payload
+
+
+@pytest.fixture
+def fatsecret(monkeypatch):
+    """Answer FatSecret calls from ``responses``, keyed by API method, and record the token requests."""
+    responses = {}
+    token_requests = []
+
+    def post(url, data=None, **kwargs):
+        token_requests.append(data)
+        return FakeResponse({"access_token": "token", "expires_in": 86400})
+
+    def get(url, params=None, **kwargs):
+        return responses[params["method"]]
+
+    monkeypatch.setattr(fatsecret_service.requests, "post", post)
+    monkeypatch.setattr(fatsecret_service.requests, "get", get)
+    monkeypatch.setattr(FatSecretService, "_cached_token", None)
+    monkeypatch.setattr(FatSecretService, "_search_cache", None)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    return responses, token_requests
+
+
+def test_token_has_the_barcode_scope(fatsecret):
+    responses, token_requests = fatsecret
+    responses["food.find_id_for_barcode"] = FakeResponse({"food_id": {"value": "0"}})
+
+    assert FatSecretService().lookup_barcode("0012345678905") is None
+    assert token_requests[0]["scope"].split() == ["basic", "barcode"]
+
+
+def test_barcode_lookup_errors_are_not_unknown_codes(fatsecret):
+    responses, _ = fatsecret
+    responses["food.find_id_for_barcode"] = FakeResponse({"error": {"code": 14, "message": "Missing scope"}})
+
+    with pytest.raises(UpstreamUnavailable):
+        FatSecretService().lookup_barcode("0012345678905")
+
+    responses["food.find_id_for_barcode"] = FakeResponse({})
+    with pytest.raises(FatSecretError):
+        FatSecretService().lookup_barcode("0012345678905")
+
+
+def test_barcode_lookup_returns_the_food(fatsecret):
+    responses, _ = fatsecret
+    responses["food.find_id_for_barcode"] = FakeResponse({"food_id": {"value": "42"}})
+    responses["food.get.v2"] = FakeResponse({"food": {
+        "food_id": "42", "food_name": "Cereal Bar",
+        "servings": {"serving": {"serving_description": "1 bar", "calories": "190"}},
+    }})
+
+    food = FatSecretService().lookup_barcode("0012345678905")
+
+    assert food["food_name"] == "Cereal Bar"
+    assert food["calories"] == 190.0
+
+
+@pytest.mark.parametrize("failure", [
+    FakeResponse({"error": {"code": 12, "message": "Too many requests"}}),
+    FakeResponse(ValueError("Expecting value")),
+    FakeResponse({}, status_code=502),
+])
+def test_failed_searches_fall_back_to_stale_results_and_are_not_cached(fatsecret, failure):
+    responses, _ = fatsecret
+    responses["foods.search"] = FakeResponse({"foods": {"food": {"food_id": "1", "food_name": "Banana"}}})
+    service = FatSecretService()
+    # Results expire at once, but stay around as stale
+    FatSecretService.search_cache().ttl = -1
+    service.search_foods("banana")
+
+    responses["foods.search"] = failure
+    assert [food["food_name"] for food in service.search_foods("banana")] == ["Banana"]
+    with pytest.raises(UpstreamUnavailable):
+        service.search_foods("apple")
+    assert FatSecretService.search_cache().get_stale("apple") is None
@@ -12,7 +12,7 @@ TEST_PASSWORD = "securepassword123"
 
 
 @pytest.fixture(scope="function", autouse=True)
-def cleanup_user():
+def cleanup_user(firebase_app):
     """Clean up the test user from Firebase after each test."""
     yield
     try:
@@ -29,7 +29,7 @@ def test_create_user():
     assert user.uid is not None
 
 
-def test_login_user():
+async def test_login_user():
     """Test user login."""
     create_user(TEST_EMAIL, TEST_PASSWORD)
 
@@ -37,7 +37,7 @@ def test_login_user():
     user = auth.get_user_by_email(TEST_EMAIL)
     auth.update_user(user.uid, email_verified=True)
 
-    login_data = login_user(TEST_EMAIL, TEST_PASSWORD)
+    login_data = await login_user(TEST_EMAIL, TEST_PASSWORD)
     assert login_data["email"] == TEST_EMAIL
     assert "id_token" in login_data
     assert "refresh_token" in login_data
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.services.mongodb_service import MongoDBService, normalize_entry_changes
+
+DAY = date(2024, 1, 25)
+BOTH_STORAGES = pytest.mark.parametrize("mongo_service", ["embedded", "collection"], indirect=True)
+
+
+def log_entry(service, calories, protein=None, meal_type="lunch"):
+    entry = {"food_name": "Pasta", "meal_type": meal_type, "calories": calories, "date": DAY.isoformat()}
+    if protein is not None:
+        entry["protein_grams"] = protein
+    return asyncio.run(service.add_food_entry("u1", entry))
+
+
+def daily_log(service):
+    return asyncio.run(service.get_daily_food_log("u1", DAY))
+
+
+@BOTH_STORAGES
+def test_update_moves_the_totals(mongo_service):
+    first = log_entry(mongo_service, 500, protein=20)
+    log_entry(mongo_service, 300)
+
+    changes = {"calories": 450, "protein_grams": 30, "food_name": "Penne"}
+    assert asyncio.run(mongo_service.update_food_entry("u1", DAY.isoformat(), "lunch", first, changes))
+
+    log = daily_log(mongo_service)
+    updated = next(entry for entry in log["meals"]["lunch"] if entry["entry_id"] == first)
+    assert updated["food_name"] == "Penne"
+    assert updated["calories"] == 450
+    assert log["total_calories"] == 750
+    assert log["remaining_calories"] == 1250
+    assert log["macro_totals"]["protein_grams"] == 30
+    assert log["macro_remaining"]["protein_grams"] == 137 - 30
+
+
+@BOTH_STORAGES
+def test_delete_takes_the_entry_out_of_the_totals(mongo_service):
+    first = log_entry(mongo_service, 500, protein=20)
+    second = log_entry(mongo_service, 300)
+
+    assert asyncio.run(mongo_service.delete_food_entry("u1", DAY.isoformat(), "lunch", first))
+    assert not asyncio.run(mongo_service.delete_food_entry("u1", DAY.isoformat(), "lunch", first))
+
+    log = daily_log(mongo_service)
+    assert [entry["entry_id"] for entry in log["meals"]["lunch"]] == [second]
+    assert log["total_calories"] == 300
+    assert log["macro_totals"]["protein_grams"] == 0
+
+
+@BOTH_STORAGES
+def test_missing_entries_are_reported(mongo_service):
+    entry_id = log_entry(mongo_service, 500)
+
+    # Wrong meal, wrong day, wrong user
+    assert not asyncio.run(mongo_service.update_food_entry("u1", DAY.isoformat(), "dinner", entry_id, {"calories": 1}))
+    assert not asyncio.run(mongo_service.delete_food_entry("u1", "2024-01-26", "lunch", entry_id))
+    assert not asyncio.run(mongo_service.delete_food_entry("u2", DAY.isoformat(), "lunch", entry_id))
+    assert daily_log(mongo_service)["total_calories"] == 500
+
+
+def test_update_retries_when_the_entry_changed_meanwhile(mongo_service):
+    entry_id = log_entry(mongo_service, 500)
+    find = mongo_service._find_embedded_entry
+    reads = []
+
+    def find_stale_once(*args):
+        entry = find(*args)
+        reads.append(entry)
+        # The first read sees amounts another request has since changed
+        return {**entry, "calories": 999.0} if len(reads) == 1 else entry
+
+    mongo_service._find_embedded_entry = find_stale_once
+    assert asyncio.run(mongo_service.update_food_entry("u1", DAY.isoformat(), "lunch", entry_id, {"calories": 400}))
+
+    assert len(reads) == 2
+    assert daily_log(mongo_service)["total_calories"] == 400
+
+
+def test_update_gives_up_after_three_conflicts(mongo_service):
+    entry_id = log_entry(mongo_service, 500)
+    find = mongo_service._find_embedded_entry
+    mongo_service._find_embedded_entry = lambda *args: {**find(*args), "calories": 999.0}
+
+    with pytest.raises(RuntimeError, match="concurrently"):
+        asyncio.run(mongo_service.delete_food_entry("u1", DAY.isoformat(), "lunch", entry_id))
+
+    assert daily_log(mongo_service)["total_calories"] == 500
+
+
+def test_entry_match_pins_the_amounts():
+    entry = {"entry_id": "e1", "calories": 500.0, "protein_grams": 20.0}
+
+    assert MongoDBService._entry_match(entry) == {
+        "entry_id": "e1", "calories": 500.0, "protein_grams": 20.0, "carbs_grams": None, "fats_grams": None,
+    }
+
+
+@pytest.mark.parametrize("field", ["calories", "food_name"])
+def test_null_required_fields_are_rejected(field):
+    with pytest.raises(ValueError):
+        normalize_entry_changes({field: None})
+    assert normalize_entry_changes({"serving_size": None, "protein_grams": None}) == {
+        "serving_size": None, "protein_grams": None,
+    }
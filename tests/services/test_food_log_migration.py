@@ -0,0 +1,111 @@
+import sys
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.services.mongodb_service import MEAL_TYPES, MongoDBService, merge_food_logs
+from scripts import normalize_food_logs
+
+DAY = "2024-01-25"
+
+
+def entry(entry_id, calories, protein=None):
+    logged = {"entry_id": entry_id, "food_name": "Pasta", "calories": float(calories), "time_logged": "12:00:00"}
+    if protein is not None:
+        logged["protein_grams"] = float(protein)
+    return logged
+
+
+def food_log(meals, target=2000, total=None):
+    total = sum(logged["calories"] for entries in meals.values() for logged in entries) if total is None else total
+    return {
+        "_id": ObjectId(),
+        "user_id": "u1",
+        "date": DAY,
+        "total_calories": float(total),
+        "target_calories": target,
+        "remaining_calories": float(target - total),
+        "meals": {**{meal: [] for meal in MEAL_TYPES}, **meals},
+    }
+
+
+def insert_without_index(service, *logs):
+    # Logs written before the unique (user_id, date) index existed
+    service.food_logs.drop_indexes()
+    service.food_logs.insert_many(list(logs))
+
+
+def test_merge_keeps_every_entry_once_and_recomputes_the_totals():
+    first = food_log({"lunch": [entry("e1", 500, protein=20)], "brunch": [entry("e2", 300)]})
+    second = food_log({"lunch": [entry("e1", 500, protein=20), entry("e3", 200)]}, target=2400)
+
+    merged = merge_food_logs([first, second])
+
+    assert [logged["entry_id"] for logged in merged["meals"]["lunch"]] == ["e1", "e3"]
+    assert [logged["entry_id"] for logged in merged["meals"]["brunch"]] == ["e2"]
+    assert merged["total_calories"] == 1000
+    assert merged["target_calories"] == 2400
+    assert merged["remaining_calories"] == 1400
+    assert merged["macro_totals"]["protein_grams"] == 20
+    # Merging again, e.g. after an interrupted run, changes nothing
+    assert merge_food_logs([{**first, **merged}, second]) == merged
+
+
+def test_duplicate_days_do_not_stop_startup(mongo_service):
+    insert_without_index(mongo_service, food_log({"lunch": [entry("e1", 500)]}), food_log({"dinner": [entry("e2", 300)]}))
+
+    other_worker = MongoDBService()
+    other_worker.close()
+
+    with pytest.raises(DuplicateKeyError):
+        mongo_service.ensure_food_log_index()
+
+
+def test_script_merges_duplicate_days_before_building_the_index(mongo_service, monkeypatch):
+    insert_without_index(
+        mongo_service,
+        food_log({"lunch": [entry("e1", 500)]}),
+        food_log({"dinner": [entry("e2", 300)]}),
+        food_log({"lunch": [entry("e3", 100)]}) | {"date": "2024-01-26"},
+    )
+    monkeypatch.setattr(sys, "argv", ["normalize_food_logs"])
+
+    normalize_food_logs.main()
+
+    log, = mongo_service.food_logs.find({"user_id": "u1", "date": DAY})
+    assert [logged["entry_id"] for logged in log["meals"]["lunch"] + log["meals"]["dinner"]] == ["e1", "e2"]
+    assert log["total_calories"] == 800
+    assert mongo_service.food_logs.count_documents({}) == 2
+    with pytest.raises(DuplicateKeyError):
+        mongo_service.food_logs.insert_one({"user_id": "u1", "date": DAY})
+
+
+@pytest.mark.parametrize("mongo_service", ["collection"], indirect=True)
+def test_collection_storage_totals_come_from_the_entries(mongo_service):
+    insert_without_index(mongo_service, food_log({}, total=500), food_log({}, total=300))
+    mongo_service.food_entries.insert_many([
+        {"_id": "e1", "user_id": "u1", "date": DAY, "meal_type": "lunch", **entry("e1", 500)},
+        {"_id": "e2", "user_id": "u1", "date": DAY, "meal_type": "dinner", **entry("e2", 300, protein=10)},
+    ])
+
+    assert mongo_service.merge_duplicate_food_logs() == 1
+
+    log, = mongo_service.food_logs.find({"user_id": "u1"})
+    assert log["total_calories"] == 800
+    assert log["macro_totals"]["protein_grams"] == 10
+    mongo_service.ensure_food_log_index()
+
+
+def test_normalize_skips_bad_logs_and_keeps_other_meals(mongo_service):
+    bad = food_log({"lunch": [entry("e1", -5)]}, total=0)
+    legacy = food_log({"brunch": [{"food_name": "Eggs", "calories": "250"}]}, total=250) | {"date": "2024-01-26"}
+    insert_without_index(mongo_service, bad, legacy)
+
+    stats = mongo_service.normalize_legacy_food_logs(batch_size=1)
+
+    assert stats == {"scanned": 2, "rewritten": 1, "failed": 1}
+    brunch, = mongo_service.food_logs.find_one({"_id": legacy["_id"]})["meals"]["brunch"]
+    assert brunch["calories"] == 250.0
+    assert brunch["entry_id"]
+    assert mongo_service.food_logs.find_one({"_id": bad["_id"]})["meals"]["lunch"][0]["calories"] == -5
@@ -0,0 +1,124 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.services import food_recognition_service, openai_service
+from app.services.food_recognition_service import SYSTEM_PROMPT, recognize_food_from_image
+
+# Stubbed model answers for a few meals, with the calories a dietitian put on them
+GOLDEN_SET = [
+    (
+        {
+            "food_items": [
+                {"name": "Grilled chicken breast", "serving": "150 g", "calories": 248},
+                {"name": "White rice", "serving": "1 cup", "calories": 205},
+                {"name": "Steamed broccoli", "serving": "1 cup", "calories": 55},
+            ],
+            "total": 508,
+        },
+        508,
+    ),
+    (
+        {
+            "food_items": [
+                {"name": "Margherita pizza", "serving": "2 slices", "calories": 570},
+                {"name": "Side salad", "serving": "1 bowl", "calories": 45.5},
+            ],
+            "total": 615.5,
+        },
+        615.5,
+    ),
+    # The old free-form answers gave calories as strings
+    (
+        {
+            "reasoning": "A banana and a coffee with milk",
+            "food_items": [
+                {"name": "Banana", "calories": "105", "serving": "1 medium"},
+                {"name": "Latte", "calories": "190 kcal", "serving": "16 oz"},
+                {"name": "Sugar", "calories": "a little", "serving": "1 tsp"},
+            ],
+            "total": "295",
+        },
+        295,
+    ),
+    ({"food_items": []}, 0),
+]
+
+
+def completion(content, finish_reason="stop", usage=None):
+    message = SimpleNamespace(content=json.dumps(content))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)], usage=usage)
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "meal.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xe0 not really a jpeg")
+    return str(path)
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    calls = []
+
+    def stub(answer, **kwargs):
+        def create_chat_completion(**request):
+            calls.append(request)
+            return completion(answer, **kwargs)
+
+        monkeypatch.setattr(food_recognition_service, "create_chat_completion", create_chat_completion)
+        return calls
+
+    return stub
+
+
+@pytest.mark.parametrize("answer,expected_total", GOLDEN_SET)
+def test_golden_set_totals(stub_model, image, answer, expected_total):
+    stub_model(answer)
+
+    result = recognize_food_from_image(image)
+
+    assert result["total"] == pytest.approx(expected_total)
+    assert all(isinstance(item["calories"], float) for item in result["food_items"])
+    assert [item["name"] for item in result["food_items"]] == [item["name"] for item in answer["food_items"]]
+
+
+def test_request_is_compact_and_structured(stub_model, image):
+    calls = stub_model(GOLDEN_SET[0][0])
+
+    recognize_food_from_image(image, "image/png")
+
+    request = calls[0]
+    assert request["operation"] == "food_recognition"
+    assert request["max_tokens"] == 400
+    assert request["response_format"]["json_schema"]["strict"] is True
+    image_url = request["messages"][1]["content"][0]["image_url"]
+    assert image_url["detail"] == "low"
+    assert image_url["url"].startswith("data:image/png;base64,")
+    assert len(SYSTEM_PROMPT) < 200
+
+
+def test_cut_off_answer_is_an_error(stub_model, image):
+    stub_model({"food_items": []}, finish_reason="length")
+
+    with pytest.raises(ValueError):
+        recognize_food_from_image(image)
+
+
+def test_token_usage_is_counted(monkeypatch):
+    usage = SimpleNamespace(prompt_tokens=180, completion_tokens=60)
+    create = lambda **request: completion({}, usage=usage)  # noqa: E731
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(openai_service, "get_openai_client", lambda: client)
+
+    def tokens(kind):
+        labels = {"operation": "food_recognition", "kind": kind}
+        return REGISTRY.get_sample_value("mealmeter_openai_tokens_total", labels) or 0
+
+    before = tokens("prompt"), tokens("completion")
+    openai_service.create_chat_completion(operation="food_recognition", model="gpt-4o", messages=[])
+
+    assert tokens("prompt") - before[0] == 180
+    assert tokens("completion") - before[1] == 60
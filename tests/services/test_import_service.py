@@ -0,0 +1,112 @@
+import io
+
+import pytest
+
+from app.services.import_service import FoodLogImporter, read_rows
+
+JSONL = "\n".join([
+    '{"user_id": "u1", "date": "2024-01-25", "meal_type": "Lunch", "food_name": "Pasta", "calories": 750}',
+    "not json",
+    '{"user_id": "u1", "date": "2024-01-25", "meal_type": "dinner", "food_name": "Soup", "calories": -1}',
+    '{"user_id": "u2", "date": "2024-01-26", "meal_type": "snacks", "food_name": "Apple", "calories": 95}',
+])
+
+
+class FakeImportStore:
+    def __init__(self):
+        self.checkpoints = {}
+        self.writes = []
+
+    def get_import_checkpoint(self, import_id):
+        return self.checkpoints.get(import_id)
+
+    def save_import_checkpoint(self, import_id, stats, finished=False):
+        self.checkpoints[import_id] = {key: stats[key] for key in ("rows", "imported", "rejected")}
+
+    def import_food_entries(self, days):
+        self.writes.append(dict(days))
+
+
+def test_import_groups_valid_rows_per_day_and_counts_rejected():
+    store = FakeImportStore()
+    stats = FoodLogImporter(store, import_id="i1", chunk_size=2).run(read_rows(io.StringIO(JSONL), "jsonl"))
+
+    assert (stats["rows"], stats["imported"], stats["rejected"]) == (4, 2, 2)
+    assert [error["row"] for error in stats["errors"]] == [2, 3]
+    (meal_type, entry), = store.writes[0][("u1", "2024-01-25")]
+    assert meal_type == "lunch" and entry["calories"] == 750.0
+
+
+def test_import_resumes_after_checkpoint_with_the_same_entry_ids():
+    store = FakeImportStore()
+    FoodLogImporter(store, import_id="i1", chunk_size=2).run(read_rows(io.StringIO(JSONL), "jsonl"))
+    first_ids = {entry["entry_id"] for write in store.writes for entries in write.values() for _, entry in entries}
+
+    store.checkpoints["i1"] = {"rows": 2, "imported": 1, "rejected": 1}
+    store.writes = []
+    stats = FoodLogImporter(store, import_id="i1", chunk_size=2).run(read_rows(io.StringIO(JSONL), "jsonl"))
+
+    assert (stats["rows"], stats["imported"], stats["rejected"]) == (4, 2, 2)
+    (_, entry), = store.writes[0][("u2", "2024-01-26")]
+    assert entry["entry_id"] in first_ids
+
+
+def test_csv_rows_treat_empty_cells_as_missing():
+    csv_text = "user_id,date,meal_type,food_name,calories,protein_grams\nu1,2024-01-25,lunch,Pasta,750,\n"
+    store = FakeImportStore()
+    stats = FoodLogImporter(store, import_id="i2").run(read_rows(io.StringIO(csv_text), "csv"))
+
+    assert stats["imported"] == 1
+    (_, entry), = store.writes[0][("u1", "2024-01-25")]
+    assert "protein_grams" not in entry
+
+
+def test_empty_entry_ids_are_the_same_when_resumed():
+    csv_text = "user_id,date,meal_type,food_name,calories,entry_id\nu1,2024-01-25,lunch,Pasta,750,\n"
+    # Written again from the start, as when a chunk was interrupted before its checkpoint
+    runs = [FakeImportStore(), FakeImportStore()]
+    for store in runs:
+        FoodLogImporter(store, import_id="i3").run(read_rows(io.StringIO(csv_text), "csv"))
+
+    (_, first), = runs[0].writes[0][("u1", "2024-01-25")]
+    (_, second), = runs[1].writes[0][("u1", "2024-01-25")]
+    assert first["entry_id"] and first["entry_id"] == second["entry_id"]
+
+
+def import_pasta_days(service, import_id="i4"):
+    csv_text = (
+        "user_id,date,meal_type,food_name,calories,protein_grams,entry_id\n"
+        "u1,2024-01-25,lunch,Pasta,750,20,e1\n"
+        "u1,2024-01-25,dinner,Soup,250,5,e2\n"
+    )
+    return FoodLogImporter(service, import_id=import_id).run(read_rows(io.StringIO(csv_text), "csv"))
+
+
+@pytest.mark.parametrize("mongo_service", ["embedded", "collection"], indirect=True)
+def test_importing_the_same_entries_again_keeps_the_totals(mongo_service):
+    import_pasta_days(mongo_service, "i4")
+    import_pasta_days(mongo_service, "i5")
+
+    log = mongo_service.food_logs.find_one({"user_id": "u1", "date": "2024-01-25"})
+    assert log["total_calories"] == 1000
+    assert log["macro_totals"]["protein_grams"] == 25
+    assert log["remaining_calories"] == log["target_calories"] - 1000
+
+
+@pytest.mark.parametrize("mongo_service", ["collection"], indirect=True)
+def test_resumed_import_counts_entries_stored_before_an_interruption(mongo_service):
+    # A run that stopped after writing the entries, before the totals of their day
+    mongo_service.food_entries.insert_many([
+        {"_id": "e1", "user_id": "u1", "date": "2024-01-25", "meal_type": "lunch", "entry_id": "e1",
+         "food_name": "Pasta", "calories": 750.0, "protein_grams": 20.0},
+        {"_id": "e2", "user_id": "u1", "date": "2024-01-25", "meal_type": "dinner", "entry_id": "e2",
+         "food_name": "Soup", "calories": 250.0, "protein_grams": 5.0},
+    ])
+
+    stats = import_pasta_days(mongo_service)
+
+    assert stats["imported"] == 2
+    assert mongo_service.food_entries.count_documents({"user_id": "u1"}) == 2
+    log = mongo_service.food_logs.find_one({"user_id": "u1", "date": "2024-01-25"})
+    assert log["total_calories"] == 1000
+    assert log["macro_totals"]["protein_grams"] == 25
@@ -0,0 +1,57 @@
+import os
+import threading
+
+import pytest
+from pymongo import MongoClient
+
+from app.services.invalidation import InvalidationBus
+
+# e.g. a local single-node replica set:
+#   docker run -d -p 27018:27017 mongo:5.0 --replSet rs0
+#   docker exec <container> mongo --eval 'rs.initiate()'
+#   MONGODB_TEST_REPLICA_SET_URI="mongodb://localhost:27018/?directConnection=true"
+REPLICA_SET_URI = os.getenv("MONGODB_TEST_REPLICA_SET_URI")
+
+pytestmark = pytest.mark.skipif(
+    not REPLICA_SET_URI, reason="MONGODB_TEST_REPLICA_SET_URI is not set"
+)
+
+
+@pytest.fixture
+def db():
+    client = MongoClient(REPLICA_SET_URI)
+    db = client.get_database("mealmeter_test_invalidation")
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+@pytest.mark.parametrize("use_change_streams", [True, False])
+def test_invalidations_reach_other_workers(db, use_change_streams):
+    publisher = InvalidationBus(db)
+    listener = InvalidationBus(db, use_change_streams=use_change_streams)
+    publisher.setup()
+
+    received = []
+    delivered = threading.Event()
+
+    def on_invalidate(key):
+        received.append(key)
+        delivered.set()
+
+    listener.subscribe("user_insights", on_invalidate)
+    listener.subscribe("user_insights", lambda key: None)
+    publisher.subscribe("user_insights", on_invalidate)  # Its own messages are skipped
+    listener.start()
+    publisher.start()
+    try:
+        # Let the listener open its stream or cursor before publishing
+        threading.Event().wait(1.0)
+        publisher.publish("profiles", "user-1")
+        publisher.publish("user_insights", "user-1")
+        assert delivered.wait(5.0)
+    finally:
+        listener.stop()
+        publisher.stop()
+
+    assert received == ["user-1"]
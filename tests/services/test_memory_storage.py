@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+
+from app.services.memory_storage import InMemoryStorage
+
+DAY = date(2024, 1, 25)
+
+
+def log_entry(storage, calories, protein=None, day=DAY):
+    entry = {"food_name": "Pasta", "meal_type": "lunch", "calories": calories, "date": day.isoformat()}
+    if protein is not None:
+        entry["protein_grams"] = protein
+    return asyncio.run(storage.add_food_entry("u1", entry))
+
+
+def test_entries_move_the_daily_totals():
+    storage = InMemoryStorage()
+    first = log_entry(storage, 500, protein=20)
+    second = log_entry(storage, 300)
+
+    assert asyncio.run(storage.update_food_entry("u1", DAY.isoformat(), "lunch", first, {"calories": 400}))
+    assert asyncio.run(storage.delete_food_entry("u1", DAY.isoformat(), "lunch", second))
+    assert not asyncio.run(storage.delete_food_entry("u1", DAY.isoformat(), "lunch", second))
+
+    log = asyncio.run(storage.get_daily_food_log("u1", DAY))
+    assert [entry["entry_id"] for entry in log["meals"]["lunch"]] == [first]
+    assert log["total_calories"] == 400
+    assert log["remaining_calories"] == 1600
+    assert log["macro_totals"]["protein_grams"] == 20
+
+
+def test_concurrent_entries_are_all_counted():
+    storage = InMemoryStorage()
+    threads = [threading.Thread(target=log_entry, args=(storage, 10)) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    log = asyncio.run(storage.get_daily_food_log("u1", DAY))
+    assert log["total_calories"] == 500
+    assert len(log["meals"]["lunch"]) == 50
+
+
+def test_insights_set_the_targets_of_days_from_today():
+    storage = InMemoryStorage()
+    past, today = date.today() - timedelta(days=1), date.today()
+    log_entry(storage, 500, day=past)
+    log_entry(storage, 500, day=today)
+
+    asyncio.run(storage.update_user_insights("u1", {"tdee": 2500, "protein_grams": 150}))
+
+    assert asyncio.run(storage.get_daily_food_log("u1", past))["target_calories"] == 2000
+    log = asyncio.run(storage.get_daily_food_log("u1", today))
+    assert (log["target_calories"], log["remaining_calories"]) == (2500, 2000)
+    assert log["macro_remaining"]["protein_grams"] == 150
+
+
+def test_profiles_are_copied_in_and_out():
+    storage = InMemoryStorage()
+    profile = {"weight_kg": 70}
+    assert asyncio.run(storage.create_user_profile("u1", profile))
+    assert not asyncio.run(storage.create_user_profile("u1", {}))
+
+    profile["weight_kg"] = 80
+    stored = asyncio.run(storage.get_user_profile("u1"))
+    stored["weight_kg"] = 90
+    assert asyncio.run(storage.get_user_profile("u1"))["weight_kg"] == 70
+
+
+def test_entries_logged_together_return_the_updated_day():
+    storage = InMemoryStorage()
+    log_entry(storage, 200)
+    entries = [
+        {"food_name": "Chicken", "calories": 280, "serving_size": "150 g", "protein_grams": 40},
+        {"food_name": "Rice", "calories": 205, "serving_size": "1 cup"},
+    ]
+
+    log = asyncio.run(storage.add_food_entries("u1", DAY.isoformat(), "dinner", entries))
+
+    assert [entry["food_name"] for entry in log["meals"]["dinner"]] == ["Chicken", "Rice"]
+    assert log["total_calories"] == 685
+    assert log["remaining_calories"] == 1315
+    assert log["macro_totals"]["protein_grams"] == 40
+    assert asyncio.run(storage.get_daily_food_log("u1", DAY)) == log
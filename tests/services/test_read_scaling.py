@@ -0,0 +1,110 @@
+import asyncio
+import os
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from app.config import get_settings
+from app.services.cache import TTLCache
+from app.services.mongodb_service import MongoDBService, read_preference, write_concern
+
+# e.g. a local replica set, see test_invalidation.py
+REPLICA_SET_URI = os.getenv("MONGODB_TEST_REPLICA_SET_URI")
+
+
+def test_read_preference_from_settings():
+    assert read_preference("primary") == Primary()
+    preference = read_preference("secondaryPreferred", 120)
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == 120
+    with pytest.raises(RuntimeError):
+        read_preference("secondary_preferred")
+
+
+def test_write_concern_from_settings():
+    assert write_concern().document == {}
+    assert write_concern("majority", True).document == {"w": "majority", "j": True}
+    assert write_concern("2").document == {"w": 2}
+
+
+class FakeSession:
+    def __init__(self, operation_time=None):
+        self.operation_time = operation_time
+        self.cluster_time = {"clusterTime": operation_time} if operation_time else None
+        self.advanced_to = None
+
+    def advance_cluster_time(self, cluster_time):
+        pass
+
+    def advance_operation_time(self, operation_time):
+        self.advanced_to = operation_time
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class FakeProfiles:
+    def __init__(self):
+        self.sessions = []
+
+    def find_one(self, query, projection=None, session=None):
+        self.sessions.append(session)
+        return None
+
+    def update_one(self, query, update, upsert=False, session=None):
+        self.sessions.append(session)
+        return SimpleNamespace(acknowledged=True)
+
+
+def scaled_service():
+    service = MongoDBService.__new__(MongoDBService)
+    service.scaled_reads = True
+    service.profiles = service.profile_reads = FakeProfiles()
+    service.last_writes = TTLCache("test_last_writes", 10, 60)
+    sessions = iter([FakeSession(operation_time=42), FakeSession()])
+    service.client = SimpleNamespace(start_session=lambda causal_consistency: next(sessions))
+    return service
+
+
+def test_reads_wait_for_the_users_last_write():
+    service = scaled_service()
+
+    asyncio.run(service.update_user_profile("u1", {"weight_kg": 70}))
+    asyncio.run(service.get_user_profile("u1"))
+    asyncio.run(service.get_user_profile("u2"))
+
+    write, read, other_read = service.profiles.sessions
+    assert write.operation_time == 42
+    assert read.advanced_to == 42
+    # Users who have not written read without a session
+    assert other_read is None
+
+
+@pytest.mark.skipif(not REPLICA_SET_URI, reason="MONGODB_TEST_REPLICA_SET_URI is not set")
+def test_read_your_writes_on_a_replica_set(monkeypatch):
+    monkeypatch.setenv("MONGODB_URI", REPLICA_SET_URI)
+    monkeypatch.setenv("MONGODB_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setenv("MONGODB_MAX_STALENESS", "90")
+    monkeypatch.setenv("MONGODB_WRITE_CONCERN", "majority")
+    monkeypatch.setenv("CACHE_INVALIDATION_ENABLED", "false")
+    get_settings.cache_clear()
+    service = MongoDBService()
+    user_id = "read-scaling-test"
+    try:
+        entry = {"food_name": "Pasta", "meal_type": "lunch", "calories": 500, "date": "2024-01-25"}
+        entry_id = asyncio.run(service.add_food_entry(user_id, entry))
+        assert service.last_writes.get(user_id) is not None
+
+        log = asyncio.run(service.get_daily_food_log(user_id, date(2024, 1, 25)))
+        assert [logged["entry_id"] for logged in log["meals"]["lunch"]] == [entry_id]
+        assert log["total_calories"] == 500
+    finally:
+        service.food_logs.delete_many({"user_id": user_id})
+        service.food_entries.delete_many({"user_id": user_id})
+        service.close()
+        get_settings.cache_clear()
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from app.services.mongodb_service import MongoDBService
+from app.services.request_scope import MongoRoundTripCounter, start_request_scope, stop_request_scope
+
+
+class CountingCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.reads = 0
+
+    def find_one(self, query, session=None):
+        self.reads += 1
+        document = self.documents.get(query["user_id"])
+        return dict(document) if document else None
+
+    def update_one(self, query, update, upsert=False, session=None):
+        self.documents.setdefault(query["user_id"], {}).update(update["$set"])
+        return SimpleNamespace(acknowledged=True)
+
+
+def build_service():
+    service = MongoDBService.__new__(MongoDBService)
+    service.profiles = CountingCollection({"u1": {"_id": "p1", "user_id": "u1", "weight_kg": 70}})
+    service.profile_reads = service.profiles
+    service.scaled_reads = False
+    return service
+
+
+async def test_profile_is_read_once_per_request():
+    service = build_service()
+    scope, token = start_request_scope()
+    try:
+        first = await service.get_user_profile("u1")
+        first["weight_kg"] = 0  # Callers get their own copy
+        await service.update_user_profile("u1", {"height_cm": 180})
+        profile = await service.get_user_profile("u1")
+        assert await service.get_user_profile("missing") is None
+        assert await service.get_user_profile("missing") is None
+    finally:
+        stop_request_scope(token)
+
+    assert service.profiles.reads == 2
+    assert profile["weight_kg"] == 70
+    assert profile["height_cm"] == 180
+
+    # Outside of a request nothing is cached
+    await service.get_user_profile("u1")
+    assert service.profiles.reads == 3
+
+
+def test_round_trips_are_counted_per_request():
+    counter = MongoRoundTripCounter()
+    counter.started(None)  # No request in progress
+    scope, token = start_request_scope()
+    try:
+        counter.started(None)
+        counter.started(None)
+    finally:
+        stop_request_scope(token)
+    assert scope.mongo_round_trips == 2
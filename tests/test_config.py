@@ -0,0 +1,23 @@
+import pytest
+
+from app.config import Settings
+
+
+@pytest.mark.parametrize("workers, pool_sizes", [(1, (0, 100)), (4, (0, 25)), (200, (0, 1))])
+def test_default_pool_budget_is_split_between_workers(monkeypatch, workers, pool_sizes):
+    for name in ("MONGODB_MIN_POOL_SIZE", "MONGODB_MAX_POOL_SIZE", "MONGODB_TOTAL_POOL_SIZE"):
+        monkeypatch.delenv(name, raising=False)
+    settings = Settings(_env_file=None, web_concurrency=workers)
+
+    assert settings.mongodb_pool_sizes() == pool_sizes
+
+
+def test_pool_sizes_respect_the_per_worker_bounds():
+    settings = Settings(
+        web_concurrency=2, mongodb_total_pool_size=400, mongodb_max_pool_size=50, mongodb_min_pool_size=10,
+    )
+    assert settings.mongodb_pool_sizes() == (10, 50)
+
+    settings = Settings(web_concurrency=8, mongodb_total_pool_size=40, mongodb_min_pool_size=10)
+    # The min pool never exceeds the worker's share
+    assert settings.mongodb_pool_sizes() == (5, 5)